@@ -0,0 +1,265 @@
+"""
+Benchmark harness for every LZW module in the repository
+
+Runs part1 to part5 on the bundled sample files and on synthetic images
+(noise, gradient, flat, photographic), each case in a fresh process so its
+peak RSS is its own, and reports per-stage time, MB/s, compression ratio
+and peak RSS as JSON.
+
+    python benchmark.py --size 1024 --output bench.json
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak RSS is reported as null
+    resource = None
+
+ROOT = os.path.dirname(os.path.realpath(__file__))
+ENGINE = os.path.join(ROOT, "part-4  Color Image Compression", "differential_lzw")
+MODULE_PATHS = {
+    "part1": os.path.join(ROOT, "part1-textcompression", "LZW_basic.py"),
+    "part2": os.path.join(ROOT, "part2-grayimagecompression", "LZW_basic_image.py"),
+    "part3": os.path.join(ROOT, "part-3 Image Compression (Gray level differences)", "gray_level.py"),
+    "part5": os.path.join(ROOT, "part5", "gui.py"),
+}
+SAMPLE_TEXT = [os.path.join(ROOT, "part1-textcompression", "input.txt")]
+SAMPLE_IMAGES = [
+    os.path.join(ROOT, "part2-grayimagecompression", "lena.bmp"),
+    os.path.join(ROOT, "part2-grayimagecompression", "rainbow.bmp"),
+    os.path.join(ROOT, "part2-grayimagecompression", "gray.png"),
+    os.path.join(ROOT, "part5", "color_image.bmp"),
+]
+SYNTHETIC_KINDS = ["noise", "gradient", "flat", "photographic"]
+IMAGE_BENCHMARKS = ["part2", "part3", "part4", "engine"] + [f"part5.level{level}" for level in range(1, 6)]
+TEXT_BENCHMARKS = ["part1", "part1.stream"]
+
+
+def load_module(name):
+    """Imports one of the repository scripts by path, silencing its prints."""
+    spec = importlib.util.spec_from_file_location(name, MODULE_PATHS[name])
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+    return module
+
+
+def load_engine():
+    """Imports the shared part-4 package."""
+    if ENGINE not in sys.path:
+        sys.path.insert(0, ENGINE)
+    from src import compression, lzw, utils, container
+    return compression, lzw, utils, container
+
+
+def add_time(stages, stage, seconds):
+    stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def timed(stages, stage, function, *args, report=False):
+    """Runs function(*args) with its output silenced and records its wall time under stage, and with report=True its report's stages under stage.name."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args, report=True) if report else function(*args)
+    add_time(stages, stage, time.perf_counter() - start)
+    if report:
+        result, compression_report = result
+        for name, seconds in compression_report.stages.items():
+            add_time(stages, f"{stage}.{name}", seconds)
+    return result
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def synthetic_image(kind, size, seed=0):
+    """Builds a size x size RGB test image."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float64) / size
+    if kind == "noise":
+        return rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    if kind == "gradient":
+        planes = [x * 255, y * 255, (x + y) * 127.5]
+    elif kind == "flat":
+        planes = [np.full((size, size), value) for value in (128, 64, 192)]
+    elif kind == "photographic":
+        # Smooth low-frequency structure plus sensor-like noise
+        planes = []
+        for _ in range(3):
+            field = sum(rng.uniform(20, 50) * np.sin(2 * np.pi * (rng.uniform(0.5, 4) * x + rng.uniform(0.5, 4) * y) + rng.uniform(0, 2 * np.pi))
+                        for _ in range(4))
+            planes.append(128 + field + rng.normal(0, 3, (size, size)))
+    else:
+        raise ValueError(f"Unknown synthetic image kind: {kind}")
+    return np.clip(np.stack(planes, axis=-1), 0, 255).astype(np.uint8)
+
+
+def bench_text(benchmark, path, workdir, stages):
+    """Returns (input bytes, compressed bytes, lossless) for a part1 benchmark."""
+    part1 = load_module("part1")
+    compressed_file = os.path.join(workdir, "part1.bin")
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    if benchmark == "part1":
+        codes = timed(stages, "compress", part1.compress, text, report=True)
+        timed(stages, "write", part1.save_compressed_to_file, codes, compressed_file)
+        codes = timed(stages, "read", part1.read_compressed_from_file, compressed_file)
+        restored = timed(stages, "decompress", part1.decompress, codes, report=True)
+        lossless = restored == text
+    else:
+        restored_file = os.path.join(workdir, "part1.out")
+        with open(path, "rb") as source, open(compressed_file, "wb") as target:
+            timed(stages, "compress", part1.compress_stream, source, target)
+        with open(compressed_file, "rb") as source, open(restored_file, "wb") as target:
+            timed(stages, "decompress", part1.decompress_stream, source, target)
+        with open(path, "rb") as a, open(restored_file, "rb") as b:
+            lossless = a.read() == b.read()
+    return os.path.getsize(path), os.path.getsize(compressed_file), lossless
+
+
+def bench_image(benchmark, path, workdir, stages):
+    """Returns (input bytes, compressed bytes, lossless) for an image benchmark."""
+    gray = np.asarray(Image.open(path).convert("L"))
+    rgb = np.asarray(Image.open(path).convert("RGB"))
+    compressed_file = os.path.join(workdir, "image.bin")
+    restored_file = os.path.join(workdir, "restored.png")
+
+    if benchmark == "part2":
+        part2 = load_module("part2")
+        timed(stages, "compress", part2.compress_image, path, compressed_file, report=True)
+        timed(stages, "decompress", part2.decompress_image, compressed_file, restored_file, report=True)
+        return gray.size, os.path.getsize(compressed_file), np.array_equal(np.asarray(Image.open(restored_file)), gray)
+
+    if benchmark == "part3":
+        part3 = load_module("part3")
+        diff_image = timed(stages, "difference", part3.compute_difference_image, gray.astype(np.int16))
+        timed(stages, "compress", part3.lzw_compress, diff_image, compressed_file, report=True)
+        decompressed = timed(stages, "decompress", part3.lzw_decompress, compressed_file, None, diff_image.size, report=True)
+        restored = timed(stages, "restore", part3.restore_image_from_diff, decompressed.reshape(diff_image.shape))
+        return gray.size, os.path.getsize(compressed_file), np.array_equal(restored, gray)
+
+    if benchmark == "part4":
+        compression = load_engine()[0]
+        timed(stages, "compress", compression.compress_color_image, path, compressed_file, report=True)
+        restored = timed(stages, "decompress", compression.decompress_color_image, compressed_file, restored_file, report=True)
+        return rgb.size, os.path.getsize(compressed_file), np.array_equal(np.asarray(restored), rgb)
+
+    if benchmark == "engine":
+        # The part-4 pipeline stage by stage, on the channels of one pixel buffer
+        compression, lzw, utils, container = load_engine()
+        channels = [rgb[:, :, k] for k in range(3)]
+        records = []
+        for channel in channels:
+            diff_image = timed(stages, "difference", utils.compute_differences, channel, np.uint8)
+            codes = timed(stages, "encode", lzw.lzw_compress_gray, diff_image)
+            records.append(timed(stages, "serialize", container.encode_codes, codes))
+        restored = []
+        for record, channel in zip(records, channels):
+            num_codes, payload = container.read_code_record(io.BytesIO(record))
+            codes = timed(stages, "deserialize", container.decode_codes, num_codes, payload)
+            decompressed = timed(stages, "decode", lzw.lzw_decompress_gray, codes, 16, channel.size)
+            restored.append(timed(stages, "restore", utils.restore_from_differences, decompressed.reshape(channel.shape)))
+        return rgb.size, sum(len(record) for record in records), np.array_equal(np.stack(restored, axis=-1), rgb)
+
+    # part5.levelN: levels 1 and 2 are grayscale, 3 to 5 color
+    level = int(benchmark[-1])
+    part5 = load_module("part5")
+    timed(stages, "compress", getattr(part5, f"level{level}_compress"), path, compressed_file, report=True)
+    restored = timed(stages, "decompress", getattr(part5, f"level{level}_decompress"), compressed_file, restored_file, report=True)
+    original = gray if level < 3 else rgb
+    return original.size, os.path.getsize(compressed_file), np.array_equal(np.asarray(restored), original)
+
+
+def run_case(benchmark, path):
+    """Runs one benchmark on one input and returns its JSON record."""
+    record = {"benchmark": benchmark, "input": os.path.basename(path)}
+    stages = {}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            if benchmark in TEXT_BENCHMARKS:
+                input_bytes, compressed_bytes, lossless = bench_text(benchmark, path, workdir, stages)
+            else:
+                input_bytes, compressed_bytes, lossless = bench_image(benchmark, path, workdir, stages)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    record.update({
+        "input_bytes": input_bytes,
+        "compressed_bytes": compressed_bytes,
+        "compression_ratio": compressed_bytes / input_bytes,
+        "lossless": bool(lossless),
+        "seconds": stages,
+        "mb_per_s": {stage: input_bytes / 1e6 / seconds for stage, seconds in stages.items() if seconds > 0},
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LZW modules and write the results as JSON.")
+    parser.add_argument("--size", type=int, default=1024, help="edge of the synthetic images in pixels (0 skips them)")
+    parser.add_argument("--only", nargs="*", default=None, help="benchmark names or prefixes to run, e.g. part5 engine")
+    parser.add_argument("--output", default=None, help="JSON file to write instead of standard output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as image_dir:
+        images = list(SAMPLE_IMAGES)
+        if args.size:
+            for kind in SYNTHETIC_KINDS:
+                image_path = os.path.join(image_dir, f"{kind}_{args.size}.bmp")
+                Image.fromarray(synthetic_image(kind, args.size)).save(image_path)
+                images.append(image_path)
+
+        cases = [(benchmark, path) for benchmark in TEXT_BENCHMARKS for path in SAMPLE_TEXT]
+        cases += [(benchmark, path) for benchmark in IMAGE_BENCHMARKS for path in images]
+        if args.only:
+            cases = [case for case in cases if any(case[0] == name or case[0].startswith(name + ".") for name in args.only)]
+
+        # A fresh process per case keeps each peak RSS separate
+        context = multiprocessing.get_context("spawn")
+        results = []
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for benchmark, path in cases:
+                result = pool.apply(run_case, (benchmark, path))
+                print(f"{benchmark:14} {result['input']:22} " + (result.get("error") or f"{result['compression_ratio']:.4f} ratio"), file=sys.stderr)
+                results.append(result)
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "synthetic_size": args.size,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,27 @@
 from PIL import Image
 import numpy as np
 import os
-from collections import Counter
-import math
+import sys
+
+# Ortak LZW motoru part-4 paketinde bulunur
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, "part-4  Color Image Compression", "differential_lzw"))
+from src.bitio import pack_codes, unpack_codes, codes_to_bytes, codes_from_bytes
+from src.lzw import LZWEncoder, lzw_decode
+from src.alphabet import ALPHABET_BYTES, ALPHABET_ZIGZAG, to_symbols, from_symbols
+from src.utils import compute_differences, restore_from_differences
+from src.stats import symbol_entropy
+from src.report import start_report, stage, finish_report
+
+# Başlangıç sözlüğündeki sembol sayısı (-255 ile 255 arası farklar)
+BASE_DICT_SIZE = 511
+# Sıfırlama politikası kullanıldığında sözlüğü temizleyen ayrılmış kod
+CLEAR_CODE = BASE_DICT_SIZE
+# Farkları BASE_DICT_SIZE sembollü tuple alfabesiyle kodlayan eski dosya biçimi
+ALPHABET_SIGNED = 'signed'
+# Bayt alfabeli dosyalar bu imza ve alfabe baytıyla başlar; eski dosyalar
+# ilk pikselin kodu (255-510) ile başladığından imzayla karışmaz
+ALPHABET_MAGIC = b'DLZA'
+ALPHABET_TAGS = {ALPHABET_ZIGZAG: 1, ALPHABET_BYTES: 2}
 
 
 def compute_difference_image(img_array):
@@ -12,82 +31,173 @@ def compute_difference_image(img_array):
     - İlk satırda, 2. pikselden itibaren, solundaki piksel ile fark alınır.
     - Diğer satırlarda, ilk sütun üst satır ile fark, diğer sütunlar ise satır farkı kullanılarak hesaplanır.
     """
-    rows, cols = img_array.shape
-    diff_img = np.zeros((rows, cols), dtype=np.int16)
-    diff_img[0, 0] = img_array[0, 0]
-    # İlk satır (satır 0) için:
-    diff_img[0, 1:] = img_array[0, 1:] - img_array[0, :-1]
-    # Diğer satırlar için:
-    for i in range(1, rows):
-        # İlk sütun: sütun farkı
-        diff_img[i, 0] = img_array[i, 0] - img_array[i - 1, 0]
-        # Diğer sütunlar: satır farkı
-        diff_img[i, 1:] = img_array[i, 1:] - img_array[i, :-1]
-    return diff_img
-
-
-def lzw_compress(integers, compressed_file):
+    return compute_differences(img_array)
+
+
+def lzw_compress(integers, compressed_file, max_code_width=None, reset_policy=None, alphabet=ALPHABET_ZIGZAG, report=False,
+                 hook=None):
     """
     LZW sıkıştırması, integer dizisi (fark dizisi) üzerinde uygulanır.
-    Başlangıç sözlüğü, farkların olası aralığı -255 ile 255 olarak oluşturulur.
+    Farklar alfabe katmanıyla (src/alphabet.py) bayt sembollerine çevrilir ve
+    ortak bayt anahtarlı LZW motoruyla sıkıştırılır: 'zigzag' (varsayılan)
+    her farkı zigzag ile tek bayta, sığmayanları kaçış kodu ve iki bayta
+    yazar, 'bytes' farkları mod 256 katlar. Bu dosyalar ALPHABET_MAGIC ve
+    alfabe baytıyla başlar. ALPHABET_SIGNED, başlangıç sözlüğü -255 ile 255
+    arası farklar olan eski (imzasız) dosya biçimini yazar.
     Sıkıştırılmış kodlar, her biri 2 bayt olarak 'compressed_file' dosyasına yazılır.
+    max_code_width verilirse kodlar 9 bitten başlayıp en fazla max_code_width
+    bite kadar büyüyen genişliklerle bit düzeyinde paketlenir.
+    Sözlük 16 bit (ya da max_code_width) ile sınırlıdır; reset_policy verilirse
+    dolan sözlük CLEAR_CODE ile temizlenir, verilmezse dondurulur.
+    integers bir numpy dizisi olabilir; liste kopyası yapılmadan doğrudan okunur.
+    Kod listesini döndürür; report=True ile (kodlar, CompressionReport) döner.
+    """
+    return_report = report
+    report = start_report("compress", report, hook)
+    if alphabet == ALPHABET_SIGNED:
+        symbols = None
+        with stage(report, "lzw"):
+            compressed = signed_lzw_encode(integers, max_code_width, reset_policy)
+        base_size = BASE_DICT_SIZE
+    elif alphabet not in ALPHABET_TAGS:
+        raise ValueError(f"Bilinmeyen alfabe: {alphabet}")
+    else:
+        with stage(report, "transform"):
+            symbols = to_symbols(integers, alphabet)
+        # Bayt sembolleri tek seferde kodlanır (sembol başına tuple oluşturulmaz)
+        with stage(report, "lzw"):
+            encoder = LZWEncoder(max_code_width or 16, reset_policy)
+            compressed = encoder.encode(symbols.tobytes())
+            compressed += encoder.finish()
+        base_size = 256
+
+    # Sıkıştırılmış kodları dosyaya yazma (her kod 2 bayt ya da bit paketli)
+    with stage(report, "serialize"):
+        if max_code_width:
+            payload = pack_codes(compressed, base_size=base_size, max_width=max_code_width, clear_codes=reset_policy is not None)
+        else:
+            payload = codes_to_bytes(compressed)
+    with stage(report, "write"), open(compressed_file, "wb") as f:
+        if alphabet != ALPHABET_SIGNED:
+            f.write(ALPHABET_MAGIC + bytes([ALPHABET_TAGS[alphabet]]))
+        f.write(payload)
+        size = f.tell()
+
+    if report is not None:
+        add_difference_stats(report, integers, symbols, compressed, payload)
+        report.bytes_in += report.symbols * 2
+        report.bytes_out += size
+    return finish_report(compressed, report, return_report, hook)
+
+
+def add_difference_stats(report, integers, symbols, codes, payload):
+    """
+    Fark dizisini rapora tek kanal olarak ekler: fark ve LZW sembolü
+    sayıları, kod sayısı, kod baytları ve farkların entropisi.
+    """
+    with stage(report, "entropy"):
+        integers = np.asarray(integers, dtype=np.int16)
+        entropy = symbol_entropy(integers)
+    report.add_channel({
+        'symbols': integers.size,
+        'tokens': integers.size if symbols is None else symbols.size,
+        'codes': len(codes),
+        'payload_bytes': len(payload),
+        'entropy': entropy,
+    })
+
+
+def signed_lzw_encode(integers, max_code_width=None, reset_policy=None):
     """
+    Eski dosya biçiminin LZW kodlayıcısı: başlangıç sözlüğü -255 ile 255
+    arası farkların tek elemanlı tuple'larıdır ve kod i + 255 farkı i'yi
+    temsil eder. Kod listesini döndürür.
+    """
+    # Farklar int16 tampon üzerinden okunur (eleman başına Python int listesi oluşturulmaz)
+    integers = memoryview(np.ascontiguousarray(integers, dtype=np.int16).reshape(-1))
     # Başlangıç sözlüğü: her sembolü tek elemanlı tuple olarak saklıyoruz.
-    dictionary = {(i,): i + 255 for i in range(-255, 256)}
-    dict_size = len(dictionary)
+    base_dictionary = {(i,): i + 255 for i in range(-255, 256)}
+    dictionary = dict(base_dictionary)
+    first_code = CLEAR_CODE + 1 if reset_policy is not None else BASE_DICT_SIZE
+    dict_size = first_code
+    max_dict_size = 1 << (max_code_width or 16)
+    if reset_policy is not None:
+        reset_policy.start()
     w = ()
     compressed = []
-    for symbol in integers:
+    for position, symbol in enumerate(integers):
         wc = w + (symbol,)
         if wc in dictionary:
             w = wc
         else:
             compressed.append(dictionary[w])
-            dictionary[wc] = dict_size
-            dict_size += 1
+            if dict_size < max_dict_size:
+                dictionary[wc] = dict_size
+                dict_size += 1
+            elif reset_policy is not None and reset_policy.should_reset(position, len(compressed)):
+                compressed.append(CLEAR_CODE)
+                dictionary = dict(base_dictionary)
+                dict_size = first_code
+                reset_policy.start()
             w = (symbol,)
     if w:
         compressed.append(dictionary[w])
-
-    # Sıkıştırılmış kodları dosyaya yazma (her kod 2 bayt)
-    with open(compressed_file, "wb") as f:
-        for code in compressed:
-            f.write(code.to_bytes(2, byteorder='big'))
     return compressed
 
 
-def lzw_decompress(compressed_file):
+def lzw_decompress(compressed_file, max_code_width=None, size=None, clear_codes=False, report=False, hook=None):
     """
-    LZW açma işlemi: Sıkıştırılmış dosyadan kodlar okunur ve
-    başlangıç sözlüğü (fark aralığı -255 ile 255) ile orijinal fark dizisi elde edilir.
+    LZW açma işlemi: Sıkıştırılmış dosyadan kodlar okunur ve bayt
+    sembolleri alfabe katmanıyla orijinal fark dizisine çevrilir.
+    Alfabe dosyanın başındaki imzadan okunur; imzasız dosyalar eski
+    ALPHABET_SIGNED biçiminde açılır.
+    max_code_width, sıkıştırmada kullanılan değerle aynı olmalıdır; sıfırlama
+    politikası kullanıldıysa clear_codes verilmelidir.
+    size (satır x sütun) biliniyorsa çıktı tek seferde ayrılır; sonuç int16 dizisidir.
+    report=True ile (farklar, CompressionReport) döner.
     """
+    return_report = report
+    report = start_report("decompress", report, hook)
     # Dosyadaki kodları oku
-    file_size = os.path.getsize(compressed_file)
-    with open(compressed_file, "rb") as f:
-        codes = [int.from_bytes(f.read(2), byteorder='big') for _ in range(file_size // 2)]
-
-    # Başlangıç sözlüğü
-    dictionary = {i + 255: (i,) for i in range(-255, 256)}
-    dict_size = len(dictionary)
-
-    # İlk kodu al ve ilgili tuple'ı belirle
-    result = []
-    first_code = codes.pop(0)
-    w = dictionary[first_code]
-    result.extend(w)
-
-    for code in codes:
-        if code in dictionary:
-            entry = dictionary[code]
-        elif code == dict_size:
-            entry = w + (w[0],)
+    with stage(report, "load"), open(compressed_file, "rb") as f:
+        data = f.read()
+    file_size = len(data)
+    alphabet = ALPHABET_SIGNED
+    if data[:len(ALPHABET_MAGIC)] == ALPHABET_MAGIC:
+        tag = data[len(ALPHABET_MAGIC)]
+        alphabets = {value: name for name, value in ALPHABET_TAGS.items()}
+        if tag not in alphabets:
+            raise ValueError(f"Bilinmeyen alfabe baytı: {tag}")
+        alphabet = alphabets[tag]
+        data = data[len(ALPHABET_MAGIC) + 1:]
+    base_size = BASE_DICT_SIZE if alphabet == ALPHABET_SIGNED else 256
+    with stage(report, "deserialize"):
+        if max_code_width:
+            codes = unpack_codes(data, base_size=base_size, max_width=max_code_width, clear_codes=clear_codes)
         else:
-            raise ValueError("Geçersiz sıkıştırılmış kod: %s" % code)
-        result.extend(entry)
-        dictionary[dict_size] = w + (entry[0],)
-        dict_size += 1
-        w = entry
-    return result
+            codes = codes_from_bytes(data)
+
+    if alphabet == ALPHABET_SIGNED:
+        # Kodlar, size verilirse önceden ayrılmış bir tampona açılır; kod i + 255 farkı i'yi temsil eder
+        with stage(report, "lzw"):
+            symbols = lzw_decode(codes, size, max_code_width or 16, base_size=BASE_DICT_SIZE, clear_codes=clear_codes)
+        with stage(report, "transform"):
+            integers = symbols.astype(np.int16) - 255
+        symbols = None
+    else:
+        # Kaçış kodlu sembollerin sayısı farklarınkinden fazla olabilir; tampon gerektikçe büyür
+        with stage(report, "lzw"):
+            symbols = lzw_decode(codes, None, max_code_width or 16, clear_codes=clear_codes)
+        with stage(report, "transform"):
+            integers = from_symbols(symbols, alphabet)
+        if size is not None and integers.size != size:
+            raise ValueError(f"Beklenen {size} fark yerine {integers.size} fark açıldı")
+
+    if report is not None:
+        add_difference_stats(report, integers, symbols, codes, data)
+        report.bytes_in += file_size
+        report.bytes_out += report.symbols * 2
+    return finish_report(integers, report, return_report, hook)
 
 
 def restore_image_from_diff(diff_img):
@@ -97,20 +207,8 @@ def restore_image_from_diff(diff_img):
     - İlk sütundaki (ilk piksel hariç) pikseller, üstteki piksel ile toplanır.
     - Diğer pikseller, satır içindeki önceki piksele fark eklenerek hesaplanır.
     """
-    rows, cols = diff_img.shape
-    restored = np.zeros((rows, cols), dtype=np.int16)
-    restored[0, 0] = diff_img[0, 0]
-    # İlk satır
-    for j in range(1, cols):
-        restored[0, j] = restored[0, j - 1] + diff_img[0, j]
-    # Diğer satırlar
-    for i in range(1, rows):
-        restored[i, 0] = restored[i - 1, 0] + diff_img[i, 0]
-        for j in range(1, cols):
-            restored[i, j] = restored[i, j - 1] + diff_img[i, j]
-    # Değerleri 0-255 aralığına getir
-    restored = np.clip(restored, 0, 255).astype(np.uint8)
-    return restored
+    # Toplamlar uint8 üzerinde (mod 256) vektörel olarak yapılır
+    return restore_from_differences(diff_img)
 
 
 def calculate_metrics(original_img, compressed_file, num_symbols):
@@ -119,10 +217,8 @@ def calculate_metrics(original_img, compressed_file, num_symbols):
     - Ortalama kod uzunluğu: Sıkıştırılmış dosyanın toplam bit sayısının sembol sayısına oranı.
     - Dosya boyutu ve sıkıştırma oranı da hesaplanır.
     """
-    # Entropi hesaplama (fark dizisi üzerinden)
-    hist = Counter(original_img.flatten())
-    total = original_img.size
-    entropy = -sum((count / total) * math.log2(count / total) for count in hist.values())
+    # Entropi hesaplama (fark dizisi üzerinden, negatif farklar kaydırılarak tek bincount ile)
+    entropy = symbol_entropy(original_img)
 
     # Sıkıştırılmış dosya boyutu (bayt cinsinden)
     comp_size = os.path.getsize(compressed_file)
@@ -152,23 +248,23 @@ if __name__ == "__main__":
 
     # Fark görüntüsünü hesapla
     diff_img = compute_difference_image(img_array)
-    # Düzleştir (tek boyutlu fark dizisi)
-    diff_list = diff_img.flatten().tolist()
+    # Düzleştir (tek boyutlu fark dizisi, kopyasız görünüm)
+    diff_flat = diff_img.ravel()
 
     # LZW ile fark dizisini sıkıştır
-    lzw_compress(diff_list, compressed_file)
+    lzw_compress(diff_flat, compressed_file)
 
     # Performans metriklerini hesapla
     # Not: num_symbols, fark dizisindeki toplam sembol sayısıdır.
-    calculate_metrics(diff_img, compressed_file, len(diff_list))
+    calculate_metrics(diff_img, compressed_file, diff_flat.size)
 
     # -----------------------------
     # Decompression (Açma) İşlemleri
     # -----------------------------
     # Sıkıştırılmış dosyadan fark dizisini geri kazan
-    decompressed_diff = lzw_decompress(compressed_file)
+    decompressed_diff = lzw_decompress(compressed_file, size=diff_img.size)
     # Tek boyutlu dizi, orijinal fark görüntüsü boyutuna yeniden şekillendirilir.
-    diff_img_restored = np.array(decompressed_diff, dtype=np.int16).reshape(diff_img.shape)
+    diff_img_restored = decompressed_diff.reshape(diff_img.shape)
 
     # Farklardan orijinal resmi geri kazan
     restored_array = restore_image_from_diff(diff_img_restored)
@@ -48,15 +48,16 @@ def main():
     
 
     print("\nStarting compression...")
-    compress_color_image(image_path, compressed_file)
+    _, report = compress_color_image(image_path, compressed_file, workers=None, report=True)
     
   
     print("\nCalculating metrics...")
-    calculate_color_metrics(image_path, compressed_file)
+    calculate_color_metrics(image_path, compressed_file, report=report)
+    print("Stage times: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in report.stages.items()))
     
     
     print("\nStarting decompression...")
-    restored_img = decompress_color_image(compressed_file, restored_image_path)
+    restored_img = decompress_color_image(compressed_file, restored_image_path, workers=None)
     
     
     print("\nVerifying results...")
@@ -0,0 +1,99 @@
+import numpy as np
+
+# Ways of turning signed residuals into the bytes the LZW engine codes
+ALPHABET_BYTES = 'bytes'      # modulo 256, one byte each; exact only up to multiples of 256
+ALPHABET_ZIGZAG = 'zigzag'    # zigzag with escape codes; exact for any int16
+
+# Escape byte of the zigzag alphabet: the two bytes after it hold a zigzag
+# value of ESCAPE or more, big-endian
+ESCAPE = 0xFF
+
+def zigzag(values):
+    """
+    Maps signed int16 values to uint16 so that small magnitudes stay small:
+    0, -1, 1, -2, 2, ... become 0, 1, 2, 3, 4, ...
+    """
+    values = np.asarray(values).astype(np.int32)
+    return ((values << 1) ^ (values >> 31)).astype(np.uint16)
+
+def unzigzag(values):
+    """
+    Inverts zigzag
+    """
+    values = np.asarray(values).astype(np.int32)
+    return ((values >> 1) ^ -(values & 1)).astype(np.int16)
+
+def fold_bytes(values):
+    """
+    Signed values modulo 256, as uint8
+    """
+    return np.asarray(values).astype(np.uint8)
+
+def unfold_bytes(symbols):
+    """
+    Reads folded bytes back as signed values in -128..127 (int16)
+    """
+    return np.asarray(symbols, dtype=np.uint8).view(np.int8).astype(np.int16)
+
+def escape_bytes(values):
+    """
+    Zigzags values and writes each as one byte, or as ESCAPE and two bytes
+    when it does not fit below ESCAPE
+    Residuals of natural images are mostly small, so nearly every one takes
+    a single byte. Returns a uint8 array.
+    """
+    codes = zigzag(np.ravel(values))
+    short = codes < ESCAPE
+    sizes = np.where(short, 1, 3)
+    offsets = np.cumsum(sizes) - sizes
+    symbols = np.empty(int(sizes.sum()), dtype=np.uint8)
+    symbols[offsets[short]] = codes[short]
+    escaped = offsets[~short]
+    symbols[escaped] = ESCAPE
+    symbols[escaped + 1] = codes[~short] >> 8
+    symbols[escaped + 2] = codes[~short] & 0xFF
+    return symbols
+
+def unescape_bytes(symbols):
+    """
+    Inverts escape_bytes
+    Only the escape bytes are walked in Python, to skip those that are part
+    of an escaped value; the rest is vectorized.
+    """
+    symbols = np.asarray(symbols, dtype=np.uint8).ravel()
+    starts = []
+    position = 0
+    for index in np.flatnonzero(symbols == ESCAPE).tolist():
+        if index >= position:
+            if index + 2 >= symbols.size:
+                raise ValueError("Escape code at the end of the symbols")
+            starts.append(index)
+            position = index + 3
+    starts = np.array(starts, dtype=np.intp)
+    
+    codes = symbols.astype(np.int32)
+    codes[starts] = (codes[starts + 1] << 8) | codes[starts + 2]
+    keep = np.ones(symbols.size, dtype=bool)
+    keep[starts + 1] = False
+    keep[starts + 2] = False
+    return unzigzag(codes[keep])
+
+def to_symbols(values, alphabet=ALPHABET_ZIGZAG):
+    """
+    Signed residuals to the uint8 symbols of the byte LZW engine
+    """
+    if alphabet == ALPHABET_BYTES:
+        return fold_bytes(values).ravel()
+    if alphabet == ALPHABET_ZIGZAG:
+        return escape_bytes(values)
+    raise ValueError(f"Unknown alphabet {alphabet}")
+
+def from_symbols(symbols, alphabet=ALPHABET_ZIGZAG):
+    """
+    Inverts to_symbols, returning int16 residuals
+    """
+    if alphabet == ALPHABET_BYTES:
+        return unfold_bytes(symbols)
+    if alphabet == ALPHABET_ZIGZAG:
+        return unescape_bytes(symbols)
+    raise ValueError(f"Unknown alphabet {alphabet}")
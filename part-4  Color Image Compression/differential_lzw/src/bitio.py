@@ -0,0 +1,149 @@
+import sys
+from array import array
+
+import numpy as np
+
+MIN_CODE_WIDTH = 9
+MAX_CODE_WIDTH = 16
+
+def codes_to_bytes(codes):
+    """
+    Serializes a whole code list as big-endian 16-bit integers in one call
+    """
+    return np.asarray(codes, dtype='>u2').tobytes()
+
+def codes_from_bytes(data):
+    """
+    Reads big-endian 16-bit codes in one call
+    Returns an array('H') so decoders iterate over plain ints.
+    """
+    codes = array('H')
+    codes.frombytes(data)
+    if sys.byteorder == 'little':
+        codes.byteswap()
+    return codes
+
+class BitWriter:
+    """
+    Packs unsigned integers of arbitrary bit width, most significant bit first
+    """
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._nbits = 0
+    
+    def write(self, value, width):
+        self._acc = (self._acc << width) | value
+        self._nbits += width
+        while self._nbits >= 8:
+            self._nbits -= 8
+            self.buffer.append((self._acc >> self._nbits) & 0xFF)
+        self._acc &= (1 << self._nbits) - 1
+    
+    def drain(self):
+        """
+        Returns the whole bytes written so far and removes them from the buffer
+        """
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+    
+    def flush(self):
+        """
+        Pads the last partial byte with zero bits and returns the packed bytes
+        """
+        if self._nbits:
+            self.buffer.append((self._acc << (8 - self._nbits)) & 0xFF)
+            self._acc = 0
+            self._nbits = 0
+        return bytes(self.buffer)
+
+class BitReader:
+    """
+    Reads unsigned integers of arbitrary bit width from a bytes-like object
+    """
+    
+    def __init__(self, data):
+        self.data = data
+        self._pos = 0
+        self._acc = 0
+        self._nbits = 0
+    
+    def extend(self, data):
+        """
+        Appends more input, dropping the bytes already consumed
+        """
+        self.data = bytes(self.data[self._pos:]) + bytes(data)
+        self._pos = 0
+    
+    def bits_left(self):
+        return (len(self.data) - self._pos) * 8 + self._nbits
+    
+    def read(self, width):
+        while self._nbits < width:
+            if self._pos >= len(self.data):
+                raise ValueError("Unexpected end of code stream")
+            self._acc = (self._acc << 8) | self.data[self._pos]
+            self._pos += 1
+            self._nbits += 8
+        self._nbits -= width
+        value = self._acc >> self._nbits
+        self._acc &= (1 << self._nbits) - 1
+        return value
+
+def code_width(index, base_size=256, max_width=MAX_CODE_WIDTH):
+    """
+    Returns the width of the index-th code of a stream.
+    When the decoder reads code i its dictionary holds base_size + i - 1
+    entries, and the code may name the entry being added, so it never exceeds
+    base_size + i - 1.
+    """
+    return min(max(MIN_CODE_WIDTH, (base_size + index - 1).bit_length()), max_width)
+
+def pack_codes(codes, base_size=256, max_width=MAX_CODE_WIDTH, clear_codes=False, seed_size=0):
+    """
+    Packs LZW codes starting at 9 bits and growing one bit each time the
+    dictionary doubles, up to max_width bits
+    With clear_codes, the code base_size marks a dictionary reset and the
+    width drops back to its starting value after it. seed_size is the
+    number of seed phrases the dictionary starts with (see seeds.py).
+    """
+    clear_code = base_size if clear_codes else None
+    first_size = (base_size + 1 if clear_codes else base_size) + seed_size
+    writer = BitWriter()
+    i = 0
+    for code in codes:
+        if i == 0:
+            width = code_width(0, first_size, max_width)
+            limit = 1 << width
+        elif first_size + i - 1 >= limit and width < max_width:
+            width += 1
+            limit <<= 1
+        writer.write(code, width)
+        i = 0 if code == clear_code else i + 1
+    return writer.flush()
+
+def unpack_codes(data, count=None, base_size=256, max_width=MAX_CODE_WIDTH, clear_codes=False, seed_size=0):
+    """
+    Reads codes written by pack_codes.
+    Without a count the stream is read until only padding bits remain.
+    """
+    clear_code = base_size if clear_codes else None
+    first_size = (base_size + 1 if clear_codes else base_size) + seed_size
+    reader = BitReader(data)
+    codes = []
+    i = 0
+    while count is None or len(codes) < count:
+        if i == 0:
+            width = code_width(0, first_size, max_width)
+            limit = 1 << width
+        elif first_size + i - 1 >= limit and width < max_width:
+            width += 1
+            limit <<= 1
+        if count is None and reader.bits_left() < width:
+            break
+        code = reader.read(width)
+        codes.append(code)
+        i = 0 if code == clear_code else i + 1
+    return codes
@@ -0,0 +1,99 @@
+import numpy as np
+
+from .stats import symbol_entropy
+
+# Reversible inter-channel transforms applied to RGB pixels before the channels are coded
+COLOR_NONE = 0
+COLOR_SUBTRACT_GREEN = 1
+COLOR_YCOCG_R = 2
+COLOR_RCT = 3
+
+# Transform id of each color transform, by the name used in options
+COLOR_TRANSFORMS = {
+    'none': COLOR_NONE,
+    'subtract_green': COLOR_SUBTRACT_GREEN,
+    'ycocg_r': COLOR_YCOCG_R,
+    'rct': COLOR_RCT,
+}
+
+# Share of the residual entropy a color transform must save to be picked by pick_color_transform
+MIN_COLOR_GAIN = 0.01
+
+def _half(values):
+    """
+    Floor of half a uint8 difference read as a signed byte, back as uint8
+    """
+    return (values.view(np.int8) >> 1).view(np.uint8)
+
+def _quarter_sum(u, v):
+    """
+    Floor of a quarter of the sum of two uint8 differences read as signed
+    bytes, modulo 256
+    """
+    return ((u.view(np.int8).astype(np.int16) + v.view(np.int8)) >> 2).astype(np.uint8)
+
+def forward_color(channels, transform):
+    """
+    Applies a color transform to [R, G, B] uint8 channels and returns the
+    transformed channels, still one uint8 array each
+    Subtract green codes R - G and B - G modulo 256, leaving G as is.
+    YCoCg-R and the JPEG 2000 RCT are computed with their lifting steps
+    modulo 256, differences being read as signed bytes, so every step can
+    be undone exactly and the output stays one byte per sample; they match
+    the textbook transforms wherever the differences fit in a signed byte.
+    """
+    if transform == COLOR_NONE:
+        return channels
+    if transform == COLOR_SUBTRACT_GREEN:
+        r, g, b = channels
+        return [r - g, g, b - g]
+    if transform == COLOR_YCOCG_R:
+        r, g, b = (np.asarray(channel, dtype=np.uint8) for channel in channels)
+        co = r - b
+        t = b + _half(co)
+        cg = g - t
+        return [t + _half(cg), co, cg]
+    if transform == COLOR_RCT:
+        r, g, b = (np.asarray(channel, dtype=np.uint8) for channel in channels)
+        u = b - g
+        v = r - g
+        return [g + _quarter_sum(u, v), u, v]
+    raise ValueError(f"Unsupported color transform {transform}")
+
+def inverse_color(channels, transform):
+    """
+    Undoes forward_color; works on any crop of the channels
+    """
+    if transform == COLOR_NONE:
+        return channels
+    if transform == COLOR_SUBTRACT_GREEN:
+        r, g, b = channels
+        return [r + g, g, b + g]
+    if transform == COLOR_YCOCG_R:
+        y, co, cg = channels
+        t = y - _half(cg)
+        g = cg + t
+        b = t - _half(co)
+        return [b + co, g, b]
+    if transform == COLOR_RCT:
+        y, u, v = channels
+        g = y - _quarter_sum(u, v)
+        return [v + g, g, u + g]
+    raise ValueError(f"Unsupported color transform {transform}")
+
+def pick_color_transform(channels, forward, transforms=(COLOR_SUBTRACT_GREEN,), min_gain=MIN_COLOR_GAIN):
+    """
+    Whichever of COLOR_NONE and transforms leaves [R, G, B] channels with
+    the lowest total entropy of their residuals under forward (a predictor
+    transform, see predictors.py)
+    A transform has to lower that entropy by at least min_gain (a share) to
+    be picked, so channels with no colour correlation to remove (e.g.
+    independent noise) are left as they are.
+    """
+    best = COLOR_NONE
+    lowest = sum(symbol_entropy(forward(channel)) for channel in channels) * (1 - min_gain)
+    for transform in transforms:
+        entropy = sum(symbol_entropy(forward(channel)) for channel in forward_color(channels, transform))
+        if entropy < lowest:
+            best, lowest = transform, entropy
+    return best
@@ -1,130 +1,473 @@
 from PIL import Image
 import numpy as np
 import struct
-from collections import Counter
 import os
-import math
-from .utils import compute_differences, restore_from_differences
-from .lzw import lzw_compress_gray, lzw_decompress_gray
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .lzw import PROGRESS_INTERVAL, LZWEncoder, lzw_decompress_gray
+from .container import (MODE_DIFFERENCES, ContainerHeader, ContainerReader, is_container,
+                        write_container, tile_boxes, encode_codes, read_code_record, decode_codes)
+from .report import StageTimer, Progress, start_report, stage, finish_report
+from .stats import symbol_entropy, channel_entropies
+from .color import COLOR_NONE, COLOR_TRANSFORMS, forward_color, inverse_color
+from .predictors import PREDICTORS, PREDICTOR_MODES
+from .runlength import run_length_tokens, symbols_from_tokens
+from .seeds import load_seed
 
-def compress_color_image(image_path, compressed_file):
+def skip_marker(progress):
     """
-    Compresses a color image using differential encoding and LZW compression
+    Wraps a progress callback so that the marker byte heading a run-length
+    record (see runlength.py), which is a token but not a symbol, is not counted
     """
-    # Read and convert image to RGB
-    img = Image.open(image_path).convert("RGB")
-    rows, cols = img.size[1], img.size[0]
-    
-    # Split into channels
-    r, g, b = img.split()
-    channels = {
-        'R': np.array(r, dtype=np.uint8),
-        'G': np.array(g, dtype=np.uint8),
-        'B': np.array(b, dtype=np.uint8)
+    pending = [1]
+    def advance(count):
+        skipped = min(pending[0], count)
+        pending[0] -= skipped
+        progress(count - skipped)
+    return advance
+
+def compress_channel(channel, max_code_width=None, reset_policy=None, mode=MODE_DIFFERENCES, run_length=False, seed=None,
+                     progress=None):
+    """
+    Differences (or the predictor of another container mode) + LZW for a
+    single channel (or tile)
+    Returns its serialized code record and its stats for a CompressionReport
+    (code count, dictionary fill, entropy and stage times), gathered on
+    the way.
+    The policy is copied so its state does not carry over between channels.
+    With run_length, long zero runs of the residuals are replaced by
+    escape tokens first if that pays off for this channel (see runlength.py).
+    A seed (see seeds.py) preloads the dictionary with trained phrases.
+    progress, if given, is called with the number of symbols encoded after
+    every PROGRESS_INTERVAL of them.
+    """
+    timer = StageTimer()
+    channel = PREDICTORS[mode][0](channel)
+    symbols = np.ascontiguousarray(channel).astype(np.uint8, copy=False)
+    timer.lap('transform')
+    
+    entropy = symbol_entropy(symbols)
+    timer.lap('entropy')
+    
+    if run_length:
+        tokens = run_length_tokens(symbols)
+        timer.lap('run_length')
+    else:
+        tokens = symbols
+    
+    # One byte per pixel: iterating bytes is faster than a memoryview and far smaller than a list
+    encoder = LZWEncoder(max_code_width or 16, copy.deepcopy(reset_policy), seed)
+    data = tokens.tobytes()
+    if progress is None:
+        codes = encoder.encode(data)
+    else:
+        codes = []
+        advance = skip_marker(progress) if run_length else progress
+        for start in range(0, len(data), PROGRESS_INTERVAL):
+            codes += encoder.encode(data[start:start + PROGRESS_INTERVAL])
+            advance(min(PROGRESS_INTERVAL, len(data) - start))
+        # Symbols folded into runs count as done once their tokens are
+        progress(symbols.size - (len(data) - 1 if run_length else len(data)))
+    codes += encoder.finish()
+    timer.lap('lzw')
+    
+    record = encode_codes(codes, max_code_width, reset_policy is not None, len(seed) if seed is not None else 0)
+    timer.lap('serialize')
+    
+    stats = {
+        'symbols': symbols.size,
+        'tokens': tokens.size,
+        'codes': len(codes),
+        'payload_bytes': len(record) - (8 if max_code_width else 4),
+        'entropy': entropy,
+        'dictionary_size': encoder.dict_size,
+        'dictionary_capacity': encoder.max_dict_size,
+        'seconds': timer.seconds,
     }
+    return record, stats
+
+def decompress_channel(num_codes, payload, shape, max_code_width=None, clear_codes=False, mode=MODE_DIFFERENCES,
+                       run_length=False, seed=None, progress=None):
+    """
+    Restores a single channel (or tile) from the code record written by compress_channel
+    Returns the channel and its stats for a CompressionReport. progress, if
+    given, is called with the number of symbols decoded as decoding goes.
+    """
+    timer = StageTimer()
+    codes = decode_codes(num_codes, payload, max_code_width, clear_codes, len(seed) if seed is not None else 0)
+    timer.lap('deserialize')
     
-    compressed_channels = {}
+    size = shape[0] * shape[1]
+    if run_length:
+        tokens = lzw_decompress_gray(codes, max_code_width or 16, None, clear_codes,
+                                     skip_marker(progress) if progress is not None else None, seed)
+        timer.lap('lzw')
+        decompressed = symbols_from_tokens(tokens.view(np.uint8))
+        if decompressed.size != size:
+            raise ValueError("Run-length record does not match the tile size")
+        if progress is not None:
+            progress(size - (tokens.size - 1))
+        timer.lap('run_length')
+    else:
+        decompressed = lzw_decompress_gray(codes, max_code_width or 16, size, clear_codes, progress, seed)
+        timer.lap('lzw')
     
-    for key in channels:
-        # Compute differences
-        diff_image = compute_differences(channels[key])
-        # Flatten and compress
-        data = diff_image.flatten().tolist()
-        codes = lzw_compress_gray(data)
-        compressed_channels[key] = codes
+    entropy = symbol_entropy(decompressed.view(np.uint8))
+    timer.lap('entropy')
     
-    # Write compressed data
-    with open(compressed_file, "wb") as f:
-        # Write dimensions
-        f.write(struct.pack(">II", rows, cols))
-        
-        # Write first pixels of each channel (reference pixels)
-        for key in ['R', 'G', 'B']:
-            f.write(struct.pack(">B", channels[key][0, 0]))
+    channel = PREDICTORS[mode][1](decompressed.view(np.uint8).reshape(shape))
+    timer.lap('transform')
+    
+    stats = {
+        'symbols': decompressed.size,
+        'codes': num_codes,
+        'payload_bytes': len(payload),
+        'entropy': entropy,
+        'seconds': timer.seconds,
+    }
+    return channel, stats
+
+def runs_in_process(jobs, workers=1):
+    """
+    Whether map_channels runs these jobs in the calling process
+    """
+    return workers == 1 or len(jobs) < 2
+
+def map_channels(function, jobs, workers=1, on_result=None):
+    """
+    Runs function(*job) for every job and returns the results in job order
+    With workers other than 1 the jobs run in a process pool (None gives one
+    process per job, up to the CPU count); channels and tiles are
+    independent, and threads would only take turns on the GIL.
+    on_result, if given, is called with each result as it arrives; if it
+    raises, the jobs not yet started are cancelled.
+    """
+    if runs_in_process(jobs, workers):
+        results = []
+        for job in jobs:
+            results.append(function(*job))
+            if on_result is not None:
+                on_result(results[-1])
+        return results
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    # Spawned rather than forked: the GUI calls this from a background thread, and forking a threaded Tk process can deadlock
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        results = []
+        for result in pool.map(function, *zip(*jobs), chunksize=chunksize):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return results
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def compress_channels(f, channels, mode, max_code_width=None, reset_policy=None, workers=1, tile_size=None, report=None,
+                      progress=None, color_transform=COLOR_NONE, run_length=False, seed=None):
+    """
+    Compresses same-sized uint8 channels into a container (see container.py)
+    mode is one of the container modes, i.e. the predictor whose residuals
+    are coded (see predictors.py). color_transform (see color.py)
+    decorrelates three RGB channels before they are coded. run_length lets
+    every tile replace long zero runs of its residuals with escape tokens
+    when that pays off (see runlength.py). A seed (see seeds.py) preloads
+    every tile's dictionary, and its id is recorded so decoding can fetch
+    it from the seed cache. With tile_size set, each channel is split into
+    independent tiles, each with its own transform and dictionary, spread
+    over the workers. A CompressionReport passed as report receives the
+    stats of every tile and the bytes written.
+    progress, if given, is called with (pixels done, total pixels) every
+    PROGRESS_INTERVAL pixels, or as each tile finishes when they run in
+    worker processes; an exception raised by it abandons the compression.
+    """
+    rows, cols = channels[0].shape
+    header = ContainerHeader(mode, len(channels), rows, cols, max_code_width, reset_policy is not None, tile_size or 0,
+                             color_transform=color_transform, run_length=run_length,
+                             seed_id=seed.seed_id if seed is not None else 0)
+    if color_transform != COLOR_NONE:
+        with stage(report, 'color'):
+            channels = forward_color(channels, color_transform)
+    
+    jobs = []
+    for channel in channels:
+        for top, left, height, width in tile_boxes((rows, cols), header.tile_size):
+            jobs.append((channel[top:top + height, left:left + width], max_code_width, reset_policy, mode, run_length, seed))
+    
+    on_result = None
+    if progress is not None:
+        tracker = Progress(progress, sum(channel.size for channel in channels))
+        if runs_in_process(jobs, workers):
+            jobs = [job + (tracker.advance,) for job in jobs]
+        else:
+            on_result = lambda result: tracker.advance(result[1]['symbols'])
+    
+    records = []
+    for record, stats in map_channels(compress_channel, jobs, workers, on_result):
+        records.append(record)
+        if report is not None:
+            report.add_channel(stats)
+    
+    start = f.tell()
+    with stage(report, 'write'):
+        write_container(f, header, records)
+    if report is not None:
+        report.bytes_in += sum(channel.nbytes for channel in channels)
+        report.bytes_out += f.tell() - start
+
+def decompress_channels(reader, box=None, workers=1, report=None, progress=None):
+    """
+    Decodes the channels of a container, or only the tiles that overlap box
+    box is (left, top, right, bottom) with right and bottom exclusive, as in
+    PIL; the channels come back cropped to it. A CompressionReport passed
+    as report receives the stats of every decoded tile, and progress is
+    called as in compress_channels, counting the pixels of decoded tiles.
+    """
+    header = reader.header
+    if header.mode not in PREDICTORS:
+        raise ValueError(f"Unsupported container mode {header.mode}")
+    seed = load_seed(header.seed_id)
+    left, top, right, bottom = box or (0, 0, header.cols, header.rows)
+    if not (0 <= left < right <= header.cols and 0 <= top < bottom <= header.rows):
+        raise ValueError(f"Region {box} is empty or outside the {header.cols}x{header.rows} image")
+    
+    wanted = [i for i, (tile_top, tile_left, height, width) in enumerate(reader.boxes)
+              if tile_top < bottom and tile_top + height > top and tile_left < right and tile_left + width > left]
+    tracker = None
+    if progress is not None:
+        tracker = Progress(progress, header.channels * sum(reader.boxes[i][2] * reader.boxes[i][3] for i in wanted))
+    on_result = None
+    if tracker is not None and workers != 1:
+        on_result = lambda result: tracker.advance(result[1]['symbols'])
+    
+    if workers != 1 and reader.is_mapped():
+        # Workers map the file themselves instead of receiving copies of the records
+        jobs = [(reader.path, k, i, seed) for k in range(header.channels) for i in wanted]
+        tiles = iter(map_channels(decompress_record, jobs, workers, on_result))
+    else:
+        jobs = []
+        for k in range(header.channels):
+            for i in wanted:
+                num_codes, payload = reader.record(k, i)
+                if workers != 1:
+                    payload = bytes(payload)
+                jobs.append((num_codes, payload, reader.boxes[i][2:], header.max_code_width, header.clear_codes, header.mode,
+                             header.run_length, seed, tracker.advance if tracker is not None and workers == 1 else None))
+        tiles = iter(map_channels(decompress_channel, jobs, workers, on_result))
+    
+    channels = []
+    for _ in range(header.channels):
+        crop = np.empty((bottom - top, right - left), dtype=np.uint8)
+        for i in wanted:
+            tile_top, tile_left, height, width = reader.boxes[i]
+            tile, stats = next(tiles)
+            if report is not None:
+                report.add_channel(stats)
+                report.bytes_in += stats['payload_bytes']
+            # Copy the part of the tile that falls inside the box
+            y0, y1 = max(tile_top, top), min(tile_top + height, bottom)
+            x0, x1 = max(tile_left, left), min(tile_left + width, right)
+            crop[y0 - top:y1 - top, x0 - left:x1 - left] = tile[y0 - tile_top:y1 - tile_top, x0 - tile_left:x1 - tile_left]
+        channels.append(crop)
+    if header.color_transform != COLOR_NONE:
+        with stage(report, 'color'):
+            channels = inverse_color(channels, header.color_transform)
+    if report is not None:
+        report.bytes_out += sum(channel.nbytes for channel in channels)
+    return channels
+
+def decompress_record(path, channel, tile, seed=None):
+    """
+    Decodes one tile of a channel of the container at path, for a worker process
+    Returns the tile and its stats, like decompress_channel.
+    """
+    with open(path, "rb") as f, ContainerReader(f) as reader:
+        header = reader.header
+        num_codes, payload = reader.record(channel, tile)
+        return decompress_channel(num_codes, payload, reader.boxes[tile][2:], header.max_code_width, header.clear_codes, header.mode,
+                                  header.run_length, seed)
+
+def channels_to_image(channels):
+    """
+    Builds a grayscale image from one channel or an RGB image from three
+    """
+    if len(channels) == 1:
+        return Image.fromarray(channels[0])
+    return Image.merge("RGB", [Image.fromarray(channel) for channel in channels])
+
+def compress_color_image(image_path, compressed_file, max_code_width=None, reset_policy=None, workers=1, tile_size=None,
+                         report=False, hook=None, predictor='left', color_transform='none', run_length=False, seed_id=0):
+    """
+    Compresses a color image using differential encoding and LZW compression
+    With max_code_width set, codes are bit-packed starting at 9 bits and
+    growing up to max_code_width bits instead of taking 2 bytes each.
+    With reset_policy set (see lzw.ResetWhenFull), a full dictionary is
+    cleared with a CLEAR code instead of being frozen.
+    workers > 1 (or None) compresses the channels in parallel processes.
+    With tile_size set, each channel is split into independent tiles that
+    are spread over the workers.
+    predictor names the prediction whose residuals are coded (left, above,
+    average, paeth, gradient, med or none; see predictors.py); it is
+    recorded in the file, so decompression needs no option for it.
+    color_transform names a reversible transform applied across R, G and B
+    first (none, subtract_green, ycocg_r or rct; see color.py), also
+    recorded in the file. run_length=True lets each channel replace long
+    zero runs of its residuals with escape tokens (see runlength.py).
+    seed_id names a seed dictionary in the seed cache, trained on residuals
+    of the same predictor, to preload the dictionaries with (see seeds.py).
+    Returns compressed_file, or (compressed_file, CompressionReport) with
+    report=True (see report.py); hook, if given, is called with the report
+    once the file is written.
+    """
+    if predictor not in PREDICTOR_MODES:
+        raise ValueError(f"Unknown predictor {predictor}")
+    if color_transform not in COLOR_TRANSFORMS:
+        raise ValueError(f"Unknown color transform {color_transform}")
+    seed = load_seed(seed_id)
+    return_report = report
+    report = start_report("compress", report, hook)
+    
+    # Read and convert image to RGB
+    with stage(report, "load"):
+        img = Image.open(image_path).convert("RGB")
         
-        # Write compressed data for each channel
-        for key in ['R', 'G', 'B']:
-            codes = compressed_channels[key]
-            f.write(struct.pack(">I", len(codes)))
-            for code in codes:
-                f.write(struct.pack(">H", code))
+        # One pixel buffer, with strided views for the channels
+        pixels = np.asarray(img)
+        channels = [pixels[:, :, k] for k in range(3)]
+    if report is not None:
+        with stage(report, "entropy"):
+            report.image_entropy = left_difference_entropy(pixels)
+    
+    # Predict, compress each channel and write the container
+    with open(compressed_file, "wb") as f:
+        compress_channels(f, channels, PREDICTOR_MODES[predictor], max_code_width, reset_policy, workers, tile_size, report,
+                          color_transform=COLOR_TRANSFORMS[color_transform], run_length=run_length, seed=seed)
     
     print("Compression completed. Compressed file:", compressed_file)
+    return finish_report(compressed_file, report, return_report, hook)
 
-def decompress_color_image(compressed_file, restored_image_path):
+def decompress_color_image(compressed_file, restored_image_path, workers=1, report=False, hook=None):
     """
     Decompresses a color image from differential LZW compressed file
+    Containers describe themselves; files in the older layout hold
+    2-byte codes
+    workers > 1 (or None) decompresses the channels in parallel processes.
+    report=True returns (image, CompressionReport) instead of the image;
+    hook, if given, is called with the report once the image is saved.
     """
+    return_report = report
+    report = start_report("decompress", report, hook)
     with open(compressed_file, "rb") as f:
-        # Read dimensions
-        rows, cols = struct.unpack(">II", f.read(8))
-        
-        # Read first pixels
-        first_pixels = {}
-        for key in ['R', 'G', 'B']:
-            first_pixels[key] = struct.unpack(">B", f.read(1))[0]
-        
-        channels_restored = {}
-        for key in ['R', 'G', 'B']:
-            # Read compressed data
-            num_codes = struct.unpack(">I", f.read(4))[0]
-            codes = [struct.unpack(">H", f.read(2))[0] for _ in range(num_codes)]
-            
-            # Decompress
-            decompressed = lzw_decompress_gray(codes)
-            
-            # Reshape to 2D array
-            diff_image = np.array(decompressed, dtype=np.int16).reshape((rows, cols))
-            
-            # Set first pixel
-            diff_image[0, 0] = first_pixels[key]
-            
-            # Restore from differences
-            channel_array = restore_from_differences(diff_image)
-            channels_restored[key] = channel_array
-    
-    # Merge channels and save
-    restored_img = Image.merge("RGB", (
-        Image.fromarray(channels_restored['R']),
-        Image.fromarray(channels_restored['G']),
-        Image.fromarray(channels_restored['B'])
-    ))
-    restored_img.save(restored_image_path)
+        if is_container(f):
+            with stage(report, "load"):
+                reader = ContainerReader(f)
+            with reader:
+                restored_img = channels_to_image(decompress_channels(reader, workers=workers, report=report))
+        else:
+            restored_img = decompress_legacy_color(f, workers, report)
+    
+    with stage(report, "write"):
+        restored_img.save(restored_image_path)
     print("Decompression completed. Restored image:", restored_image_path)
-    return restored_img
+    return finish_report(restored_img, report, return_report, hook)
 
-def calculate_color_metrics(image_path, compressed_file):
+def decompress_legacy_color(f, workers=1, report=None):
     """
-    Calculates compression metrics including entropy, code length, and compression ratio
+    Reads the layout written before the container: dimensions, the first
+    pixel of each channel, then one code record per channel
     """
-    original_size = os.path.getsize(image_path)
-    compressed_size = os.path.getsize(compressed_file)
+    # Read dimensions
+    rows, cols = struct.unpack(">II", f.read(8))
+    
+    # Read first pixels
+    first_pixels = {}
+    for key in ['R', 'G', 'B']:
+        first_pixels[key] = struct.unpack(">B", f.read(1))[0]
     
-    # Calculate entropy for each channel
-    img = np.array(Image.open(image_path).convert("RGB"))
-    entropies = []
+    # Read compressed data
+    jobs = []
+    for key in ['R', 'G', 'B']:
+        num_codes, payload = read_code_record(f)
+        jobs.append((num_codes, payload, (rows, cols)))
     
-    for i in range(3):
-        channel = img[:, :, i].flatten()
-        # Calculate differences for entropy
-        diff_channel = np.diff(channel)
-        hist = Counter(diff_channel)
-        total = len(diff_channel)
-        entropy = -sum((count / total) * math.log2(count / total) for count in hist.values())
-        entropies.append(entropy)
+    # Decompress and restore from differences
+    channels_restored = {}
+    for key, (channel, stats) in zip(['R', 'G', 'B'], map_channels(decompress_channel, jobs, workers)):
+        channels_restored[key] = channel
+        if report is not None:
+            report.add_channel(stats)
+            report.bytes_in += stats['payload_bytes']
+            report.bytes_out += channel.nbytes
     
-    avg_entropy = sum(entropies) / 3
+    # Set first pixels
+    for key in ['R', 'G', 'B']:
+        channels_restored[key][0, 0] = first_pixels[key]
     
-    # Calculate average code length
-    total_codes = 0
+    # Merge channels
+    return Image.merge("RGB", (
+        Image.fromarray(channels_restored['R']),
+        Image.fromarray(channels_restored['G']),
+        Image.fromarray(channels_restored['B'])
+    ))
+
+def decompress_color_region(compressed_file, box, workers=1, report=False, hook=None):
+    """
+    Decodes only the (left, top, right, bottom) box of a container, decoding
+    just the tiles that overlap it (the whole channels when it is not tiled)
+    Returns the crop as an image, or (image, CompressionReport) with report=True.
+    """
+    return_report = report
+    report = start_report("decompress", report, hook)
     with open(compressed_file, "rb") as f:
-        f.read(11)  # Skip dimensions and first pixels
-        for _ in range(3):
-            num_codes = struct.unpack(">I", f.read(4))[0]
-            total_codes += num_codes
-            f.read(num_codes * 2)
+        with stage(report, "load"):
+            reader = ContainerReader(f)
+        with reader:
+            region = channels_to_image(decompress_channels(reader, box, workers, report))
+    return finish_report(region, report, return_report, hook)
+
+def left_difference_entropy(pixels):
+    """
+    Average entropy of the left differences of the R, G and B channels of a
+    (rows, cols, 3) array, taken in raster order with one bincount for all three
+    """
+    diff_channels = np.diff(pixels.reshape(-1, 1, 3), axis=0)
+    return float(channel_entropies(diff_channels).mean())
+
+def calculate_color_metrics(image_path, compressed_file, report=None):
+    """
+    Calculates compression metrics including entropy, code length, and compression ratio
+    With the CompressionReport of the compression run, the entropy, sizes
+    and code length all come from the report instead of the files. The
+    entropy is always that of the image's left differences, whichever
+    predictor was used, so it means the same with and without a report.
+    """
+    original_size = os.path.getsize(image_path)
     
-    avg_code_length = (total_codes * 16) / (img.shape[0] * img.shape[1] * 3)
+    if report is not None and report.image_entropy is not None:
+        avg_entropy = report.image_entropy
+        compressed_size = report.bytes_out
+        avg_code_length = report.avg_code_length
+    else:
+        # Calculate entropy of the differences of each channel
+        img = np.asarray(Image.open(image_path).convert("RGB"))
+        avg_entropy = left_difference_entropy(img)
+        compressed_size = os.path.getsize(compressed_file)
+        
+        # Calculate average code length
+        total_bits = 0
+        with open(compressed_file, "rb") as f:
+            if is_container(f):
+                # The offset table already holds every record size
+                with ContainerReader(f) as reader:
+                    total_bits = reader.payload_bytes() * 8
+            else:
+                f.read(11)  # Skip dimensions and first pixels
+                for _ in range(3):
+                    num_codes, payload = read_code_record(f)
+                    total_bits += len(payload) * 8
+        
+        avg_code_length = total_bits / (img.shape[0] * img.shape[1] * 3)
     compression_ratio = compressed_size / original_size
     
     print(f"Original File Size: {original_size} bytes")
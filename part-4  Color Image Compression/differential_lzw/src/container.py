@@ -0,0 +1,250 @@
+import os
+import mmap
+import struct
+
+import numpy as np
+
+from .bitio import pack_codes, unpack_codes, codes_to_bytes, codes_from_bytes
+
+MAGIC = b'DLZW'
+VERSION = 3
+
+# Transform applied to every channel before LZW
+MODE_RAW = 0
+MODE_DIFFERENCES = 1
+MODE_GRADIENT = 2
+MODE_ABOVE = 3
+MODE_AVERAGE = 4
+MODE_PAETH = 5
+MODE_MED = 6
+
+# Flag bits
+FLAG_PACKED = 1         # codes are bit-packed up to code_width bits instead of fixed 16-bit
+FLAG_CLEAR_CODES = 2    # a reset policy was used, so the CLEAR code is reserved
+FLAG_RUN_LENGTH = 4     # every record starts with a run-length marker (see runlength.py)
+
+# magic, version, header size, mode, bit depth, flags, code width, channels, rows, cols, tile size
+HEADER = struct.Struct(">4sBHBBBBBIII")
+# Appended by version 2: color transform (see color.py)
+HEADER_V2 = struct.Struct(">B")
+# Appended by version 3: seed dictionary id, 0 for none (see seeds.py)
+HEADER_V3 = struct.Struct(">I")
+
+def encode_codes(codes, max_code_width=None, clear_codes=False, seed_size=0):
+    """
+    Serializes one code stream as its code count followed by 16-bit codes,
+    or by the byte count and bit-packed codes when max_code_width is set
+    """
+    record = struct.pack(">I", len(codes))
+    if max_code_width:
+        packed = pack_codes(codes, max_width=max_code_width, clear_codes=clear_codes, seed_size=seed_size)
+        return record + struct.pack(">I", len(packed)) + packed
+    return record + codes_to_bytes(codes)
+
+def read_code_record(f, max_code_width=None):
+    """
+    Reads a record written by encode_codes
+    Returns the code count and the still serialized codes
+    """
+    num_codes = struct.unpack(">I", f.read(4))[0]
+    if max_code_width:
+        num_bytes = struct.unpack(">I", f.read(4))[0]
+    else:
+        num_bytes = num_codes * 2
+    return num_codes, f.read(num_bytes)
+
+def decode_codes(num_codes, payload, max_code_width=None, clear_codes=False, seed_size=0):
+    """
+    Turns the payload of a code record back into codes
+    """
+    if max_code_width:
+        return unpack_codes(payload, num_codes, max_width=max_code_width, clear_codes=clear_codes, seed_size=seed_size)
+    return codes_from_bytes(payload)
+
+def tile_boxes(shape, tile_size):
+    """
+    Returns the (top, left, height, width) of every tile of a channel, row
+    by row; tiles on the right and bottom edges may be smaller, and
+    tile_size 0 gives a single tile covering the channel
+    """
+    rows, cols = shape
+    if not tile_size:
+        return [(0, 0, rows, cols)]
+    return [(top, left, min(tile_size, rows - top), min(tile_size, cols - left))
+            for top in range(0, rows, tile_size) for left in range(0, cols, tile_size)]
+
+class ContainerHeader:
+    """
+    Describes how the records of a container were written
+    max_code_width None means fixed 16-bit codes, and tile_size 0 means
+    every channel is a single record. Headers are written with the lowest
+    version that holds their fields (version 1 without a color transform,
+    run-length stage or seed), so files older readers can decode stay
+    readable by them.
+    """
+    
+    def __init__(self, mode, channels, rows, cols, max_code_width=None, clear_codes=False, tile_size=0, bit_depth=8,
+                 color_transform=0, run_length=False, seed_id=0):
+        self.mode = mode
+        self.channels = channels
+        self.rows = rows
+        self.cols = cols
+        self.max_code_width = max_code_width
+        self.clear_codes = clear_codes
+        self.tile_size = tile_size
+        self.bit_depth = bit_depth
+        self.color_transform = color_transform
+        self.run_length = run_length
+        self.seed_id = seed_id
+    
+    def pack(self):
+        flags = ((FLAG_PACKED if self.max_code_width else 0) | (FLAG_CLEAR_CODES if self.clear_codes else 0)
+                 | (FLAG_RUN_LENGTH if self.run_length else 0))
+        if self.seed_id:
+            version, header_size = 3, HEADER.size + HEADER_V2.size + HEADER_V3.size
+        elif self.color_transform or self.run_length:
+            version, header_size = 2, HEADER.size + HEADER_V2.size
+        else:
+            version, header_size = 1, HEADER.size
+        header = HEADER.pack(MAGIC, version, header_size, self.mode, self.bit_depth, flags,
+                             self.max_code_width or 16, self.channels, self.rows, self.cols, self.tile_size)
+        if version >= 2:
+            header += HEADER_V2.pack(self.color_transform)
+        if version >= 3:
+            header += HEADER_V3.pack(self.seed_id)
+        return header
+    
+    @classmethod
+    def unpack(cls, f):
+        """
+        Reads a header, skipping any fields a later revision appended to it
+        """
+        data = f.read(HEADER.size)
+        if len(data) < HEADER.size or data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a compressed container")
+        _, version, header_size, mode, bit_depth, flags, code_width, channels, rows, cols, tile_size = HEADER.unpack(data)
+        if version > VERSION:
+            raise ValueError(f"Unsupported container version {version}")
+        if bit_depth != 8:
+            raise ValueError(f"Unsupported bit depth {bit_depth}")
+        extra = header_size - HEADER.size
+        color_transform = 0
+        if version >= 2:
+            color_transform, = HEADER_V2.unpack(f.read(HEADER_V2.size))
+            extra -= HEADER_V2.size
+        seed_id = 0
+        if version >= 3:
+            seed_id, = HEADER_V3.unpack(f.read(HEADER_V3.size))
+            extra -= HEADER_V3.size
+        f.seek(extra, os.SEEK_CUR)
+        return cls(mode, channels, rows, cols, code_width if flags & FLAG_PACKED else None,
+                   bool(flags & FLAG_CLEAR_CODES), tile_size, bit_depth, color_transform, bool(flags & FLAG_RUN_LENGTH),
+                   seed_id)
+
+def is_container(f):
+    """
+    Checks for the magic number without moving the file position
+    """
+    position = f.tell()
+    magic = f.read(len(MAGIC))
+    f.seek(position)
+    return magic == MAGIC
+
+def write_container(f, header, records):
+    """
+    Writes the header, the offset table and the code records
+    The offset table is the record count followed by count + 1 big-endian
+    64-bit offsets from the start of the records. Records are stored
+    channel by channel, and within a channel tile by tile.
+    """
+    offsets = np.cumsum([0] + [len(record) for record in records])
+    f.write(header.pack())
+    f.write(struct.pack(">I", len(records)))
+    f.write(offsets.astype('>u8').tobytes())
+    for record in records:
+        f.write(record)
+
+class ContainerReader:
+    """
+    Reads the header and offset table of a container and leaves the records
+    on disk until they are asked for, so any channel or tile is one seek away
+    Files are memory-mapped read-only when possible and records come back as
+    memoryview slices of the map, so decoders read straight from the page
+    cache that every process mapping the same file shares. close(), or
+    leaving a with block, releases the slices and the map; the file itself
+    is left to the caller.
+    """
+    
+    def __init__(self, f):
+        self.f = f
+        self.path = getattr(f, 'name', None)
+        self.views = []
+        try:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(self.map)
+        except (OSError, ValueError):
+            # In-memory streams have no file descriptor to map
+            self.map = None
+            self.data = None
+        self.header = ContainerHeader.unpack(f)
+        num_records = struct.unpack(">I", f.read(4))[0]
+        self.offsets = np.frombuffer(f.read((num_records + 1) * 8), dtype='>u8').astype(np.int64)
+        self.start = f.tell()
+        self.boxes = tile_boxes((self.header.rows, self.header.cols), self.header.tile_size)
+        if num_records != len(self.boxes) * self.header.channels:
+            raise ValueError("Offset table does not match the image size")
+    
+    def record(self, channel, tile=0):
+        """
+        Returns the code count and serialized codes of one tile of a channel
+        """
+        position = self.start + int(self.offsets[channel * len(self.boxes) + tile])
+        if self.data is None:
+            self.f.seek(position)
+            return read_code_record(self.f, self.header.max_code_width)
+    
+        num_codes = struct.unpack_from(">I", self.data, position)[0]
+        if self.header.max_code_width:
+            num_bytes = struct.unpack_from(">I", self.data, position + 4)[0]
+            position += 8
+        else:
+            num_bytes = num_codes * 2
+            position += 4
+        view = self.data[position:position + num_bytes]
+        self.views.append(view)
+        return num_codes, view
+    
+    def is_mapped(self):
+        """
+        Whether records are served from a memory map of a file on disk
+        """
+        return self.data is not None and isinstance(self.path, str)
+    
+    def payload_bytes(self):
+        """
+        Returns the size of all serialized codes, without the record headers
+        """
+        record_header = 8 if self.header.max_code_width else 4
+        return int(self.offsets[-1]) - record_header * (len(self.offsets) - 1)
+    
+    def close(self):
+        """
+        Releases the record views handed out and unmaps the file
+        Records must be decoded before this; afterwards they are read from
+        the file again.
+        """
+        if self.map is None:
+            return
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.data.release()
+        self.data = None
+        self.map.close()
+        self.map = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
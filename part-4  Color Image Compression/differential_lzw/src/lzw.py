@@ -1,63 +1,329 @@
-def lzw_compress_gray(data):
+from array import array
+
+import numpy as np
+
+# Code reserved for clearing the dictionary when a reset policy is in use
+CLEAR_CODE = 256
+
+# Symbols (or codes) processed between two progress callbacks
+PROGRESS_INTERVAL = 1 << 16
+
+class ResetWhenFull:
+    """
+    Reset policy that clears the dictionary as soon as it is full
+    """
+    
+    def start(self):
+        pass
+    
+    def should_reset(self, consumed, emitted):
+        return True
+
+class ResetOnRatioDrop:
+    """
+    Reset policy that keeps a full dictionary while it still compresses well
+    Every window codes, the symbols per code of that window is compared with
+    the best window seen so far, and the dictionary is cleared once it falls
+    below threshold times that best.
+    """
+    
+    def __init__(self, threshold=0.9, window=1024):
+        self.threshold = threshold
+        self.window = window
+        self.best = 0.0
+        self.mark = None
+    
+    def start(self):
+        self.mark = None
+    
+    def should_reset(self, consumed, emitted):
+        if self.mark is None:
+            self.mark = (consumed, emitted)
+            return False
+        codes = emitted - self.mark[1]
+        if codes < self.window:
+            return False
+        ratio = (consumed - self.mark[0]) / codes
+        self.mark = (consumed, emitted)
+        self.best = max(self.best, ratio)
+        return ratio < self.threshold * self.best
+
+class LZWEncoder:
+    """
+    Incremental LZW encoder over byte symbols (bytes, bytearray or any iterable of 0-255)
+    Dictionary keys are the integers prefix_code << 8 | symbol, so no bytes
+    object is built per input symbol. max_code_width=None lets the dictionary
+    grow without limit. With a reset_policy, CLEAR_CODE is reserved and the
+    policy decides when a full dictionary is cleared.
+    A seed (see seeds.py) preloads its phrases as the first codes after the
+    base symbols, and a cleared dictionary goes back to them.
+    """
+    
+    def __init__(self, max_code_width=16, reset_policy=None, seed=None):
+        self.first_code = CLEAR_CODE + 1 if reset_policy is not None else 256
+        self.seed_entries = seed.encoder_entries(self.first_code) if seed is not None else {}
+        self.dictionary = dict(self.seed_entries)
+        self.dict_size = self.first_code + len(self.seed_entries)
+        self.max_dict_size = 1 << max_code_width if max_code_width else None
+        if self.max_dict_size is not None and self.dict_size > self.max_dict_size:
+            raise ValueError(f"A seed of {len(self.seed_entries)} phrases does not fit in {max_code_width}-bit codes")
+        self.reset_policy = reset_policy
+        if reset_policy is not None:
+            reset_policy.start()
+        self.w = None
+        self.consumed = 0
+        self.emitted = 0
+    
+    def encode(self, symbols):
+        """
+        Feeds more symbols and returns the codes completed so far
+        """
+        dictionary = self.dictionary
+        dict_size = self.dict_size
+        max_dict_size = self.max_dict_size
+        policy = self.reset_policy
+    
+        result = []
+        append = result.append
+        symbols = iter(symbols)
+        w = self.w
+        if w is None:
+            w = next(symbols, None)
+            if w is None:
+                return result
+            self.consumed += 1
+    
+        # position is the index of c in the whole input, i.e. the symbols consumed before it
+        position = self.consumed - 1
+        for position, c in enumerate(symbols, self.consumed):
+            key = (w << 8) | c
+            code = dictionary.get(key)
+            if code is not None:
+                w = code
+            else:
+                append(w)
+                if max_dict_size is None or dict_size < max_dict_size:
+                    dictionary[key] = dict_size
+                    dict_size += 1
+                elif policy is not None and policy.should_reset(position, self.emitted + len(result)):
+                    append(CLEAR_CODE)
+                    dictionary.clear()
+                    dictionary.update(self.seed_entries)
+                    dict_size = self.first_code + len(self.seed_entries)
+                    policy.start()
+                w = c
+    
+        self.w = w
+        self.dict_size = dict_size
+        self.consumed = position + 1
+        self.emitted += len(result)
+        return result
+    
+    def finish(self):
+        """
+        Returns the code of the pending phrase once the input has ended
+        """
+        if self.w is None:
+            return []
+        codes = [self.w]
+        self.w = None
+        self.emitted += 1
+        return codes
+
+class LZWDecoder:
+    """
+    Incremental LZW decoder for code streams
+    Entries are kept as parent code, last symbol and first symbol tables, so
+    memory stays bounded by the dictionary size however long phrases get.
+    clear_codes must be set when the stream was written with a reset policy.
+    """
+    
+    def __init__(self, max_code_width=16, clear_codes=False):
+        self.clear_code = CLEAR_CODE if clear_codes else None
+        self.first_code = CLEAR_CODE + 1 if clear_codes else 256
+        self.parents = array('l')
+        self.suffixes = bytearray()
+        self.firsts = bytearray()
+        self.dict_size = self.first_code
+        self.max_dict_size = 1 << max_code_width if max_code_width else None
+        self.w = None
+    
+    def decode(self, codes):
+        """
+        Decodes more codes and returns the bytes they stand for
+        """
+        parents = self.parents
+        suffixes = self.suffixes
+        firsts = self.firsts
+        first_code = self.first_code
+        clear_code = self.clear_code
+        dict_size = self.dict_size
+        max_dict_size = self.max_dict_size
+        w = self.w
+    
+        out = bytearray()
+        phrase = bytearray()
+        for code in codes:
+            if code == clear_code:
+                del parents[:]
+                suffixes.clear()
+                firsts.clear()
+                dict_size = first_code
+                w = None
+                continue
+    
+            if code < 256:
+                first = code
+            elif first_code <= code < dict_size:
+                first = firsts[code - first_code]
+            elif code == dict_size and w is not None and dict_size != max_dict_size:
+                first = w if w < 256 else firsts[w - first_code]
+            else:
+                raise ValueError(f"Invalid compressed code: {code}")
+    
+            if w is not None and (max_dict_size is None or dict_size < max_dict_size):
+                parents.append(w)
+                suffixes.append(first)
+                firsts.append(w if w < 256 else firsts[w - first_code])
+                dict_size += 1
+    
+            # Walk the parent chain from the last symbol back to the root
+            node = code
+            while node >= 256:
+                phrase.append(suffixes[node - first_code])
+                node = parents[node - first_code]
+            phrase.append(node)
+            phrase.reverse()
+            out += phrase
+            phrase.clear()
+            w = code
+    
+        self.dict_size = dict_size
+        self.w = w
+        return bytes(out)
+
+def lzw_encode(symbols, max_code_width=16, reset_policy=None):
+    """
+    Core LZW encoder over byte symbols, see LZWEncoder
+    """
+    encoder = LZWEncoder(max_code_width, reset_policy)
+    return encoder.encode(symbols) + encoder.finish()
+
+def lzw_compress_gray(data, max_code_width=16, reset_policy=None):
     """
     Compresses data using LZW algorithm with handling for negative differences
+    The dictionary stops growing once its codes would need more than
+    max_code_width bits, or is cleared whenever reset_policy says so.
+    """
+    # Convert negative values to positive range (0-255); uint8 input is used as is
+    data = np.ascontiguousarray(data).astype(np.uint8, copy=False)
+    
+    # One byte per pixel: iterating bytes is faster than a memoryview and far smaller than a list
+    return lzw_encode(data.tobytes(), max_code_width, reset_policy)
+
+def lzw_decode(codes, size=None, max_code_width=16, base_size=256, clear_codes=False, progress=None, seed=None):
     """
-    # Convert negative values to positive range (0-255)
-    data = [(x + 256) % 256 for x in data]
-    
-    dictionary = {bytes([i]): i for i in range(256)}
-    dict_size = 256
-    max_dict_size = 65536  # 16-bit limit
-    
-    w = bytes([data[0]]) if data else bytes()
-    result = []
-    
-    for i in range(1, len(data)):
-        c = bytes([data[i]])
-        wc = w + c
-        if wc in dictionary:
-            w = wc
-        else:
-            result.append(dictionary[w])
-            if dict_size < max_dict_size:
-                dictionary[wc] = dict_size
+    Core LZW decoder writing straight into a preallocated output buffer
+    Every dictionary entry is its parent phrase plus one symbol, and that
+    phrase already sits in the output, so an entry is stored as the offset of
+    its first occurrence and its length instead of as a bytes copy. Phrases
+    are copied within the buffer. size is the number of symbols (rows * cols),
+    and a stream that decodes to any other count raises ValueError; without
+    it the buffer grows as needed. Symbols come back as uint8, or
+    uint16 when base_size is larger than 256. With clear_codes, the code
+    base_size clears the dictionary. progress, if given, is called with
+    the number of symbols decoded every PROGRESS_INTERVAL codes, and codes
+    must then be a list or array.
+    With a seed (see seeds.py), its phrases are written ahead of the output
+    so their entries are offsets like any other, and are cut off at the end.
+    """
+    typecode = 'B' if base_size <= 256 else 'H'
+    max_dict_size = 1 << max_code_width if max_code_width else None
+    clear_code = base_size if clear_codes else None
+    first_code = base_size + 1 if clear_codes else base_size
+    
+    if seed is not None:
+        seed_data, offsets, lengths = seed.decoder_entries()
+    else:
+        seed_data, offsets, lengths = b'', array('q'), array('q')
+    seed_count = len(offsets)
+    dict_size = first_code + seed_count
+    
+    start = len(seed_data)
+    capacity = start + (size if size is not None else 1024)
+    out = array(typecode, [0]) * capacity
+    out[:start] = array(typecode, seed_data)
+    
+    # w_len == 0 means there is no previous phrase (start of stream or after a clear)
+    w_pos, w_len = 0, 0
+    pos = start
+    
+    # Without progress the codes are one chunk; with it, progress gets the
+    # number of symbols decoded since its previous call after every chunk
+    if progress is None:
+        chunks = [codes]
+    else:
+        chunks = (codes[i:i + PROGRESS_INTERVAL] for i in range(0, len(codes), PROGRESS_INTERVAL))
+    reported = start
+    
+    for chunk in chunks:
+        for code in chunk:
+            if code == clear_code:
+                del offsets[seed_count:]
+                del lengths[seed_count:]
+                dict_size = first_code + seed_count
+                w_len = 0
+                continue
+    
+            if code < base_size:
+                c_len = 1
+            elif first_code <= code < dict_size:
+                c_len = lengths[code - first_code]
+            elif code == dict_size and w_len:
+                c_len = w_len + 1
+            else:
+                raise ValueError(f"Invalid compressed code: {code}")
+    
+            end = pos + c_len
+            if end > capacity:
+                if size is not None:
+                    raise ValueError("Decoded data is longer than expected")
+                out.extend(array(typecode, [0]) * max(capacity, c_len))
+                capacity = len(out)
+    
+            if code < base_size:
+                out[pos] = code
+            elif code < dict_size:
+                offset = offsets[code - first_code]
+                out[pos:end] = out[offset:offset + c_len]
+            else:
+                # The new entry is w plus its own first symbol
+                out[pos:end - 1] = out[w_pos:w_pos + w_len]
+                out[end - 1] = out[w_pos]
+    
+            # The entry w + first symbol of this phrase starts where w was written
+            if w_len and (max_dict_size is None or dict_size < max_dict_size):
+                offsets.append(w_pos)
+                lengths.append(w_len + 1)
                 dict_size += 1
-            w = c
     
-    if w:
-        result.append(dictionary[w])
+            w_pos, w_len = pos, c_len
+            pos = end
+    
+        if progress is not None:
+            progress(pos - reported)
+            reported = pos
     
-    return result
+    if size is None:
+        del out[pos:]
+    elif pos != start + size:
+        raise ValueError(f"Decoded {pos - start} symbols, expected {size}")
+    return np.frombuffer(out, dtype=np.dtype(typecode))[start:]
 
-def lzw_decompress_gray(codes):
+def lzw_decompress_gray(codes, max_code_width=16, size=None, clear_codes=False, progress=None, seed=None):
     """
     Decompresses LZW compressed data with handling for negative differences
+    Returns an int8 array of signed values (-128 to 127); size, when known,
+    preallocates the output.
     """
-    if not codes:
-        return []
-        
-    dictionary = {i: bytes([i]) for i in range(256)}
-    dict_size = 256
-    
-    # Handle first code
-    result = list(dictionary[codes[0]])
-    w = dictionary[codes[0]]
-    
-    for code in codes[1:]:
-        if code in dictionary:
-            entry = dictionary[code]
-        elif code == dict_size and w:
-            entry = w + bytes([w[0]])
-        else:
-            raise ValueError(f"Invalid compressed code: {code}")
-            
-        result.extend(entry)
-        
-        if w and dict_size < 65536:
-            dictionary[dict_size] = w + bytes([entry[0]])
-            dict_size += 1
-            
-        w = entry
-    
-    # Convert back to signed values (-128 to 127)
-    return [(x if x < 128 else x - 256) for x in result] 
\ No newline at end of file
+    return lzw_decode(codes, size, max_code_width, clear_codes=clear_codes, progress=progress, seed=seed).view(np.int8)
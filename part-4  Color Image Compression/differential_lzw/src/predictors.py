@@ -0,0 +1,126 @@
+import numpy as np
+
+from .utils import compute_differences, restore_from_differences, compute_gradient_differences, restore_from_gradient_differences
+from .container import MODE_RAW, MODE_DIFFERENCES, MODE_GRADIENT, MODE_ABOVE, MODE_AVERAGE, MODE_PAETH, MODE_MED
+
+def predict_average(a, b, c):
+    """
+    Mean of the left (a) and above (b) neighbours, rounded down
+    """
+    return (a + b) >> 1
+
+def predict_paeth(a, b, c):
+    """
+    PNG's Paeth predictor: whichever of left (a), above (b) and upper left
+    (c) is closest to a + b - c, ties going to a, then b
+    """
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+def predict_med(a, b, c):
+    """
+    JPEG-LS median edge detector: min(a, b) above an edge, max(a, b) below
+    one, a + b - c on smooth areas
+    """
+    low = np.minimum(a, b)
+    high = np.maximum(a, b)
+    return np.where(c >= high, low, np.where(c <= low, high, a + b - c))
+
+def compute_above_differences(channel):
+    """
+    Differences every pixel against the one above it, modulo 256 (uint8)
+    The first row falls back to left differences.
+    """
+    channel = np.asarray(channel, dtype=np.uint8)
+    residuals = np.empty_like(channel)
+    residuals[0, 0] = channel[0, 0]
+    np.subtract(channel[0, 1:], channel[0, :-1], out=residuals[0, 1:])
+    np.subtract(channel[1:], channel[:-1], out=residuals[1:])
+    return residuals
+
+def restore_from_above_differences(residuals):
+    """
+    Inverts compute_above_differences: the first row, then every column
+    """
+    steps = np.asarray(residuals).astype(np.uint8)
+    steps[0] = np.cumsum(steps[0], dtype=np.uint8)
+    return np.cumsum(steps, axis=0, dtype=np.uint8)
+
+def neighbour_residuals(channel, predict):
+    """
+    Residuals modulo 256 (uint8) of predict(left, above, upper left) over a
+    uint8 channel
+    predict takes and returns int16 arrays with values in 0..255. The first
+    row falls back to left differences and the first column to above
+    differences, as in compute_differences.
+    """
+    channel = np.asarray(channel, dtype=np.uint8)
+    residuals = compute_differences(channel, np.uint8)
+    if channel.shape[0] > 1 and channel.shape[1] > 1:
+        wide = channel.astype(np.int16)
+        prediction = predict(wide[1:, :-1], wide[:-1, 1:], wide[:-1, :-1])
+        np.subtract(channel[1:, 1:], prediction.astype(np.uint8), out=residuals[1:, 1:])
+    return residuals
+
+def restore_from_neighbour_residuals(residuals, predict):
+    """
+    Inverts neighbour_residuals
+    A pixel's prediction needs its restored left and above neighbours, so
+    the interior is restored one anti-diagonal at a time, each diagonal a
+    single vectorized step. In the flattened image a diagonal is a strided
+    slice (stride cols - 1), and so are its left, above and upper left
+    neighbours.
+    """
+    residuals = np.ascontiguousarray(residuals).astype(np.uint8, copy=False)
+    rows, cols = residuals.shape
+    restored = np.empty((rows, cols), dtype=np.int16)
+    restored[:, 0] = np.cumsum(residuals[:, 0], dtype=np.uint8)
+    restored[0] = np.cumsum(residuals[0], dtype=np.uint8)
+    
+    flat = restored.reshape(-1)
+    flat_residuals = residuals.reshape(-1)
+    step = cols - 1
+    for diagonal in range(2, rows + cols - 1):
+        first_row = max(1, diagonal - step)
+        last_row = min(rows - 1, diagonal - 1)
+        if first_row > last_row:
+            continue
+        start = first_row * step + diagonal
+        stop = last_row * step + diagonal + 1
+        prediction = predict(flat[start - 1:stop - 1:step], flat[start - cols:stop - cols:step],
+                             flat[start - cols - 1:stop - cols - 1:step])
+        flat[start:stop:step] = (prediction + flat_residuals[start:stop:step]) & 0xFF
+    return restored.astype(np.uint8)
+
+def neighbour_predictor(predict):
+    """
+    Forward and inverse transform for a predictor of left, above and upper left
+    """
+    return (lambda channel: neighbour_residuals(channel, predict),
+            lambda residuals: restore_from_neighbour_residuals(residuals, predict))
+
+# Forward and inverse transform of each container mode, between a uint8
+# channel and the uint8 symbols LZW codes. Left, above and gradient have
+# closed-form inverses; the others restore diagonal by diagonal.
+PREDICTORS = {
+    MODE_RAW: (lambda channel: channel, lambda symbols: symbols),
+    MODE_DIFFERENCES: (lambda channel: compute_differences(channel, np.uint8), restore_from_differences),
+    MODE_GRADIENT: (compute_gradient_differences, restore_from_gradient_differences),
+    MODE_ABOVE: (compute_above_differences, restore_from_above_differences),
+    MODE_AVERAGE: neighbour_predictor(predict_average),
+    MODE_PAETH: neighbour_predictor(predict_paeth),
+    MODE_MED: neighbour_predictor(predict_med),
+}
+
+# Container mode of each predictor, by the name used in options and menus
+PREDICTOR_MODES = {
+    'none': MODE_RAW,
+    'left': MODE_DIFFERENCES,
+    'above': MODE_ABOVE,
+    'average': MODE_AVERAGE,
+    'paeth': MODE_PAETH,
+    'gradient': MODE_GRADIENT,
+    'med': MODE_MED,
+}
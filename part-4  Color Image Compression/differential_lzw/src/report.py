@@ -0,0 +1,153 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+class StageTimer:
+    """
+    Splits the time since the previous lap into named stages, for code
+    that runs in worker processes and cannot reach the report
+    """
+    
+    def __init__(self):
+        self.seconds = {}
+        self.start = time.perf_counter()
+    
+    def lap(self, name):
+        now = time.perf_counter()
+        self.seconds[name] = self.seconds.get(name, 0.0) + now - self.start
+        self.start = now
+
+class CompressionReport:
+    """
+    What one compress or decompress call did, filled in during that call
+    stages maps a stage name (load, transform, lzw, serialize, write, ...)
+    to wall seconds. Stages that run once per channel or tile are summed
+    over them, so with workers they add up process time, not elapsed time.
+    channels holds one dict per channel (tile by tile when tiled) with its
+    symbol count, code count, payload bytes and symbol entropy, plus the
+    number of tokens LZW coded (fewer than the symbols once runs are
+    folded) and the final dictionary size and capacity when compressing.
+    image_entropy is the entropy the metrics panels display for the input
+    image, set by compressors that load it so the metrics need not reopen it.
+    """
+    
+    def __init__(self, operation):
+        self.operation = operation
+        self.stages = {}
+        self.channels = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.image_entropy = None
+    
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the body of a with block under name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+    
+    def add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def add_channel(self, stats):
+        """
+        Records the stats of one channel or tile and folds its stage times into stages
+        """
+        for name, seconds in stats.get('seconds', {}).items():
+            self.add_time(name, seconds)
+        self.channels.append(stats)
+    
+    @property
+    def symbols(self):
+        return sum(stats['symbols'] for stats in self.channels)
+    
+    @property
+    def codes(self):
+        return sum(stats['codes'] for stats in self.channels)
+    
+    @property
+    def payload_bytes(self):
+        return sum(stats['payload_bytes'] for stats in self.channels)
+    
+    @property
+    def entropy(self):
+        """
+        Entropy of the symbols fed to (or returned by) LZW, averaged over
+        the channels weighted by their size
+        """
+        symbols = self.symbols
+        if not symbols:
+            return 0.0
+        return sum(stats['entropy'] * stats['symbols'] for stats in self.channels) / symbols
+    
+    @property
+    def avg_code_length(self):
+        """
+        Bits of serialized codes per symbol
+        """
+        symbols = self.symbols
+        return self.payload_bytes * 8 / symbols if symbols else 0.0
+    
+    def to_dict(self):
+        """
+        Plain values only, ready for json.dumps or a metrics exporter
+        """
+        return {
+            'operation': self.operation,
+            'stages': dict(self.stages),
+            'channels': [{key: value for key, value in stats.items() if key != 'seconds'} for stats in self.channels],
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'codes': self.codes,
+            'entropy': self.entropy,
+            'avg_code_length': self.avg_code_length,
+            'image_entropy': self.image_entropy,
+        }
+
+class Progress:
+    """
+    Adds up the symbols the channels of one call have processed and passes
+    (done, total) to callback
+    The callback runs on the thread that made the call and may raise to
+    abandon it, e.g. when the user cancels.
+    """
+    
+    def __init__(self, callback, total):
+        self.callback = callback
+        self.total = total
+        self.done = 0
+    
+    def advance(self, count):
+        self.done += count
+        self.callback(self.done, self.total)
+
+def start_report(operation, report=False, hook=None):
+    """
+    Returns a new report when the caller asked for one or passed a hook, else None
+    A hook alone gets its report without changing what the call returns;
+    see finish_report.
+    """
+    if report or hook is not None:
+        return CompressionReport(operation)
+    return None
+
+def stage(report, name):
+    """
+    report.stage(name), or a no-op when there is no report
+    """
+    return report.stage(name) if report is not None else nullcontext()
+
+def finish_report(result, report, returned=False, hook=None):
+    """
+    Hands the finished report to hook (e.g. a metrics exporter) and returns
+    (result, report) when the caller asked for the report, else result
+    returned is the report argument of the call as the caller passed it, so
+    every entry point answers report=True the same way and a hook never
+    changes what it returns.
+    """
+    if report is not None and hook is not None:
+        hook(report)
+    return (result, report) if returned else result
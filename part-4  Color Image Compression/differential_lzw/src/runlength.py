@@ -0,0 +1,117 @@
+import numpy as np
+
+# Zero runs at least this long become an escape token; shorter ones go to LZW as they are
+MIN_RUN = 16
+
+# A channel is run-length coded only when that leaves at most this share of its symbols
+MAX_TOKEN_SHARE = 0.75
+
+def zero_runs(symbols, min_run=MIN_RUN):
+    """
+    Finds the runs of zeros at least min_run long in a 1D uint8 array
+    Returns their start indices and lengths.
+    """
+    zero = np.concatenate(([False], symbols == 0, [False]))
+    edges = np.flatnonzero(zero[1:] != zero[:-1])
+    starts, lengths = edges[::2], edges[1::2] - edges[::2]
+    keep = lengths >= min_run
+    return starts[keep], lengths[keep]
+
+def pick_escape(symbols):
+    """
+    The rarest nonzero byte value, so literal escapes cost as little as possible
+    """
+    return int(np.argmin(np.bincount(symbols, minlength=256)[1:])) + 1
+
+def run_length_encode(symbols, escape, min_run=MIN_RUN):
+    """
+    Replaces every zero run of at least min_run symbols with the escape
+    byte followed by the run length as a little-endian base-128 varint,
+    whose first byte is never 0
+    A literal escape byte is written as escape, 0. Every other symbol
+    passes through. Returns the tokens as a uint8 array.
+    """
+    symbols = np.asarray(symbols, dtype=np.uint8).ravel()
+    starts, lengths = zero_runs(symbols, min_run)
+    widths = np.ones(len(starts), dtype=np.intp)
+    for k in range(1, 10):
+        widths += lengths >= 1 << 7 * k
+    
+    # Tokens written for each symbol: none inside a run, 1 + varint at its start
+    inside = np.zeros(symbols.size + 1, dtype=np.intp)
+    inside[starts] += 1
+    inside[starts + lengths] -= 1
+    inside = np.cumsum(inside[:-1]) > 0
+    sizes = np.where(symbols == escape, 2, 1)
+    sizes[inside] = 0
+    sizes[starts] = 1 + widths
+    offsets = np.cumsum(sizes) - sizes
+    
+    tokens = np.zeros(int(sizes.sum()), dtype=np.uint8)
+    literal = ~inside
+    tokens[offsets[literal]] = symbols[literal]
+    tokens[offsets[starts]] = escape
+    for k in range(int(widths.max(initial=0))):
+        more = widths > k
+        digits = (lengths[more] >> 7 * k) & 0x7F
+        tokens[offsets[starts[more]] + 1 + k] = digits | np.where(widths[more] > k + 1, 0x80, 0)
+    return tokens
+
+def run_length_decode(tokens, escape):
+    """
+    Inverts run_length_encode
+    Only the escape tokens are walked in Python; the output is then built
+    with a single np.repeat of every token by the number of symbols it
+    stands for.
+    """
+    tokens = np.asarray(tokens, dtype=np.uint8).ravel()
+    data = tokens.tobytes()
+    values = tokens.copy()
+    counts = np.ones(tokens.size, dtype=np.intp)
+    position = 0
+    for index in np.flatnonzero(tokens == escape).tolist():
+        # Escape bytes inside a varint already read are not escapes
+        if index < position:
+            continue
+        length, shift, end = 0, 0, index + 1
+        while True:
+            byte = data[end]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            end += 1
+            if byte < 0x80:
+                break
+        if length:
+            values[index] = 0
+            counts[index] = length
+        counts[index + 1:end] = 0
+        position = end
+    return np.repeat(values, counts)
+
+def run_length_tokens(symbols, min_run=MIN_RUN):
+    """
+    Chooses between coding a channel's symbols as they are and run-length
+    coding them
+    Returns the bytes to hand to LZW: a 0 marker followed by the symbols,
+    or the escape byte followed by the tokens when those are at most
+    MAX_TOKEN_SHARE of the symbols.
+    """
+    symbols = np.asarray(symbols, dtype=np.uint8).ravel()
+    if symbols.size:
+        escape = pick_escape(symbols)
+        tokens = run_length_encode(symbols, escape, min_run)
+        if tokens.size <= MAX_TOKEN_SHARE * symbols.size:
+            return np.concatenate(([escape], tokens)).astype(np.uint8)
+    return np.concatenate(([0], symbols)).astype(np.uint8)
+
+def symbols_from_tokens(data):
+    """
+    Inverts run_length_tokens
+    """
+    data = np.asarray(data, dtype=np.uint8).ravel()
+    if data.size == 0:
+        raise ValueError("Run-length record is empty")
+    escape = int(data[0])
+    if escape == 0:
+        return data[1:]
+    return run_length_decode(data[1:], escape)
@@ -0,0 +1,181 @@
+import argparse
+import os
+import struct
+import zlib
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from .lzw import LZWEncoder
+
+MAGIC = b'DLZS'
+
+# Where seeds are saved and looked up by id, overridable with DLZW_SEED_DIR
+SEED_DIRECTORY = os.environ.get('DLZW_SEED_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'differential_lzw', 'seeds'))
+
+DEFAULT_ENTRIES = 2048
+
+# Seeds already loaded in this process, by id
+_loaded = {}
+
+class SeedDictionary:
+    """
+    Phrases of two or more bytes that take the dictionary codes right after
+    the base symbols, in order
+    The LZW encoder only reaches a phrase through its prefixes, so every
+    prefix of a phrase must be a single byte or an earlier phrase, and no
+    phrase may appear twice. The id is a CRC-32 of the serialized seed, so
+    a file can only be decoded with the very seed it was written with.
+    """
+    
+    def __init__(self, phrases):
+        self.phrases = [bytes(phrase) for phrase in phrases]
+        known = set()
+        for phrase in self.phrases:
+            if len(phrase) < 2 or (len(phrase) > 2 and phrase[:-1] not in known):
+                raise ValueError("Seed phrases must be at least two bytes long and follow their prefixes")
+            if phrase in known:
+                # The encoder would fold a repeat into one code and fall out of step with the decoder
+                raise ValueError(f"Seed phrase {phrase.hex()} appears twice")
+            known.add(phrase)
+        self.seed_id = zlib.crc32(self.to_bytes()) or 1
+        self._encoder_entries = {}
+        lengths = np.array([len(phrase) for phrase in self.phrases], dtype=np.int64)
+        self._decoder_entries = (b''.join(self.phrases), array('q', (np.cumsum(lengths) - lengths).tolist()),
+                                 array('q', lengths.tolist()))
+    
+    def __len__(self):
+        return len(self.phrases)
+    
+    def __reduce__(self):
+        # Worker processes rebuild their own lookup tables
+        return SeedDictionary, (self.phrases,)
+    
+    def to_bytes(self):
+        """
+        Magic, phrase count, every phrase length as 16 bits, then the phrases
+        """
+        lengths = np.array([len(phrase) for phrase in self.phrases], dtype='>u2')
+        return MAGIC + struct.pack(">I", len(self.phrases)) + lengths.tobytes() + b''.join(self.phrases)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a seed dictionary")
+        count, = struct.unpack_from(">I", data, len(MAGIC))
+        start = len(MAGIC) + 4
+        lengths = np.frombuffer(data, dtype='>u2', count=count, offset=start).astype(np.intp)
+        ends = start + 2 * count + np.cumsum(lengths)
+        return cls(data[end - length:end] for end, length in zip(ends.tolist(), lengths.tolist()))
+    
+    def encoder_entries(self, first_code):
+        """
+        LZWEncoder dictionary entries (prefix code << 8 | symbol -> code) of
+        the phrases, numbered from first_code
+        """
+        entries = self._encoder_entries.get(first_code)
+        if entries is None:
+            codes = {}
+            entries = {}
+            for code, phrase in enumerate(self.phrases, first_code):
+                prefix = phrase[0] if len(phrase) == 2 else codes[phrase[:-1]]
+                entries[(prefix << 8) | phrase[-1]] = code
+                codes[phrase] = code
+            self._encoder_entries[first_code] = entries
+        return entries
+    
+    def decoder_entries(self):
+        """
+        The phrases laid end to end, with fresh offset and length tables for
+        lzw_decode to extend
+        """
+        data, offsets, lengths = self._decoder_entries
+        return data, array('q', offsets), array('q', lengths)
+
+def train_seed(samples, entries=DEFAULT_ENTRIES):
+    """
+    Builds a seed from sample symbol streams (e.g. residuals of the
+    predictor the seed will be used with)
+    Each sample is LZW coded on its own, and every phrase scores the
+    symbols its codes covered beyond the first across all samples. The best
+    phrases are taken, with their prefixes, up to entries phrases.
+    """
+    scores = Counter()
+    for sample in samples:
+        data = np.ascontiguousarray(sample).astype(np.uint8, copy=False).tobytes()
+        encoder = LZWEncoder(max_code_width=None)
+        codes = encoder.encode(data) + encoder.finish()
+    
+        # Phrase of every code, built up from its prefix
+        phrases = [bytes([symbol]) for symbol in range(256)]
+        for key, code in sorted(encoder.dictionary.items(), key=lambda item: item[1]):
+            phrases.append(phrases[key >> 8] + bytes([key & 0xFF]))
+        uses = np.bincount(np.asarray(codes, dtype=np.intp), minlength=len(phrases))
+        for code in np.flatnonzero(uses[256:]) + 256:
+            phrase = phrases[code]
+            scores[phrase] += int(uses[code]) * (len(phrase) - 1)
+    
+    chosen = set()
+    for phrase, _ in scores.most_common():
+        missing = [phrase[:end] for end in range(2, len(phrase) + 1) if phrase[:end] not in chosen]
+        if len(chosen) + len(missing) <= entries:
+            chosen.update(missing)
+        if len(chosen) >= entries:
+            break
+    return SeedDictionary(sorted(chosen, key=lambda phrase: (len(phrase), phrase)))
+
+def seed_path(seed_id, directory=None):
+    return os.path.join(directory or SEED_DIRECTORY, f"{seed_id:08x}.seed")
+
+def save_seed(seed, directory=None):
+    """
+    Writes a seed to the cache directory under its id and returns the path
+    """
+    path = seed_path(seed.seed_id, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(seed.to_bytes())
+    _loaded[seed.seed_id] = seed
+    return path
+
+def load_seed(seed_id, directory=None):
+    """
+    Returns the seed with this id, read from the cache directory the first
+    time it is asked for; None for id 0
+    """
+    if not seed_id:
+        return None
+    seed = _loaded.get(seed_id)
+    if seed is None:
+        try:
+            with open(seed_path(seed_id, directory), "rb") as f:
+                seed = SeedDictionary.from_bytes(f.read())
+        except FileNotFoundError:
+            raise ValueError(f"Seed dictionary {seed_id:08x} is not in {directory or SEED_DIRECTORY}") from None
+        if seed.seed_id != seed_id:
+            raise ValueError(f"Seed dictionary file for {seed_id:08x} holds {seed.seed_id:08x}")
+        _loaded[seed_id] = seed
+    return seed
+
+def main():
+    from PIL import Image
+    from .predictors import PREDICTORS, PREDICTOR_MODES
+    
+    parser = argparse.ArgumentParser(description="Train a seed dictionary on sample images and save it to the cache.")
+    parser.add_argument("images", nargs="+", help="sample images, coded channel by channel")
+    parser.add_argument("--predictor", default="left", choices=sorted(PREDICTOR_MODES), help="predictor the seed will be used with")
+    parser.add_argument("--entries", type=int, default=DEFAULT_ENTRIES, help="number of seed phrases")
+    parser.add_argument("--directory", default=None, help=f"cache directory (default {SEED_DIRECTORY})")
+    args = parser.parse_args()
+    
+    forward = PREDICTORS[PREDICTOR_MODES[args.predictor]][0]
+    samples = []
+    for path in args.images:
+        pixels = np.asarray(Image.open(path).convert("RGB"))
+        samples += [forward(pixels[:, :, k]) for k in range(3)]
+    seed = train_seed(samples, args.entries)
+    print(f"Seed {seed.seed_id:08x} with {len(seed)} phrases saved to {save_seed(seed, args.directory)}")
+
+if __name__ == "__main__":
+    main()
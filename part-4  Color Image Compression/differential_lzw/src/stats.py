@@ -0,0 +1,91 @@
+import numpy as np
+
+def _bin_indices(values):
+    """
+    Shifts integer values so the smallest possible one lands in bin 0
+    Returns the shifted values, the offset subtracted and the number of bins;
+    uint8 always gets 256 bins, signed values are shifted by their minimum.
+    """
+    values = np.asarray(values)
+    if values.dtype == np.uint8:
+        return values, 0, 256
+    if values.size == 0:
+        return values.astype(np.intp), 0, 1
+    offset = min(int(values.min()), 0)
+    shifted = values.astype(np.intp) - offset
+    return shifted, offset, int(shifted.max()) + 1
+
+def histogram(values):
+    """
+    Counts every value of an integer array with one bincount
+    Returns (counts, offset): counts[i] is the number of values equal to
+    i + offset, so signed differences need no dictionary.
+    """
+    shifted, offset, bins = _bin_indices(values)
+    return np.bincount(shifted.ravel(), minlength=bins), offset
+
+def entropies_from_counts(counts):
+    """
+    Entropy in bits of every distribution along the last axis of counts
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = counts / totals
+        terms = np.where(counts > 0, p * np.log2(p), 0.0)
+    # Clamped so rounding never reports a negative entropy
+    return np.maximum(-terms.sum(axis=-1), 0.0)
+
+def symbol_entropy(values):
+    """
+    Zero-order entropy in bits per symbol of an integer array
+    """
+    counts, _ = histogram(values)
+    return float(entropies_from_counts(counts)) if counts.sum() else 0.0
+
+def conditional_entropy(values):
+    """
+    First-order entropy H(x | left neighbour) in bits per symbol, over the
+    horizontally adjacent pairs of a 1D or 2D integer array
+    Counts pairs with a single bincount over left * bins + right, then
+    subtracts the entropy of the left symbols from that of the pairs.
+    """
+    shifted, _, bins = _bin_indices(values)
+    shifted = shifted.reshape(-1, shifted.shape[-1]) if shifted.ndim else shifted.reshape(1, 1)
+    left = shifted[:, :-1].astype(np.intp)
+    right = shifted[:, 1:]
+    if left.size == 0:
+        return 0.0
+    pairs = np.bincount((left * bins + right).ravel(), minlength=bins * bins)
+    return max(float(entropies_from_counts(pairs) - entropies_from_counts(np.bincount(left.ravel(), minlength=bins))), 0.0)
+
+def tile_entropies(pixels, tile_size=0):
+    """
+    Entropy of every tile of every channel of a (rows, cols) or
+    (rows, cols, channels) integer array, from a single bincount
+    Returns a (channels, tiles) array with the tiles in container.tile_boxes
+    order; tile_size 0 treats each channel as one tile.
+    """
+    shifted, _, bins = _bin_indices(pixels)
+    if shifted.ndim == 2:
+        shifted = shifted[:, :, np.newaxis]
+    rows, cols, channels = shifted.shape
+    if tile_size:
+        tile_cols = -(-cols // tile_size)
+        num_tiles = -(-rows // tile_size) * tile_cols
+        tiles = (np.arange(rows) // tile_size)[:, np.newaxis] * tile_cols + np.arange(cols) // tile_size
+    else:
+        num_tiles = 1
+        tiles = np.zeros((rows, cols), dtype=np.intp)
+    
+    # Each (channel, tile) pair gets its own run of bins
+    groups = tiles[:, :, np.newaxis] + np.arange(channels) * num_tiles
+    counts = np.bincount((groups * bins + shifted).ravel(), minlength=channels * num_tiles * bins)
+    return entropies_from_counts(counts.reshape(channels, num_tiles, bins))
+
+def channel_entropies(pixels):
+    """
+    Entropy of every channel of a (rows, cols, channels) array, or of a
+    single (rows, cols) channel, in one pass
+    """
+    return tile_entropies(pixels)[:, 0]
@@ -1,55 +1,64 @@
 import numpy as np
 
-def compute_differences(channel):
+def compute_differences(channel, dtype=np.int16):
     """
     Computes row-wise and column-wise differences for a channel
-    Returns the difference image
+    Returns the difference image; dtype=np.uint8 keeps a uint8 channel
+    unwidened and gives the differences modulo 256, which is what the byte
+    LZW encoder consumes.
     """
-    rows, cols = channel.shape
-    diff_image = np.zeros_like(channel, dtype=np.int16)
+    channel = np.asarray(channel, dtype=dtype)
+    diff_image = np.empty_like(channel)
     
     # First pixel remains unchanged
     diff_image[0, 0] = channel[0, 0]
     
-    # First row differences (left to right)
-    for j in range(1, cols):
-        diff_image[0, j] = int(channel[0, j]) - int(channel[0, j-1])
-    
     # First column differences (top to bottom)
-    for i in range(1, rows):
-        diff_image[i, 0] = int(channel[i, 0]) - int(channel[i-1, 0])
+    diff_image[1:, 0] = channel[1:, 0] - channel[:-1, 0]
     
-    # Rest of the image (row by row)
-    for i in range(1, rows):
-        for j in range(1, cols):
-            diff_image[i, j] = int(channel[i, j]) - int(channel[i, j-1])
+    # Every other pixel is differenced against its left neighbour
+    diff_image[:, 1:] = channel[:, 1:] - channel[:, :-1]
     
     return diff_image
 
 def restore_from_differences(diff_image):
     """
     Restores original image from differences
+    Sums run in uint8, which wraps modulo 256, so differences folded to
+    signed bytes restore the same way as unfolded ones.
     """
-    rows, cols = diff_image.shape
-    restored = np.zeros_like(diff_image, dtype=np.uint8)
+    steps = np.asarray(diff_image).astype(np.uint8)
     
-    # First pixel is unchanged
-    restored[0, 0] = diff_image[0, 0]
+    # Restore first column, then every row from its first pixel
+    steps[:, 0] = np.cumsum(steps[:, 0], dtype=np.uint8)
     
-    # Restore first row
-    for j in range(1, cols):
-        val = int(restored[0, j-1]) + int(diff_image[0, j])
-        restored[0, j] = val % 256
+    return np.cumsum(steps, axis=1, dtype=np.uint8)
+
+def compute_gradient_differences(channel):
+    """
+    Predicts every pixel as left + above - upper left and returns the
+    residuals modulo 256 (uint8)
+    That is the vertical difference followed by the horizontal one, so the
+    first row falls back to left differences and the first column to
+    above differences.
+    """
+    channel = np.asarray(channel, dtype=np.uint8)
     
-    # Restore first column
-    for i in range(1, rows):
-        val = int(restored[i-1, 0]) + int(diff_image[i, 0])
-        restored[i, 0] = val % 256
+    # Vertical differences, first row unchanged
+    vertical = np.empty_like(channel)
+    vertical[0] = channel[0]
+    np.subtract(channel[1:], channel[:-1], out=vertical[1:])
     
-    # Restore rest of the image
-    for i in range(1, rows):
-        for j in range(1, cols):
-            val = int(restored[i, j-1]) + int(diff_image[i, j])
-            restored[i, j] = val % 256
+    # Horizontal differences of those, first column unchanged
+    residuals = np.empty_like(channel)
+    residuals[:, 0] = vertical[:, 0]
+    np.subtract(vertical[:, 1:], vertical[:, :-1], out=residuals[:, 1:])
     
-    return restored 
\ No newline at end of file
+    return residuals
+
+def restore_from_gradient_differences(residuals):
+    """
+    Inverts compute_gradient_differences with two wrapping uint8 cumsums
+    """
+    vertical = np.cumsum(np.asarray(residuals).astype(np.uint8, copy=False), axis=1, dtype=np.uint8)
+    return np.cumsum(vertical, axis=0, dtype=np.uint8)
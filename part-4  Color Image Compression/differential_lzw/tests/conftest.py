@@ -0,0 +1,36 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+ROOT = os.path.join(HERE, os.pardir, os.pardir, os.pardir)
+
+# Tests import the package the same way the parts do
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+
+def load_part(name, path):
+    """
+    Imports one of the part scripts by path, as their directories are not packages
+    """
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope="session")
+def part1():
+    return load_part("LZW_basic", os.path.join("part1-textcompression", "LZW_basic.py"))
+
+@pytest.fixture(scope="session")
+def part2():
+    return load_part("LZW_basic_image", os.path.join("part2-grayimagecompression", "LZW_basic_image.py"))
+
+@pytest.fixture(scope="session")
+def gui():
+    return load_part("gui", os.path.join("part5", "gui.py"))
+
+@pytest.fixture(scope="session")
+def part3():
+    return load_part("gray_level", os.path.join("part-3 Image Compression (Gray level differences)", "gray_level.py"))
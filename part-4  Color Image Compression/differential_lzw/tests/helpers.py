@@ -0,0 +1,46 @@
+"""
+Sample channels and container round trips shared by the engine tests
+"""
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+from src.compression import compress_channels, decompress_channels
+from src.container import ContainerReader
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+DATA = os.path.join(HERE, 'data')
+IMAGE = os.path.join(HERE, os.pardir, 'color_image.bmp')
+
+# Odd shapes first: single pixels, rows and columns take the fallback paths of every predictor
+SHAPES = [(1, 1), (1, 9), (9, 1), (2, 2), (13, 19), (40, 33)]
+
+def sample(rows, cols):
+    """
+    A crop of the sample photo as [R, G, B] uint8 channels
+    """
+    pixels = np.asarray(Image.open(IMAGE).convert("RGB"))[100:100 + rows, 200:200 + cols]
+    return [np.ascontiguousarray(pixels[:, :, k]) for k in range(3)]
+
+def round_trip(channels, mode, box=None, workers=1, path=None, **options):
+    """
+    Writes channels to a container, in memory or at path, and decodes them (or box) back
+    """
+    if path is None:
+        f = io.BytesIO()
+        compress_channels(f, channels, mode, workers=workers, **options)
+        f.seek(0)
+        with ContainerReader(f) as reader:
+            return decompress_channels(reader, box, workers)
+    with open(path, "wb") as f:
+        compress_channels(f, channels, mode, workers=workers, **options)
+    with open(path, "rb") as f, ContainerReader(f) as reader:
+        return decompress_channels(reader, box, workers)
+
+def assert_channels_equal(restored, channels):
+    assert len(restored) == len(channels)
+    for got, expected in zip(restored, channels):
+        assert got.dtype == np.uint8
+        np.testing.assert_array_equal(got, expected)
@@ -0,0 +1,64 @@
+"""
+The alphabets between signed residuals and LZW bytes
+"""
+import numpy as np
+import pytest
+
+from src.alphabet import (ALPHABET_BYTES, ALPHABET_ZIGZAG, ESCAPE, zigzag, unzigzag, fold_bytes, unfold_bytes,
+                          escape_bytes, unescape_bytes, to_symbols, from_symbols)
+
+def residuals():
+    rng = np.random.default_rng(0)
+    extremes = np.array([0, -1, 1, 127, -127, 128, -128, 255, -255, 256, -256, 32767, -32768], dtype=np.int16)
+    return np.concatenate((extremes, rng.integers(-300, 301, 2000), rng.integers(-32768, 32768, 200))).astype(np.int16)
+
+def test_zigzag_order():
+    assert zigzag([0, -1, 1, -2, 2, 32767, -32768]).tolist() == [0, 1, 2, 3, 4, 65534, 65535]
+
+def test_zigzag_round_trip():
+    values = np.arange(-32768, 32768, dtype=np.int16)
+    codes = zigzag(values)
+    assert codes.dtype == np.uint16 and np.unique(codes).size == values.size
+    np.testing.assert_array_equal(unzigzag(codes), values)
+
+def test_small_values_take_one_byte():
+    # 127 zigzags to 254 and -128 to 255, the escape itself
+    assert escape_bytes(np.array([0, -1, 127], dtype=np.int16)).tolist() == [0, 1, 254]
+    assert escape_bytes(np.array([-128], dtype=np.int16)).tolist() == [ESCAPE, 0, 255]
+    assert escape_bytes(np.array([-32768], dtype=np.int16)).tolist() == [ESCAPE, 255, 255]
+
+def test_escape_round_trip():
+    values = residuals()
+    symbols = escape_bytes(values)
+    assert symbols.dtype == np.uint8
+    np.testing.assert_array_equal(unescape_bytes(symbols), values)
+
+def test_escaped_bytes_are_not_escapes():
+    # The value bytes of an escape may themselves be ESCAPE
+    values = np.array([-32768, -32768, 3, -128], dtype=np.int16)
+    np.testing.assert_array_equal(unescape_bytes(escape_bytes(values)), values)
+
+def test_truncated_escape():
+    with pytest.raises(ValueError):
+        unescape_bytes(np.array([3, ESCAPE, 1], dtype=np.uint8))
+
+def test_fold_bytes():
+    values = np.array([-128, -1, 0, 127, 255, -255], dtype=np.int16)
+    assert fold_bytes(values).tolist() == [128, 255, 0, 127, 255, 1]
+    # Exact within a signed byte, modulo 256 outside it
+    assert unfold_bytes(fold_bytes(values)).tolist() == [-128, -1, 0, 127, -1, 1]
+
+@pytest.mark.parametrize("alphabet", [ALPHABET_BYTES, ALPHABET_ZIGZAG])
+def test_symbols_round_trip(alphabet):
+    values = np.clip(residuals(), -128, 127) if alphabet == ALPHABET_BYTES else residuals()
+    symbols = to_symbols(values.reshape(-1, 1), alphabet)
+    assert symbols.ndim == 1 and symbols.dtype == np.uint8
+    result = from_symbols(symbols, alphabet)
+    assert result.dtype == np.int16
+    np.testing.assert_array_equal(result, values)
+
+def test_unknown_alphabet():
+    with pytest.raises(ValueError):
+        to_symbols(residuals(), 'signed')
+    with pytest.raises(ValueError):
+        from_symbols(np.zeros(3, np.uint8), 'base64')
@@ -0,0 +1,102 @@
+"""
+Bit packing of code streams: widths grow with the dictionary the decoder
+rebuilds, drop back after CLEAR codes and stop at max_width
+"""
+import struct
+
+import numpy as np
+import pytest
+
+from src.bitio import (MIN_CODE_WIDTH, BitReader, BitWriter, code_width, pack_codes, unpack_codes, codes_to_bytes,
+                       codes_from_bytes)
+from src.lzw import lzw_encode
+
+def valid_codes(count, base_size=256, max_width=16, seed=0):
+    """
+    Random codes that a decoder could meet at each position of a stream
+    """
+    rng = np.random.default_rng(seed)
+    return [int(rng.integers(0, min(base_size + i, 1 << max_width))) for i in range(count)]
+
+def packed_bits(count, base_size=256, max_width=16):
+    return sum(code_width(i, base_size, max_width) for i in range(count))
+
+def test_bit_writer_round_trip():
+    values = [(1, 1), (0, 3), (511, 9), (5, 3), (65535, 16), (0, 9), (300, 12)]
+    writer = BitWriter()
+    for value, width in values:
+        writer.write(value, width)
+    data = writer.flush()
+    assert len(data) == -(-sum(width for _, width in values) // 8)
+    reader = BitReader(data)
+    assert [reader.read(width) for _, width in values] == [value for value, _ in values]
+    # Only the zero padding of the last byte is left
+    assert reader.bits_left() < 8
+
+def test_bit_reader_rejects_short_input():
+    reader = BitReader(b'\xff')
+    with pytest.raises(ValueError):
+        reader.read(9)
+
+@pytest.mark.parametrize("base_size", [256, 257, 511])
+def test_code_width_grows_when_dictionary_doubles(base_size):
+    widths = [code_width(i, base_size) for i in range(70000)]
+    assert widths[0] == max(MIN_CODE_WIDTH, (base_size - 1).bit_length())
+    for i in range(1, len(widths)):
+        # Code i can name any of the base_size + i - 1 entries of the decoder's dictionary
+        assert (1 << widths[i]) >= base_size + i - 1 or widths[i] == 16
+        assert widths[i] - widths[i - 1] in (0, 1)
+    assert widths[-1] == 16
+
+def test_code_width_first_growth():
+    assert code_width(256) == 9
+    assert code_width(257) == 10
+    assert code_width(769) == 11
+    assert code_width(10 ** 6, max_width=12) == 12
+
+@pytest.mark.parametrize("max_width", [9, 10, 12, 16])
+def test_pack_round_trip(max_width):
+    codes = valid_codes(5000, max_width=max_width)
+    data = pack_codes(codes, max_width=max_width)
+    assert len(data) == -(-packed_bits(len(codes), max_width=max_width) // 8)
+    assert unpack_codes(data, len(codes), max_width=max_width) == codes
+    # Without a count the reader stops at the padding
+    assert unpack_codes(data, max_width=max_width) == codes
+
+def test_pack_round_trip_lzw_stream():
+    data = bytes(np.random.default_rng(1).integers(0, 4, 20000, dtype=np.uint8))
+    codes = lzw_encode(data, max_code_width=12)
+    assert unpack_codes(pack_codes(codes, max_width=12), len(codes), max_width=12) == codes
+
+def test_packed_is_smaller_than_16_bits():
+    codes = valid_codes(3000)
+    assert len(pack_codes(codes)) < len(codes) * 2
+
+def test_clear_code_restarts_widths():
+    # 300 codes grow to 10 bits; after the CLEAR code (256) the next code is 9 bits again
+    first = [code if code != 256 else 255 for code in valid_codes(300, base_size=257)]
+    second = [code if code != 256 else 255 for code in valid_codes(10, base_size=257, seed=1)]
+    codes = first + [256] + second
+    data = pack_codes(codes, clear_codes=True)
+    bits = packed_bits(len(first) + 1, base_size=257) + packed_bits(len(second), base_size=257)
+    assert len(data) == -(-bits // 8)
+    assert unpack_codes(data, len(codes), clear_codes=True) == codes
+
+def test_seed_size_starts_wider():
+    codes = valid_codes(400, base_size=256 + 300)
+    data = pack_codes(codes, seed_size=300)
+    assert len(data) == -(-packed_bits(len(codes), base_size=556) // 8)
+    assert unpack_codes(data, len(codes), seed_size=300) == codes
+
+@pytest.mark.parametrize("codes", [[], [0], [1, 255, 256, 4095, 65535], valid_codes(1000)])
+def test_fixed_width_codes_match_struct(codes):
+    data = codes_to_bytes(codes)
+    assert data == b''.join(struct.pack(">H", code) for code in codes)
+    decoded = codes_from_bytes(data)
+    assert list(decoded) == codes
+    # Decoders iterate over plain ints
+    assert all(type(code) is int for code in decoded)
+
+def test_fixed_width_codes_from_memoryview():
+    data = codes_to_bytes(valid_codes(100))
+    assert list(codes_from_bytes(memoryview(data)[2:])) == list(codes_from_bytes(data))[1:]
@@ -0,0 +1,104 @@
+"""
+The color transforms undo exactly over the whole RGB cube, match the
+textbook transforms where those fit in a byte, and are picked only where
+they lower the residual entropy
+"""
+import numpy as np
+import pytest
+
+from src.color import (COLOR_NONE, COLOR_SUBTRACT_GREEN, COLOR_YCOCG_R, COLOR_RCT, COLOR_TRANSFORMS, forward_color,
+                       inverse_color, pick_color_transform)
+from src.predictors import PREDICTORS
+from src.container import MODE_MED
+from src.stats import symbol_entropy
+
+from helpers import SHAPES, sample
+
+def cube():
+    """
+    Every combination of 18 levels per channel, the corners and the
+    values next to them included, as (1, 5832) channels
+    """
+    levels = np.array([0, 1, 2, 63, 64, 100, 126, 127, 128, 129, 130, 170, 200, 253, 254, 255, 32, 224], dtype=np.uint8)
+    r, g, b = np.meshgrid(levels, levels, levels, indexing='ij')
+    return [r.reshape(1, -1), g.reshape(1, -1), b.reshape(1, -1)]
+
+@pytest.mark.parametrize("transform", sorted(COLOR_TRANSFORMS.values()))
+def test_inverse_over_the_cube(transform):
+    channels = cube()
+    transformed = forward_color(channels, transform)
+    assert all(channel.dtype == np.uint8 for channel in transformed)
+    restored = inverse_color(transformed, transform)
+    for got, expected in zip(restored, channels):
+        np.testing.assert_array_equal(got, expected)
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("transform", sorted(COLOR_TRANSFORMS.values()))
+def test_inverse_of_crops(shape, transform):
+    channels = sample(*shape)
+    transformed = forward_color(channels, transform)
+    # Regions decode crops of the transformed channels
+    crop = [channel[shape[0] // 2:, 1:] for channel in transformed]
+    for got, expected in zip(inverse_color(crop, transform), channels):
+        np.testing.assert_array_equal(got, expected[shape[0] // 2:, 1:])
+
+def small_differences():
+    """
+    The cube entries whose textbook transforms fit in signed bytes
+    """
+    r, g, b = (channel.astype(int).ravel() for channel in cube())
+    keep = (abs(r - b) <= 127) & (abs(g - b - (r - b) // 2) <= 127) & (abs(b - g) <= 127) & (abs(r - g) <= 127)
+    return r[keep], g[keep], b[keep]
+
+def test_ycocg_r_matches_textbook():
+    r, g, b = small_differences()
+    co = r - b
+    t = b + (co >> 1)
+    cg = g - t
+    y = t + (cg >> 1)
+    got = forward_color([r.astype(np.uint8), g.astype(np.uint8), b.astype(np.uint8)], COLOR_YCOCG_R)
+    for channel, expected in zip(got, (y, co, cg)):
+        np.testing.assert_array_equal(channel, expected % 256)
+
+def test_rct_matches_textbook():
+    r, g, b = small_differences()
+    got = forward_color([r.astype(np.uint8), g.astype(np.uint8), b.astype(np.uint8)], COLOR_RCT)
+    for channel, expected in zip(got, ((r + 2 * g + b) >> 2, b - g, r - g)):
+        np.testing.assert_array_equal(channel, expected % 256)
+
+def test_subtract_green():
+    r, g, b = forward_color([np.array([10], np.uint8), np.array([30], np.uint8), np.array([255], np.uint8)], COLOR_SUBTRACT_GREEN)
+    assert (r.tolist(), g.tolist(), b.tolist()) == ([236], [30], [225])
+
+def test_unknown_transform():
+    channels = sample(2, 2)
+    with pytest.raises(ValueError):
+        forward_color(channels, 9)
+    with pytest.raises(ValueError):
+        inverse_color(channels, 9)
+
+ALL = (COLOR_SUBTRACT_GREEN, COLOR_YCOCG_R, COLOR_RCT)
+
+def residual_entropy(channels, transform):
+    return sum(symbol_entropy(PREDICTORS[MODE_MED][0](channel)) for channel in forward_color(channels, transform))
+
+def test_pick_leaves_uncorrelated_channels():
+    rng = np.random.default_rng(0)
+    channels = [rng.integers(0, 256, (40, 33), dtype=np.uint8) for _ in range(3)]
+    assert pick_color_transform(channels, PREDICTORS[MODE_MED][0], ALL) == COLOR_NONE
+
+def test_pick_lowest_entropy():
+    channels = sample(40, 33)
+    picked = pick_color_transform(channels, PREDICTORS[MODE_MED][0], ALL)
+    assert picked != COLOR_NONE
+    assert residual_entropy(channels, picked) == min(residual_entropy(channels, transform) for transform in ALL)
+
+def test_pick_needs_min_gain():
+    channels = sample(40, 33)
+    assert pick_color_transform(channels, PREDICTORS[MODE_MED][0], ALL, min_gain=1.0) == COLOR_NONE
+
+def test_pick_only_from_transforms():
+    # R = G = B: subtract green zeroes R and B, but only the transforms on offer are tried
+    gray = sample(40, 33)[1]
+    assert pick_color_transform([gray, gray, gray], PREDICTORS[MODE_MED][0], (COLOR_SUBTRACT_GREEN,)) == COLOR_SUBTRACT_GREEN
+    assert pick_color_transform([gray, gray, gray], PREDICTORS[MODE_MED][0], ()) == COLOR_NONE
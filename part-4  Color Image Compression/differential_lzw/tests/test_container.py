@@ -0,0 +1,125 @@
+"""
+The versioned container: headers round-trip and stay readable by later
+versions, every mode and option decodes, and files written by earlier
+versions (containers and the headerless layouts before them) keep decoding
+"""
+import io
+import os
+import struct
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.color import COLOR_SUBTRACT_GREEN, COLOR_TRANSFORMS
+from src.compression import decompress_channels, decompress_color_image
+from src.container import (MODE_DIFFERENCES, MODE_MED, MODE_PAETH, HEADER, ContainerHeader, ContainerReader,
+                           is_container)
+from src.lzw import ResetWhenFull, ResetOnRatioDrop
+from src.predictors import PREDICTORS
+
+from helpers import DATA, SHAPES, sample, round_trip, assert_channels_equal
+
+@pytest.mark.parametrize("header, version", [
+    (ContainerHeader(MODE_DIFFERENCES, 3, 13, 19), 1),
+    (ContainerHeader(MODE_MED, 1, 1, 1, 12, True, 8), 1),
+    (ContainerHeader(MODE_MED, 3, 40, 33, color_transform=COLOR_SUBTRACT_GREEN), 2),
+    (ContainerHeader(MODE_PAETH, 3, 40, 33, 16, run_length=True), 2),
+    (ContainerHeader(MODE_MED, 3, 40, 33, 12, tile_size=16, seed_id=0x12345678), 3),
+])
+def test_header_round_trip(header, version):
+    # Each header is written with the oldest version that can hold it
+    data = header.pack()
+    assert data[len(b'DLZW')] == version
+    f = io.BytesIO(data + b'rest')
+    assert is_container(f)
+    assert vars(ContainerHeader.unpack(f)) == vars(header)
+    assert f.read() == b'rest'
+
+def test_header_skips_later_fields():
+    # A later revision may append fields; readers skip what they do not know
+    header = ContainerHeader(MODE_MED, 3, 40, 33, color_transform=COLOR_SUBTRACT_GREEN)
+    data = bytearray(header.pack())
+    size = int.from_bytes(data[5:7], 'big')
+    data[5:7] = (size + 4).to_bytes(2, 'big')
+    f = io.BytesIO(bytes(data) + b'\0\0\0\0rest')
+    assert vars(ContainerHeader.unpack(f)) == vars(header)
+    assert f.read() == b'rest'
+
+def test_header_rejects_newer_version():
+    data = bytearray(ContainerHeader(MODE_MED, 3, 4, 4).pack())
+    data[4] = 99
+    with pytest.raises(ValueError):
+        ContainerHeader.unpack(io.BytesIO(bytes(data)))
+
+def test_is_container_leaves_position():
+    f = io.BytesIO(struct.pack(">II", 13, 19) + b'\0' * 20)
+    assert not is_container(f)
+    assert f.tell() == 0
+
+@pytest.mark.parametrize("mode", sorted(PREDICTORS))
+@pytest.mark.parametrize("shape", SHAPES)
+def test_container_round_trip(mode, shape):
+    channels = sample(*shape)
+    assert_channels_equal(round_trip(channels, mode), channels)
+
+@pytest.mark.parametrize("options", [
+    {'max_code_width': 9},
+    {'max_code_width': 9, 'reset_policy': ResetWhenFull()},
+    {'max_code_width': 10, 'reset_policy': ResetOnRatioDrop(window=16)},
+    {'tile_size': 16, 'max_code_width': 12, 'run_length': True},
+    {'run_length': True, 'color_transform': COLOR_SUBTRACT_GREEN},
+    {'color_transform': COLOR_TRANSFORMS['ycocg_r'], 'tile_size': 8},
+    {'color_transform': COLOR_TRANSFORMS['rct'], 'max_code_width': 12},
+])
+@pytest.mark.parametrize("shape", [(1, 1), (1, 40), (40, 1), (40, 33)])
+def test_container_options(options, shape):
+    channels = sample(*shape)
+    assert_channels_equal(round_trip(channels, MODE_MED, **options), channels)
+
+def test_container_on_disk(tmp_path):
+    # Files on disk are memory-mapped, unlike the in-memory streams above
+    channels = sample(40, 33)
+    path = str(tmp_path / "image.bin")
+    assert_channels_equal(round_trip(channels, MODE_PAETH, path=path, tile_size=16, run_length=True), channels)
+
+def test_grayscale_container():
+    channels = sample(13, 19)[:1]
+    assert_channels_equal(round_trip(channels, MODE_DIFFERENCES), channels)
+
+# Containers written by earlier versions, all of a 13x19 crop of the sample photo
+@pytest.mark.parametrize("name, version", [
+    ('v1_left.bin', 1),                  # left differences, fixed 16-bit codes
+    ('v1_med_packed_tiled.bin', 1),      # MED, 9-bit packed codes with clear codes, 8x8 tiles
+    ('v2_paeth_color_runs.bin', 2),      # Paeth, subtract green, run-length marker per record
+])
+def test_existing_container(name, version):
+    with open(os.path.join(DATA, name), "rb") as f, ContainerReader(f) as reader:
+        assert f.seek(0) == 0 and f.read(HEADER.size)[4] == version
+        assert_channels_equal(decompress_channels(reader), sample(13, 19))
+
+# The headerless layouts written before the container, by the original code, of the same crop
+def crop(mode):
+    pixels = np.stack(sample(13, 19), axis=-1)
+    return pixels if mode == "RGB" else np.asarray(Image.fromarray(pixels).convert("L"))
+
+def test_existing_color_file(tmp_path):
+    # Dimensions, first pixels, then 16-bit codes per channel
+    restored = decompress_color_image(os.path.join(DATA, 'legacy_color.bin'), str(tmp_path / "restored.bmp"))
+    np.testing.assert_array_equal(np.asarray(restored), crop("RGB"))
+
+def test_existing_part2_file(part2, tmp_path):
+    # Nothing but 16-bit codes; the shape comes from the caller
+    path = part2.decompress_image(os.path.join(DATA, 'legacy_gray.bin'), str(tmp_path / "restored.png"), (13, 19))
+    np.testing.assert_array_equal(np.asarray(Image.open(path)), crop("L"))
+
+@pytest.mark.parametrize("level", [1, 2, 3])
+def test_existing_gui_file(gui, tmp_path, level):
+    # Height and width, then 16-bit codes per channel
+    restored = getattr(gui, f"level{level}_decompress")(os.path.join(DATA, f'legacy_level{level}.bin'),
+                                                          str(tmp_path / "restored.bmp"))
+    expected = crop("RGB" if level == 3 else "L")
+    if level > 1:
+        # These levels never stored the first pixel, so the original decoder restored every pixel relative to 0
+        expected = expected - expected[0, 0]
+    np.testing.assert_array_equal(np.asarray(restored), expected)
@@ -0,0 +1,86 @@
+"""
+The five GUI levels: each round-trips with every option, writes the container
+options it stands for, and the results panel forgets them when an option changes
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.color import COLOR_NONE
+from src.container import MODE_RAW, MODE_DIFFERENCES, MODE_MED, ContainerHeader
+from src.lzw import ResetWhenFull, ResetOnRatioDrop
+
+from helpers import sample
+
+OPTIONS = [
+    {},
+    {'max_code_width': 12},
+    {'max_code_width': 9, 'reset_policy': ResetWhenFull()},
+    {'tile_size': 16},
+    {'tile_size': 16, 'workers': 2, 'reset_policy': ResetOnRatioDrop()},
+]
+
+@pytest.fixture
+def image(tmp_path):
+    path = str(tmp_path / "image.bmp")
+    Image.fromarray(np.stack(sample(40, 33), axis=-1)).save(path)
+    return path
+
+def header(path):
+    with open(path, "rb") as f:
+        return ContainerHeader.unpack(f)
+
+@pytest.mark.parametrize("options", OPTIONS)
+@pytest.mark.parametrize("level", [1, 2, 3, 4, 5])
+def test_level_round_trip(gui, image, tmp_path, level, options):
+    compressed = getattr(gui, f"level{level}_compress")(image, str(tmp_path / "image.bin"), **options)
+    restored = getattr(gui, f"level{level}_decompress")(compressed, str(tmp_path / "restored.bmp"), options.get('workers', 1))
+    expected = Image.open(image).convert("L" if level < 3 else "RGB")
+    np.testing.assert_array_equal(np.asarray(restored), np.asarray(expected))
+    np.testing.assert_array_equal(np.asarray(Image.open(str(tmp_path / "restored.bmp"))), np.asarray(expected))
+
+@pytest.mark.parametrize("level, mode, channels, max_code_width, run_length",
+                         [(1, MODE_RAW, 1, None, False), (2, MODE_DIFFERENCES, 1, None, False),
+                          (3, MODE_DIFFERENCES, 3, None, False), (4, MODE_MED, 3, 16, True), (5, MODE_MED, 3, 16, True)])
+def test_level_options(gui, image, tmp_path, level, mode, channels, max_code_width, run_length):
+    written = header(getattr(gui, f"level{level}_compress")(image, str(tmp_path / "image.bin")))
+    assert (written.mode, written.channels, written.max_code_width, written.run_length) == (mode, channels, max_code_width, run_length)
+    assert not written.clear_codes
+    if level < 5:
+        assert written.color_transform == COLOR_NONE
+
+def test_level5_picks_a_color_transform(gui, image, tmp_path):
+    # R, G and B of a photo move together, so a transform lowers the residual entropy
+    assert header(gui.level5_compress(image, str(tmp_path / "image.bin"))).color_transform != COLOR_NONE
+
+def test_level5_leaves_uncorrelated_channels(gui, tmp_path):
+    path = str(tmp_path / "noise.bmp")
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (40, 33, 3), dtype=np.uint8)).save(path)
+    assert header(gui.level5_compress(path, str(tmp_path / "image.bin"))).color_transform == COLOR_NONE
+
+def test_level5_resets_only_dictionaries_that_fill(gui, image, tmp_path):
+    # 40 x 33 symbols fill a 9-bit dictionary but not a 16-bit one, nor the 9-bit one of a 16 x 16 tile
+    assert header(gui.level5_compress(image, str(tmp_path / "a.bin"), max_code_width=9)).clear_codes
+    assert not header(gui.level5_compress(image, str(tmp_path / "b.bin"))).clear_codes
+    assert not header(gui.level5_compress(image, str(tmp_path / "c.bin"), max_code_width=9, tile_size=16)).clear_codes
+
+def test_level5_is_at_least_level4(gui, image, tmp_path):
+    level4 = len(open(gui.level4_compress(image, str(tmp_path / "level4.bin")), "rb").read())
+    level5 = len(open(gui.level5_compress(image, str(tmp_path / "level5.bin")), "rb").read())
+    assert level5 <= level4
+
+@pytest.mark.parametrize("setter, value", [("set_max_code_width", 12), ("set_reset_policy", ResetWhenFull()),
+                                           ("set_workers", 2), ("set_tile_size", 64)])
+def test_options_clear_level_results(gui, monkeypatch, setter, value):
+    # The setters change module globals, so they are put back afterwards
+    for name in ("max_code_width", "reset_policy", "workers", "tile_size"):
+        monkeypatch.setattr(gui, name, getattr(gui, name))
+    gui.level_results[3] = (0.5, 1.0)
+    getattr(gui, setter)(value)
+    assert gui.level_results == {}
+
+def test_level_change_keeps_level_results(gui, monkeypatch):
+    monkeypatch.setattr(gui, "compression_level", gui.compression_level)
+    monkeypatch.setattr(gui, "level_results", {3: (0.5, 1.0)})
+    gui.set_compression_level(4)
+    assert gui.level_results == {3: (0.5, 1.0)}
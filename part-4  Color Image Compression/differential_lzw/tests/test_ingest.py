@@ -0,0 +1,59 @@
+"""
+Pixels go to the encoder from strided channel views, and give the codes the
+original split, copy and tolist path gave
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.compression import compress_channel
+from src.container import MODE_DIFFERENCES
+from src.utils import compute_differences
+from src.lzw import lzw_compress_gray
+
+from helpers import IMAGE, SHAPES
+
+def reference_codes(channel):
+    """
+    The original path: int16 differences as a list of Python ints, folded to bytes
+    """
+    data = [(x + 256) % 256 for x in compute_differences(np.array(channel)).flatten().tolist()]
+    dictionary = {bytes([i]): i for i in range(256)}
+    w = bytes(data[:1])
+    codes = []
+    for x in data[1:]:
+        wc = w + bytes([x])
+        if wc in dictionary:
+            w = wc
+        else:
+            codes.append(dictionary[w])
+            if len(dictionary) < 1 << 16:
+                dictionary[wc] = len(dictionary)
+            w = bytes([x])
+    if w:
+        codes.append(dictionary[w])
+    return codes
+
+def pixels(rows, cols):
+    return np.asarray(Image.open(IMAGE).convert("RGB"))[100:100 + rows, 200:200 + cols]
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_channel_views_match_original_path(shape):
+    image = pixels(*shape)
+    for k in range(3):
+        view = image[:, :, k]
+        assert not view.flags['C_CONTIGUOUS'] or view.size == 1
+        differences = compute_differences(view, np.uint8)
+        assert lzw_compress_gray(differences) == reference_codes(view)
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_views_and_copies_give_the_same_record(shape):
+    image = pixels(*shape)
+    for k in range(3):
+        view_record, _ = compress_channel(image[:, :, k], mode=MODE_DIFFERENCES)
+        copy_record, _ = compress_channel(np.array(image[:, :, k]), mode=MODE_DIFFERENCES)
+        assert view_record == copy_record
+
+def test_signed_differences_fold_like_the_list_path():
+    differences = np.array([0, -1, 255, -256, 127, -128, 1], dtype=np.int16)
+    assert lzw_compress_gray(differences) == lzw_compress_gray(np.array([(x + 256) % 256 for x in differences.tolist()]))
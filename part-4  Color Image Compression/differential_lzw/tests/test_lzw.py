@@ -0,0 +1,152 @@
+"""
+The LZW encoder against a textbook bytes-keyed implementation, and the
+decoders against the encoder
+"""
+import numpy as np
+import pytest
+
+from src.bitio import pack_codes, unpack_codes
+from src.lzw import (CLEAR_CODE, LZWEncoder, LZWDecoder, ResetWhenFull, ResetOnRatioDrop, lzw_encode, lzw_decode,
+                     lzw_compress_gray, lzw_decompress_gray)
+
+def reference_encode(data, max_code_width=16):
+    """
+    Textbook LZW with bytes keys, freezing the dictionary at 2**max_code_width entries
+    """
+    dictionary = {bytes([i]): i for i in range(256)}
+    w = b''
+    codes = []
+    for c in data:
+        wc = w + bytes([c])
+        if wc in dictionary:
+            w = wc
+        else:
+            codes.append(dictionary[w])
+            if max_code_width is None or len(dictionary) < 1 << max_code_width:
+                dictionary[wc] = len(dictionary)
+            w = bytes([c])
+    if w:
+        codes.append(dictionary[w])
+    return codes
+
+def inputs():
+    rng = np.random.default_rng(0)
+    return {
+        'empty': b'',
+        'single': b'a',
+        'repeat': b'a' * 1000,
+        'text': b'TOBEORNOTTOBEORTOBEORNOT#' * 40,
+        'few symbols': bytes(rng.integers(0, 3, 30000, dtype=np.uint8)),
+        'noise': bytes(rng.integers(0, 256, 30000, dtype=np.uint8)),
+    }
+
+@pytest.mark.parametrize("name", list(inputs()))
+@pytest.mark.parametrize("max_code_width", [None, 9, 12, 16])
+def test_encoder_matches_reference(name, max_code_width):
+    data = inputs()[name]
+    assert lzw_encode(data, max_code_width) == reference_encode(data, max_code_width)
+
+@pytest.mark.parametrize("chunk", [1, 7, 4096])
+def test_encoder_in_chunks(chunk):
+    data = inputs()['few symbols']
+    encoder = LZWEncoder(12)
+    codes = []
+    for start in range(0, len(data), chunk):
+        codes += encoder.encode(data[start:start + chunk])
+    codes += encoder.finish()
+    assert codes == lzw_encode(data, 12)
+
+def test_encoder_stops_growing_at_max_width():
+    codes = lzw_encode(inputs()['noise'], 9)
+    assert max(codes) < 1 << 9
+
+def test_compress_gray_wraps_negative_differences():
+    differences = np.array([[-1, 0, 1], [-128, 127, -1]], dtype=np.int16)
+    assert lzw_compress_gray(differences) == lzw_encode(differences.astype(np.uint8).tobytes())
+
+@pytest.mark.parametrize("name", list(inputs()))
+@pytest.mark.parametrize("max_code_width", [None, 9, 12, 16])
+def test_decode_round_trip(name, max_code_width):
+    data = inputs()[name]
+    codes = lzw_encode(data, max_code_width)
+    assert lzw_decode(codes, len(data), max_code_width).tobytes() == data
+    # Without a size the buffer grows as needed
+    assert lzw_decode(codes, None, max_code_width).tobytes() == data
+
+@pytest.mark.parametrize("chunk", [1, 5, 1000])
+def test_incremental_decoder(chunk):
+    data = inputs()['text'] + inputs()['few symbols']
+    codes = lzw_encode(data, 12)
+    decoder = LZWDecoder(12)
+    assert b''.join(decoder.decode(codes[start:start + chunk]) for start in range(0, len(codes), chunk)) == data
+
+def test_decode_progress_counts_every_symbol():
+    # More codes than PROGRESS_INTERVAL, so progress is called more than once
+    data = bytes(np.random.default_rng(2).integers(0, 256, 200000, dtype=np.uint8))
+    codes = lzw_encode(data)
+    counts = []
+    assert lzw_decode(codes, len(data), progress=counts.append).tobytes() == data
+    assert sum(counts) == len(data) and len(counts) > 1
+
+def test_decompress_gray_is_signed():
+    differences = np.array([-128, -1, 0, 1, 127] * 20, dtype=np.int8)
+    codes = lzw_compress_gray(differences)
+    np.testing.assert_array_equal(lzw_decompress_gray(codes, size=differences.size), differences)
+
+def test_decode_truncated_stream():
+    data = inputs()['text']
+    codes = lzw_encode(data)
+    with pytest.raises(ValueError, match="expected"):
+        lzw_decode(codes[:-3], len(data))
+
+def test_decode_longer_than_size():
+    data = inputs()['text']
+    with pytest.raises(ValueError):
+        lzw_decode(lzw_encode(data), len(data) - 1)
+
+@pytest.mark.parametrize("codes", [
+    [256],            # names an entry before there is a phrase to build it from
+    [65, 258],        # beyond the next entry
+    [65, 66, 300],
+])
+def test_decode_invalid_code(codes):
+    with pytest.raises(ValueError, match="Invalid compressed code"):
+        lzw_decode(codes)
+    with pytest.raises(ValueError, match="Invalid compressed code"):
+        LZWDecoder().decode(codes)
+
+def shifting_data():
+    """
+    Two halves with different statistics, so a dictionary built on the
+    first stops paying off in the second
+    """
+    rng = np.random.default_rng(3)
+    return bytes(rng.integers(0, 4, 40000, dtype=np.uint8)) + bytes(rng.integers(100, 140, 40000, dtype=np.uint8))
+
+@pytest.mark.parametrize("policy", [ResetWhenFull, lambda: ResetOnRatioDrop(window=64)])
+@pytest.mark.parametrize("max_code_width", [9, 12])
+def test_reset_round_trip(policy, max_code_width):
+    data = shifting_data()
+    codes = lzw_encode(data, max_code_width, policy())
+    assert CLEAR_CODE in codes
+    assert max(codes) < 1 << max_code_width
+    assert lzw_decode(codes, len(data), max_code_width, clear_codes=True).tobytes() == data
+    assert LZWDecoder(max_code_width, clear_codes=True).decode(codes) == data
+    packed = pack_codes(codes, max_width=max_code_width, clear_codes=True)
+    assert unpack_codes(packed, len(codes), max_width=max_code_width, clear_codes=True) == codes
+
+def test_reset_when_full_clears_every_time():
+    codes = lzw_encode(bytes(np.random.default_rng(4).integers(0, 256, 20000, dtype=np.uint8)), 9, ResetWhenFull())
+    # Each dictionary holds 512 - 257 phrases before it is cleared
+    assert codes.count(CLEAR_CODE) >= 20000 // (2 * 512)
+
+def test_ratio_drop_keeps_a_dictionary_that_still_works():
+    data = b"abcd" * 50000
+    assert CLEAR_CODE not in lzw_encode(data, 9, ResetOnRatioDrop(window=64))
+
+def test_no_policy_freezes_the_dictionary():
+    # Without a policy 256 is an ordinary phrase code, not CLEAR_CODE
+    data = shifting_data()
+    codes = lzw_encode(data, 9)
+    assert max(codes) < 1 << 9
+    assert lzw_decode(codes, len(data), 9).tobytes() == data
@@ -0,0 +1,69 @@
+"""
+part1 text compression: the bit-packed file layout of the original
+string-of-bits writer, and the streaming compressor
+"""
+import io
+from array import array
+
+import pytest
+
+TEXTS = ["", "a", "TOBEORNOTTOBEORTOBEORNOT", "abc" * 3000, "ğüşıöç é" * 50]
+
+def reference_file(compressed):
+    """
+    The bytes the original writer produced, one '0'/'1' character per bit
+    """
+    binary_string = ''.join(format(num, '016b') for num in compressed)
+    padding = 8 - (len(binary_string) % 8)
+    binary_string = format(padding, '08b') + binary_string + ('0' * padding)
+    return bytes(int(binary_string[i:i + 8], 2) for i in range(0, len(binary_string), 8))
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_compress_round_trip(part1, text):
+    text = text.encode("utf-8").decode("latin-1")
+    assert part1.decompress(part1.compress(text)) == text
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_file_layout_unchanged(part1, tmp_path, text):
+    path = str(tmp_path / "compressed.bin")
+    codes = part1.compress(text.encode("utf-8").decode("latin-1"))
+    part1.save_compressed_to_file(codes, path)
+    with open(path, "rb") as f:
+        assert f.read() == reference_file(codes)
+    read = part1.read_compressed_from_file(path)
+    assert isinstance(read, array) and list(read) == list(codes)
+
+@pytest.mark.parametrize("code_width", [9, 12, 13])
+def test_narrower_codes(part1, tmp_path, code_width):
+    path = str(tmp_path / "compressed.bin")
+    codes = [0, 1, 255, (1 << code_width) - 1] * 7
+    part1.save_compressed_to_file(codes, path, code_width)
+    assert list(part1.read_compressed_from_file(path, code_width)) == codes
+
+def test_code_too_wide(part1, tmp_path):
+    with pytest.raises(ValueError):
+        part1.save_compressed_to_file([512], str(tmp_path / "compressed.bin"), 9)
+
+def stream_round_trip(part1, data, **options):
+    compressed = io.BytesIO()
+    part1.compress_stream(io.BytesIO(data), compressed, **options)
+    restored = io.BytesIO()
+    part1.decompress_stream(io.BytesIO(compressed.getvalue()), restored, **options)
+    return compressed.getvalue(), restored.getvalue()
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 1 << 16])
+@pytest.mark.parametrize("code_width", [9, 12, 16])
+def test_stream_round_trip(part1, chunk_size, code_width):
+    data = bytes(range(256)) + b"abcabcabd" * 500 + bytes(range(255, -1, -1)) * 3
+    compressed, restored = stream_round_trip(part1, data, chunk_size=chunk_size, code_width=code_width)
+    assert restored == data
+
+def test_stream_empty(part1):
+    assert stream_round_trip(part1, b"") == (b"", b"")
+
+def test_stream_matches_whole_input(part1):
+    # Chunking must not change the codes: the stream is the 16-bit codes of the whole input, zero-padded
+    text = "abc" * 3000 + "xyz"
+    compressed, _ = stream_round_trip(part1, text.encode("latin-1"), chunk_size=7)
+    codes = part1.compress(text)
+    assert compressed == b"".join(code.to_bytes(2, "big") for code in codes)
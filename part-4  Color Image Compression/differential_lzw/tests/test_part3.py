@@ -0,0 +1,87 @@
+"""
+part3's difference files: every alphabet and code option round-trips, tagged
+files record their alphabet, and untagged files keep the original format
+"""
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.alphabet import ALPHABET_BYTES, ALPHABET_ZIGZAG
+from src.lzw import ResetWhenFull
+
+from helpers import DATA, sample
+
+def differences(part3, rows=40, cols=33):
+    gray = np.asarray(Image.fromarray(np.stack(sample(rows, cols), axis=-1)).convert("L"))
+    return gray, part3.compute_difference_image(gray)
+
+OPTIONS = [
+    {},
+    {'max_code_width': 12},
+    {'max_code_width': 9, 'reset_policy': ResetWhenFull()},
+]
+
+@pytest.mark.parametrize("options", OPTIONS)
+@pytest.mark.parametrize("alphabet", [ALPHABET_ZIGZAG, ALPHABET_BYTES, 'signed'])
+def test_round_trip(part3, tmp_path, alphabet, options):
+    gray, diff = differences(part3)
+    path = str(tmp_path / "diff.bin")
+    part3.lzw_compress(diff.ravel(), path, alphabet=alphabet, **options)
+    restored = part3.lzw_decompress(path, options.get('max_code_width'), diff.size, 'reset_policy' in options)
+    assert restored.dtype == np.int16
+    if alphabet != ALPHABET_BYTES:
+        np.testing.assert_array_equal(restored, diff.ravel())
+    np.testing.assert_array_equal(part3.restore_image_from_diff(restored.reshape(diff.shape)), gray)
+
+@pytest.mark.parametrize("alphabet", [ALPHABET_ZIGZAG, ALPHABET_BYTES])
+def test_tag(part3, tmp_path, alphabet):
+    path = str(tmp_path / "diff.bin")
+    part3.lzw_compress(differences(part3)[1].ravel(), path, alphabet=alphabet)
+    with open(path, "rb") as f:
+        assert f.read(5) == part3.ALPHABET_MAGIC + bytes([part3.ALPHABET_TAGS[alphabet]])
+
+def test_signed_is_untagged(part3, tmp_path):
+    path = str(tmp_path / "diff.bin")
+    codes = part3.lzw_compress(differences(part3)[1].ravel(), path, alphabet='signed')
+    with open(path, "rb") as f:
+        assert f.read() == np.asarray(codes, dtype='>u2').tobytes()
+
+def test_extreme_differences(part3, tmp_path):
+    # int16 values far outside -255..255 only survive the zigzag alphabet
+    values = np.array([0, 32767, -32768, 1000, -1000, 5, 5, 5], dtype=np.int16)
+    path = str(tmp_path / "diff.bin")
+    part3.lzw_compress(values, path)
+    np.testing.assert_array_equal(part3.lzw_decompress(path, size=values.size), values)
+
+def test_existing_file(part3):
+    # Written by the original code: tuple-keyed 511-symbol LZW, 16-bit codes, no tag
+    diff = differences(part3, 13, 19)[1]
+    restored = part3.lzw_decompress(os.path.join(DATA, 'legacy_part3.bin'), size=diff.size)
+    np.testing.assert_array_equal(restored, diff.ravel())
+
+def test_unknown_tag(part3, tmp_path):
+    path = str(tmp_path / "diff.bin")
+    with open(path, "wb") as f:
+        f.write(part3.ALPHABET_MAGIC + bytes([9]) + b"\x00\x01")
+    with pytest.raises(ValueError):
+        part3.lzw_decompress(path)
+
+def test_unknown_alphabet(part3, tmp_path):
+    with pytest.raises(ValueError):
+        part3.lzw_compress(differences(part3)[1].ravel(), str(tmp_path / "diff.bin"), alphabet='base64')
+
+def test_size_mismatch(part3, tmp_path):
+    path = str(tmp_path / "diff.bin")
+    diff = differences(part3)[1]
+    part3.lzw_compress(diff.ravel(), path)
+    with pytest.raises(ValueError):
+        part3.lzw_decompress(path, size=diff.size + 1)
+
+def test_zigzag_costs_no_more_than_signed(part3, tmp_path):
+    # Small differences are single bytes either way, and the tag costs 5 bytes
+    diff = differences(part3)[1].ravel()
+    part3.lzw_compress(diff, str(tmp_path / "zigzag.bin"))
+    part3.lzw_compress(diff, str(tmp_path / "signed.bin"), alphabet='signed')
+    assert os.path.getsize(str(tmp_path / "zigzag.bin")) <= os.path.getsize(str(tmp_path / "signed.bin")) + 5
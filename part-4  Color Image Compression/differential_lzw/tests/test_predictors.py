@@ -0,0 +1,98 @@
+"""
+Every predictor against a per-pixel loop of its definition, and every
+container mode's inverse against its forward transform
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.compression import compress_color_image, decompress_color_image
+from src.container import MODE_MED
+from src.predictors import PREDICTORS, PREDICTOR_MODES, predict_average, predict_paeth, predict_med
+
+from helpers import IMAGE, SHAPES, sample
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+def med(a, b, c):
+    if c >= max(a, b):
+        return min(a, b)
+    if c <= min(a, b):
+        return max(a, b)
+    return a + b - c
+
+def reference_residuals(channel, predict):
+    """
+    First row against the left pixel, first column against the pixel above,
+    the rest against predict(left, above, upper left), modulo 256
+    """
+    channel = channel.astype(int)
+    rows, cols = channel.shape
+    residuals = np.zeros((rows, cols), dtype=np.uint8)
+    for i in range(rows):
+        for j in range(cols):
+            if i == 0 and j == 0:
+                prediction = 0
+            elif i == 0:
+                prediction = channel[i, j - 1]
+            elif j == 0:
+                prediction = channel[i - 1, j]
+            else:
+                prediction = predict(channel[i, j - 1], channel[i - 1, j], channel[i - 1, j - 1])
+            residuals[i, j] = (channel[i, j] - prediction) % 256
+    return residuals
+
+def channels(shape):
+    """
+    Sample channels plus the extremes: flat black, flat white and a 0/255 checkerboard
+    """
+    rows, cols = shape
+    checker = (np.indices(shape).sum(axis=0) % 2 * 255).astype(np.uint8)
+    return sample(rows, cols) + [np.zeros(shape, np.uint8), np.full(shape, 255, np.uint8), checker]
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("name, reference", [('average', lambda a, b, c: (a + b) // 2), ('paeth', paeth), ('med', med),
+                                             ('gradient', lambda a, b, c: a + b - c)])
+def test_predictors_match_loops(shape, name, reference):
+    for channel in channels(shape):
+        residuals = PREDICTORS[PREDICTOR_MODES[name]][0](channel)
+        assert residuals.dtype == np.uint8
+        np.testing.assert_array_equal(residuals, reference_residuals(channel, reference))
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("mode", sorted(PREDICTORS))
+def test_inverse(shape, mode):
+    forward, inverse = PREDICTORS[mode]
+    for channel in channels(shape):
+        restored = inverse(forward(channel))
+        assert restored.dtype == np.uint8
+        np.testing.assert_array_equal(restored, channel)
+
+def test_inverse_of_strided_views():
+    pixels = np.stack(sample(13, 19), axis=-1)
+    forward, inverse = PREDICTORS[MODE_MED]
+    np.testing.assert_array_equal(inverse(forward(pixels[:, :, 1])), pixels[:, :, 1])
+
+def test_predictions():
+    a, b, c = (np.array(values, dtype=np.int16) for values in ([10, 10, 10, 200], [20, 20, 20, 100], [5, 25, 15, 255]))
+    # c below both: an edge, so the larger; c above both: the smaller; between: the plane a + b - c
+    assert predict_med(a, b, c).tolist() == [20, 10, 15, 100]
+    # p = a + b - c is 25, 5, 15 and 45: closest to b, then a, then c, then b
+    assert predict_paeth(a, b, c).tolist() == [20, 10, 15, 100]
+    assert predict_average(a, b, c).tolist() == [15, 15, 15, 150]
+
+@pytest.mark.parametrize("predictor", sorted(PREDICTOR_MODES))
+def test_color_image_round_trip(predictor, tmp_path):
+    path = str(tmp_path / "image.bin")
+    compress_color_image(IMAGE, path, predictor=predictor, tile_size=64)
+    restored = decompress_color_image(path, str(tmp_path / "restored.bmp"))
+    np.testing.assert_array_equal(np.asarray(restored), np.asarray(Image.open(IMAGE).convert("RGB")))
+
+def test_unknown_predictor(tmp_path):
+    with pytest.raises(ValueError):
+        compress_color_image(IMAGE, str(tmp_path / "image.bin"), predictor='cubic')
@@ -0,0 +1,34 @@
+"""
+The GUI preview: images are decoded once at display size and reused until
+another image is opened (the Tk renderings themselves need a display)
+"""
+import numpy as np
+from PIL import Image
+
+from helpers import IMAGE, sample
+
+def test_fit_preview(gui):
+    img = Image.new("L", (2000, 500))
+    fitted = gui.fit_preview(img)
+    assert fitted.mode == "RGB" and fitted.size == (gui.PREVIEW_SIZE[0], gui.PREVIEW_SIZE[0] // 4)
+    assert img.size == (2000, 500)
+    # Small images are not scaled up
+    assert gui.fit_preview(Image.new("RGB", (30, 20))).size == (30, 20)
+
+def test_preview_pixels(gui, tmp_path):
+    path = str(tmp_path / "small.bmp")
+    pixels = np.stack(sample(40, 33), axis=-1)
+    Image.fromarray(pixels).save(path)
+    np.testing.assert_array_equal(gui.PreviewCache(path).pixels, pixels)
+    large = gui.PreviewCache(IMAGE).pixels
+    assert large.shape[2] == 3 and max(large.shape[:2]) <= max(gui.PREVIEW_SIZE)
+
+def test_preview_is_reused(gui, tmp_path, monkeypatch):
+    other = str(tmp_path / "other.bmp")
+    Image.fromarray(np.stack(sample(13, 19), axis=-1)).save(other)
+    monkeypatch.setattr(gui, "preview", None)
+    monkeypatch.setattr(gui, "image_file_path", IMAGE)
+    first = gui.get_preview()
+    assert gui.get_preview() is first
+    monkeypatch.setattr(gui, "image_file_path", other)
+    assert gui.get_preview() is not first and gui.get_preview().pixels.shape == (13, 19, 3)
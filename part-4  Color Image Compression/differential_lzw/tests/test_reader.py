@@ -0,0 +1,68 @@
+"""
+ContainerReader: records come from a read-only memory map of files on disk
+and are released with it
+"""
+import io
+
+import numpy as np
+import pytest
+
+from src.compression import compress_channels, decompress_channel, decompress_record
+from src.container import MODE_MED, ContainerReader
+
+from helpers import sample
+
+def write(f, **options):
+    compress_channels(f, sample(40, 33), MODE_MED, **options)
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "image.bin")
+    with open(path, "wb") as f:
+        write(f, tile_size=16, max_code_width=12)
+    return path
+
+def test_records_are_views_of_the_map(path):
+    with open(path, "rb") as f, ContainerReader(f) as reader:
+        assert reader.is_mapped()
+        num_codes, payload = reader.record(2, 4)
+        assert isinstance(payload, memoryview) and num_codes > 0
+
+def test_stream_without_descriptor():
+    f = io.BytesIO()
+    write(f)
+    f.seek(0)
+    with ContainerReader(f) as reader:
+        assert not reader.is_mapped()
+        num_codes, payload = reader.record(1)
+        assert len(payload) == num_codes * 2
+
+def test_mapped_and_read_records_agree(path):
+    with open(path, "rb") as f, ContainerReader(f) as mapped:
+        records = [bytes(mapped.record(k, i)[1]) for k in range(3) for i in range(len(mapped.boxes))]
+        assert mapped.payload_bytes() == sum(len(record) for record in records)
+    with open(path, "rb") as f:
+        unmapped = ContainerReader(io.BytesIO(f.read()))
+    assert [bytes(unmapped.record(k, i)[1]) for k in range(3) for i in range(len(unmapped.boxes))] == records
+
+def test_close_releases_views(path):
+    with open(path, "rb") as f:
+        with ContainerReader(f) as reader:
+            num_codes, payload = reader.record(0, 1)
+            data = bytes(payload)
+        assert reader.data is None and not reader.is_mapped()
+        with pytest.raises(ValueError):
+            bytes(payload)
+        # Records are read from the file once the map is gone
+        assert reader.record(0, 1) == (num_codes, data)
+        reader.close()
+
+def test_decompress_record_matches_in_process(path):
+    with open(path, "rb") as f, ContainerReader(f) as reader:
+        header = reader.header
+        num_codes, payload = reader.record(1, 3)
+        expected, _ = decompress_channel(num_codes, payload, reader.boxes[3][2:], header.max_code_width,
+                                         header.clear_codes, header.mode, header.run_length)
+    tile, stats = decompress_record(path, 1, 3)
+    np.testing.assert_array_equal(tile, expected)
+    assert stats['symbols'] == tile.size
@@ -0,0 +1,42 @@
+"""
+Region decoding returns exactly the crop of the full image, decoding only
+the tiles the box overlaps
+"""
+import numpy as np
+import pytest
+
+from src.color import COLOR_SUBTRACT_GREEN
+from src.compression import compress_color_image, decompress_color_region, decompress_color_image
+from src.container import MODE_MED
+
+from helpers import IMAGE, sample, round_trip, assert_channels_equal
+
+BOXES = [(0, 0, 33, 40), (0, 0, 1, 1), (32, 39, 33, 40), (5, 3, 21, 30), (10, 0, 11, 40), (0, 17, 33, 18)]
+
+@pytest.mark.parametrize("box", BOXES)
+@pytest.mark.parametrize("tile_size", [None, 8, 16])
+def test_region(box, tile_size):
+    channels = sample(40, 33)
+    left, top, right, bottom = box
+    crops = [channel[top:bottom, left:right] for channel in channels]
+    assert_channels_equal(round_trip(channels, MODE_MED, box, tile_size=tile_size, color_transform=COLOR_SUBTRACT_GREEN),
+                          crops)
+
+@pytest.mark.parametrize("box", [(0, 0, 0, 5), (0, 0, 34, 40), (-1, 0, 5, 5), (5, 5, 4, 6)])
+def test_region_outside_image(box):
+    with pytest.raises(ValueError):
+        round_trip(sample(40, 33), MODE_MED, box)
+
+def test_region_with_workers(tmp_path):
+    channels = sample(40, 33)
+    assert_channels_equal(round_trip(channels, MODE_MED, (3, 4, 30, 25), workers=2, path=str(tmp_path / "image.bin"),
+                                     tile_size=16), [channel[4:25, 3:30] for channel in channels])
+
+def test_region_decodes_only_overlapping_tiles(tmp_path):
+    path = str(tmp_path / "image.bin")
+    compress_color_image(IMAGE, path, tile_size=64)
+    full = np.asarray(decompress_color_image(path, str(tmp_path / "restored.bmp")))
+    region, report = decompress_color_region(path, (70, 10, 130, 60), report=True)
+    np.testing.assert_array_equal(np.asarray(region), full[10:60, 70:130])
+    # Columns 64-191 of the first tile row, in each of the three channels
+    assert len(report.channels) == 2 * 3
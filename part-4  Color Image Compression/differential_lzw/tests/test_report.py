@@ -0,0 +1,158 @@
+"""
+CompressionReport: every entry point returns its usual result unless asked
+for the report, hooks get the report without changing that, and the metrics
+read from a report match the ones read from the files
+"""
+import pytest
+import numpy as np
+from PIL import Image
+
+from src.compression import compress_color_image, decompress_color_image, decompress_color_region, calculate_color_metrics
+from src.report import CompressionReport, Progress, StageTimer, start_report, stage, finish_report
+
+from helpers import sample
+
+@pytest.fixture
+def image(tmp_path):
+    path = str(tmp_path / "image.bmp")
+    Image.fromarray(np.stack(sample(40, 33), axis=-1)).save(path)
+    return path
+
+def entry_points(part1, part2, part3, gui, image, tmp_path):
+    """
+    (name, function, args) of every compress and decompress call, with the files the decompressors read
+    """
+    text = "TOBEORNOTTOBEORTOBEORNOT" * 20
+    differences = part3.compute_difference_image(np.asarray(Image.open(image).convert("L")))
+    color = compress_color_image(image, str(tmp_path / "color.bin"))
+    gray = part2.compress_image(image, str(tmp_path / "gray.bin"))
+    part3.lzw_compress(differences, str(tmp_path / "part3.bin"))
+    calls = [
+        ("part1.compress", part1.compress, (text,)),
+        ("part1.decompress", part1.decompress, (part1.compress(text),)),
+        ("part2.compress_image", part2.compress_image, (image, str(tmp_path / "out.bin"))),
+        ("part2.decompress_image", part2.decompress_image, (gray, str(tmp_path / "out.png"))),
+        ("part3.lzw_compress", part3.lzw_compress, (differences, str(tmp_path / "out.bin"))),
+        ("part3.lzw_decompress", part3.lzw_decompress, (str(tmp_path / "part3.bin"),)),
+        ("compress_color_image", compress_color_image, (image, str(tmp_path / "out.bin"))),
+        ("decompress_color_image", decompress_color_image, (color, str(tmp_path / "out.bmp"))),
+        ("decompress_color_region", decompress_color_region, (color, (3, 4, 10, 12))),
+        ("gui.region_decompress", gui.region_decompress, (color, (3, 4, 10, 12))),
+    ]
+    for level in range(1, 6):
+        compressed = getattr(gui, f"level{level}_compress")(image, str(tmp_path / f"level{level}.bin"))
+        calls.append((f"gui.level{level}_compress", getattr(gui, f"level{level}_compress"), (image, str(tmp_path / "out.bin"))))
+        calls.append((f"gui.level{level}_decompress", getattr(gui, f"level{level}_decompress"), (compressed, str(tmp_path / "out.bmp"))))
+    return calls
+
+def same_result(a, b):
+    if isinstance(a, Image.Image):
+        return np.array_equal(np.asarray(a), np.asarray(b))
+    if isinstance(a, np.ndarray):
+        return np.array_equal(a, b)
+    return list(a) == list(b) if not isinstance(a, str) else a == b
+
+def test_return_shapes(part1, part2, part3, gui, image, tmp_path):
+    for name, function, args in entry_points(part1, part2, part3, gui, image, tmp_path):
+        plain = function(*args)
+        assert not isinstance(plain, tuple), name
+        result, report = function(*args, report=True)
+        assert isinstance(report, CompressionReport), name
+        assert same_result(result, plain), name
+        reports = []
+        hooked = function(*args, hook=reports.append)
+        assert not isinstance(hooked, tuple) and same_result(hooked, plain), name
+        assert len(reports) == 1 and isinstance(reports[0], CompressionReport), name
+        reports = []
+        result, report = function(*args, report=True, hook=reports.append)
+        assert reports == [report], name
+
+def test_compress_report(image, tmp_path):
+    compressed, report = compress_color_image(image, str(tmp_path / "image.bin"), max_code_width=12, tile_size=16, report=True)
+    assert report.operation == "compress"
+    assert {"load", "entropy", "transform", "lzw", "serialize", "write"} <= set(report.stages)
+    assert all(seconds >= 0 for seconds in report.stages.values())
+    # Three channels of nine tiles each
+    assert len(report.channels) == 27
+    assert report.symbols == 40 * 33 * 3
+    assert report.bytes_in == 40 * 33 * 3
+    assert report.bytes_out == len(open(compressed, "rb").read())
+    assert all(0 < stats['dictionary_size'] <= stats['dictionary_capacity'] == 1 << 12 for stats in report.channels)
+    values = report.to_dict()
+    assert values['codes'] == report.codes == sum(stats['codes'] for stats in report.channels)
+    assert values['image_entropy'] == report.image_entropy > 0
+    assert values['avg_code_length'] == report.payload_bytes * 8 / report.symbols
+    assert all('seconds' not in stats for stats in values['channels'])
+
+def test_decompress_report(image, tmp_path):
+    compressed = compress_color_image(image, str(tmp_path / "image.bin"))
+    _, compress_report = compress_color_image(image, str(tmp_path / "image.bin"), report=True)
+    _, report = decompress_color_image(compressed, str(tmp_path / "restored.bmp"), report=True)
+    assert report.operation == "decompress"
+    assert {"load", "deserialize", "lzw", "transform", "write"} <= set(report.stages)
+    assert report.codes == compress_report.codes
+    assert report.entropy == pytest.approx(compress_report.entropy)
+    assert report.image_entropy is None
+
+def test_color_metrics_from_report(image, tmp_path):
+    compressed, report = compress_color_image(image, str(tmp_path / "image.bin"), predictor='med', report=True)
+    assert calculate_color_metrics(image, compressed, report) == pytest.approx(calculate_color_metrics(image, compressed))
+
+@pytest.mark.parametrize("level", [1, 2, 3, 4, 5])
+def test_gui_metrics_from_report(gui, image, tmp_path, level):
+    compressed, report = getattr(gui, f"level{level}_compress")(image, str(tmp_path / "image.bin"), report=True)
+    assert gui.calculate_metrics(image, compressed, report) == pytest.approx(gui.calculate_metrics(image, compressed))
+
+def test_part1_report(part1):
+    text = "abababababab\xff"
+    codes, report = part1.compress(text, report=True)
+    assert report.symbols == len(text) and report.codes == len(codes)
+    assert report.payload_bytes == 2 * len(codes)
+    assert report.bytes_out == 2 * len(codes)
+
+def test_stages():
+    report = CompressionReport("compress")
+    with stage(report, "lzw"):
+        pass
+    with stage(report, "lzw"):
+        pass
+    report.add_channel({'symbols': 10, 'codes': 4, 'payload_bytes': 8, 'entropy': 1.0, 'seconds': {'lzw': 1.0}})
+    report.add_channel({'symbols': 30, 'codes': 6, 'payload_bytes': 12, 'entropy': 2.0})
+    assert list(report.stages) == ["lzw"] and report.stages["lzw"] >= 1.0
+    assert report.entropy == pytest.approx(1.75)
+    assert report.avg_code_length == pytest.approx(4.0)
+    # Without a report the stage is a no-op
+    with stage(None, "lzw"):
+        pass
+
+def test_empty_report():
+    report = CompressionReport("compress")
+    assert report.entropy == report.avg_code_length == 0.0 and report.codes == 0
+
+def test_stage_timer():
+    timer = StageTimer()
+    timer.lap("transform")
+    timer.lap("lzw")
+    timer.lap("lzw")
+    assert list(timer.seconds) == ["transform", "lzw"]
+
+def test_start_and_finish():
+    assert start_report("compress") is None
+    assert finish_report(1, None) == 1
+    report = start_report("compress", hook=print)
+    calls = []
+    assert finish_report(1, report, False, calls.append) == 1 and calls == [report]
+    assert finish_report(1, report, True) == (1, report)
+
+def test_progress():
+    calls = []
+    progress = Progress(lambda done, total: calls.append((done, total)), 10)
+    progress.advance(4)
+    progress.advance(6)
+    assert calls == [(4, 10), (10, 10)]
+
+def test_progress_of_a_call(gui, image, tmp_path):
+    calls = []
+    gui.level3_compress(image, str(tmp_path / "image.bin"), tile_size=16, progress=lambda done, total: calls.append((done, total)))
+    assert calls[-1] == (40 * 33 * 3, 40 * 33 * 3)
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
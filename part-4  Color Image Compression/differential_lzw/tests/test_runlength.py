@@ -0,0 +1,90 @@
+"""
+Zero-run coding: tokens decode back to their symbols whatever the escape
+byte and run lengths, and channels only use it where it pays off
+"""
+import numpy as np
+import pytest
+
+from src.container import MODE_MED, MODE_RAW
+from src.compression import compress_channel
+from src.runlength import (MIN_RUN, MAX_TOKEN_SHARE, zero_runs, pick_escape, run_length_encode, run_length_decode,
+                           run_length_tokens, symbols_from_tokens)
+
+from helpers import SHAPES, sample, round_trip, assert_channels_equal
+
+def runs(lengths, fill=7):
+    """
+    Zero runs of the given lengths, each followed by one fill symbol
+    """
+    return np.concatenate([np.concatenate((np.zeros(n, np.uint8), [fill])) for n in lengths]).astype(np.uint8)
+
+def inputs():
+    rng = np.random.default_rng(0)
+    sparse = rng.integers(0, 256, 5000, dtype=np.uint8) * (rng.random(5000) < 0.05)
+    return {
+        'empty': np.zeros(0, np.uint8),
+        'zeros': np.zeros(1000, np.uint8),
+        'one zero': np.zeros(1, np.uint8),
+        'short runs': runs([MIN_RUN - 1] * 20),
+        'exact runs': runs([MIN_RUN] * 20),
+        # Run lengths whose varints take 1, 2, 3 and 4 bytes
+        'long runs': runs([127, 128, 16383, 16384, 1 << 21]),
+        'sparse': sparse,
+        'noise': rng.integers(0, 256, 5000, dtype=np.uint8),
+        'every escape': np.concatenate((runs([100] * 3, fill=1), np.full(50, 1, np.uint8))),
+    }
+
+@pytest.mark.parametrize("name", list(inputs()))
+@pytest.mark.parametrize("escape", [1, 128, 255])
+def test_encode_decode(name, escape):
+    symbols = inputs()[name]
+    tokens = run_length_encode(symbols, escape)
+    assert tokens.dtype == np.uint8
+    np.testing.assert_array_equal(run_length_decode(tokens, escape), symbols)
+
+@pytest.mark.parametrize("name", list(inputs()))
+def test_tokens_round_trip(name):
+    symbols = inputs()[name]
+    np.testing.assert_array_equal(symbols_from_tokens(run_length_tokens(symbols)), symbols)
+
+def test_runs_shrink_to_escapes():
+    symbols = runs([1000] * 3)
+    escape = pick_escape(symbols)
+    # Each run: the escape and a two-byte varint, then the fill symbol
+    assert run_length_encode(symbols, escape).size == 3 * 4
+
+def test_zero_runs():
+    symbols = np.concatenate((np.zeros(MIN_RUN, np.uint8), [5], np.zeros(MIN_RUN - 1, np.uint8), [5], np.zeros(40, np.uint8)))
+    starts, lengths = zero_runs(symbols)
+    assert starts.tolist() == [0, 2 * MIN_RUN + 1] and lengths.tolist() == [MIN_RUN, 40]
+
+def test_pick_escape_is_rarest_nonzero():
+    symbols = np.concatenate((np.zeros(10, np.uint8), np.arange(1, 256, dtype=np.uint8), np.arange(1, 256, dtype=np.uint8)))
+    symbols[symbols == 77] = 0
+    assert pick_escape(symbols) == 77
+
+def test_share_fallback():
+    # Runs that save too little leave the symbols as they are, behind a 0 marker
+    symbols = np.concatenate((np.arange(1, 201, dtype=np.uint8), np.zeros(MIN_RUN, np.uint8)))
+    data = run_length_tokens(symbols)
+    assert data[0] == 0 and data.size == symbols.size + 1
+    data = run_length_tokens(np.zeros(4 * MIN_RUN, np.uint8))
+    assert data[0] != 0 and data.size < MAX_TOKEN_SHARE * 4 * MIN_RUN
+
+def test_empty_record():
+    with pytest.raises(ValueError):
+        symbols_from_tokens(np.zeros(0, np.uint8))
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_channels_round_trip(shape):
+    rows, cols = shape
+    flat = [np.zeros(shape, np.uint8), np.full(shape, 200, np.uint8), np.tile(np.arange(cols, dtype=np.uint8), (rows, 1))]
+    for channels in (flat, sample(rows, cols)):
+        assert_channels_equal(round_trip(channels, MODE_MED, run_length=True), channels)
+        assert_channels_equal(round_trip(channels, MODE_RAW, run_length=True, tile_size=8, max_code_width=12), channels)
+
+def test_flat_channel_takes_fewer_tokens():
+    _, stats = compress_channel(np.zeros((64, 64), np.uint8), mode=MODE_MED, run_length=True)
+    assert stats['symbols'] == 64 * 64 and stats['tokens'] < 10
+    _, stats = compress_channel(sample(64, 64)[0], mode=MODE_MED, run_length=True)
+    assert stats['tokens'] == 64 * 64 + 1
@@ -0,0 +1,133 @@
+"""
+Seed dictionaries: trained seeds are valid, survive the cache, decode what
+they encode and travel with the files that name them
+"""
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src import seeds
+from src.compression import compress_color_image, decompress_color_image
+from src.container import MODE_MED, ContainerHeader
+from src.lzw import LZWEncoder, ResetWhenFull, lzw_decode
+from src.predictors import PREDICTORS
+from src.seeds import SeedDictionary, train_seed, save_seed, load_seed, seed_path
+
+from helpers import IMAGE, sample, round_trip, assert_channels_equal
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """
+    An empty seed cache directory, with nothing loaded in this process
+    """
+    monkeypatch.setattr(seeds, "SEED_DIRECTORY", str(tmp_path / "seeds"))
+    monkeypatch.setattr(seeds, "_loaded", {})
+    return str(tmp_path / "seeds")
+
+def residuals(rows, cols, top=0):
+    pixels = np.asarray(Image.open(IMAGE).convert("RGB"))[top:top + rows, :cols]
+    return [PREDICTORS[MODE_MED][0](pixels[:, :, k]) for k in range(3)]
+
+@pytest.fixture(scope="module")
+def seed():
+    return train_seed(residuals(64, 64), entries=300)
+
+def test_trained_seed(seed):
+    assert 0 < len(seed) <= 300
+    phrases = set(seed.phrases)
+    assert all(len(phrase) == 2 or phrase[:-1] in phrases for phrase in seed.phrases)
+
+def test_phrases_are_checked():
+    with pytest.raises(ValueError):
+        SeedDictionary([b'a'])
+    with pytest.raises(ValueError):
+        SeedDictionary([b'abc'])
+    with pytest.raises(ValueError):
+        SeedDictionary([b'ab', b'ab'])
+    assert len(SeedDictionary([b'ab', b'abc', b'zz'])) == 3
+
+def test_bytes_round_trip(seed):
+    copy = SeedDictionary.from_bytes(seed.to_bytes())
+    assert copy.phrases == seed.phrases and copy.seed_id == seed.seed_id != 0
+    with pytest.raises(ValueError):
+        SeedDictionary.from_bytes(b'NOPE' + seed.to_bytes()[4:])
+
+@pytest.mark.parametrize("max_code_width, reset_policy", [(16, None), (None, None), (10, ResetWhenFull())])
+def test_codes_round_trip(seed, max_code_width, reset_policy):
+    data = residuals(40, 33, top=200)[1].tobytes()
+    encoder = LZWEncoder(max_code_width, reset_policy, seed)
+    codes = encoder.encode(data) + encoder.finish()
+    decoded = lzw_decode(codes, len(data), max_code_width or 16, clear_codes=reset_policy is not None, seed=seed)
+    assert decoded.tobytes() == data
+
+def test_seed_shortens_small_images(seed):
+    data = residuals(24, 24, top=300)[0].tobytes()
+    encoder = LZWEncoder(16)
+    plain = encoder.encode(data) + encoder.finish()
+    encoder = LZWEncoder(16, None, seed)
+    assert len(encoder.encode(data) + encoder.finish()) < len(plain)
+
+def test_seed_must_fit(seed):
+    # 256 base symbols and the seed phrases leave no room in 9-bit codes
+    assert len(seed) > 256
+    with pytest.raises(ValueError):
+        LZWEncoder(9, None, seed)
+    LZWEncoder(10, None, seed)
+
+def test_save_and_load(cache, seed, tmp_path, monkeypatch):
+    path = save_seed(seed)
+    assert path == seed_path(seed.seed_id) and os.path.dirname(path) == cache
+    monkeypatch.setattr(seeds, "_loaded", {})
+    assert load_seed(seed.seed_id).phrases == seed.phrases
+    assert load_seed(0) is None
+    # A directory given explicitly
+    other = str(tmp_path / "other")
+    save_seed(seed, other)
+    monkeypatch.setattr(seeds, "_loaded", {})
+    assert load_seed(seed.seed_id, other).phrases == seed.phrases
+
+def test_missing_seed(cache):
+    with pytest.raises(ValueError):
+        load_seed(0x1234)
+
+def test_mismatched_seed_file(cache, seed):
+    os.makedirs(cache)
+    with open(seed_path(0x1234), "wb") as f:
+        f.write(seed.to_bytes())
+    with pytest.raises(ValueError):
+        load_seed(0x1234)
+
+def test_seeded_container(cache, seed):
+    save_seed(seed)
+    channels = sample(40, 33)
+    assert_channels_equal(round_trip(channels, MODE_MED, seed=seed, tile_size=16, max_code_width=12), channels)
+    # Worker processes receive the seed pickled
+    assert_channels_equal(round_trip(channels, MODE_MED, seed=seed, workers=2, run_length=True), channels)
+
+def test_seeded_color_image(cache, seed, tmp_path, monkeypatch):
+    save_seed(seed)
+    path = str(tmp_path / "image.bin")
+    compress_color_image(IMAGE, path, predictor='med', seed_id=seed.seed_id)
+    with open(path, "rb") as f:
+        assert ContainerHeader.unpack(f).seed_id == seed.seed_id
+    # Decoding finds the seed in the cache by the id in the header
+    monkeypatch.setattr(seeds, "_loaded", {})
+    restored = decompress_color_image(path, str(tmp_path / "restored.bmp"))
+    np.testing.assert_array_equal(np.asarray(restored), np.asarray(Image.open(IMAGE).convert("RGB")))
+
+def test_unknown_seed_id(cache, tmp_path):
+    with pytest.raises(ValueError):
+        compress_color_image(IMAGE, str(tmp_path / "image.bin"), seed_id=0x1234)
+
+def test_command_line(cache, tmp_path, monkeypatch):
+    image = str(tmp_path / "sample.bmp")
+    Image.fromarray(np.stack(sample(40, 33), axis=-1)).save(image)
+    monkeypatch.setattr(sys, "argv", ["seeds", "--predictor", "med", "--entries", "100", image])
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+    seeds.main()
+    saved = os.listdir(cache)
+    assert len(saved) == 1 and len(load_seed(int(saved[0][:8], 16))) <= 100
@@ -0,0 +1,95 @@
+"""
+The bincount statistics against the Counter loops they replaced
+"""
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from src.container import tile_boxes
+from src.stats import histogram, symbol_entropy, conditional_entropy, tile_entropies, channel_entropies
+
+from helpers import SHAPES, sample
+
+def reference_entropy(values):
+    """
+    Entropy from a Counter over the values, as the metrics functions computed it
+    """
+    counts = Counter(values.ravel().tolist() if isinstance(values, np.ndarray) else values)
+    total = sum(counts.values())
+    return -sum(count / total * math.log2(count / total) for count in counts.values())
+
+def reference_conditional_entropy(rows):
+    """
+    H(pair) - H(left) over the horizontally adjacent pairs of every row
+    """
+    pairs = [(int(a), int(b)) for row in rows for a, b in zip(row[:-1], row[1:])]
+    if not pairs:
+        return 0.0
+    return reference_entropy(pairs) - reference_entropy([a for a, _ in pairs])
+
+def signed(shape, seed=0):
+    return np.random.default_rng(seed).integers(-255, 256, shape).astype(np.int16)
+
+def test_histogram_of_bytes():
+    counts, offset = histogram(np.array([0, 3, 3, 255], dtype=np.uint8))
+    assert offset == 0 and counts.size == 256
+    assert counts[0] == 1 and counts[3] == 2 and counts[255] == 1 and counts.sum() == 4
+
+def test_histogram_of_signed_values():
+    values = np.array([-3, -3, 0, 2], dtype=np.int16)
+    counts, offset = histogram(values)
+    assert offset == -3
+    assert dict(enumerate(counts.tolist())) == {0: 2, 1: 0, 2: 0, 3: 1, 4: 0, 5: 1}
+
+def test_histogram_of_positive_values_starts_at_zero():
+    counts, offset = histogram(np.array([5, 7]))
+    assert offset == 0 and counts.tolist() == [0, 0, 0, 0, 0, 1, 0, 1]
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_symbol_entropy(shape):
+    for values in (sample(*shape)[0], signed(shape)):
+        assert symbol_entropy(values) == pytest.approx(reference_entropy(values), abs=1e-12)
+
+def test_entropy_edge_cases():
+    assert symbol_entropy(np.array([], dtype=np.uint8)) == 0.0
+    assert symbol_entropy(np.array([], dtype=np.int16)) == 0.0
+    assert symbol_entropy(np.full(100, 7, dtype=np.uint8)) == 0.0
+    assert symbol_entropy(np.arange(256, dtype=np.uint8)) == pytest.approx(8.0)
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_conditional_entropy(shape):
+    for values in (sample(*shape)[1], signed(shape)):
+        expected = reference_conditional_entropy(values.tolist())
+        assert conditional_entropy(values) == pytest.approx(expected, abs=1e-9)
+
+def test_conditional_entropy_of_a_pattern():
+    # Every symbol follows from its left neighbour, so nothing is left to code
+    assert conditional_entropy(np.tile(np.arange(8, dtype=np.uint8), 50)) == pytest.approx(0.0, abs=1e-12)
+    assert conditional_entropy(np.array([3], dtype=np.uint8)) == 0.0
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("tile_size", [0, 4, 16])
+def test_tile_entropies(shape, tile_size):
+    pixels = np.stack(sample(*shape), axis=-1)
+    boxes = tile_boxes(shape, tile_size) if tile_size else [(0, 0) + shape]
+    entropies = tile_entropies(pixels, tile_size)
+    assert entropies.shape == (3, len(boxes))
+    for k in range(3):
+        for i, (top, left, height, width) in enumerate(boxes):
+            tile = pixels[top:top + height, left:left + width, k]
+            assert entropies[k, i] == pytest.approx(reference_entropy(tile), abs=1e-12)
+
+def test_tile_entropies_of_signed_values():
+    values = signed((13, 19))
+    entropies = tile_entropies(values, 8)
+    assert entropies.shape == (1, 6)
+    assert entropies[0, 5] == pytest.approx(reference_entropy(values[8:, 16:]), abs=1e-12)
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_channel_entropies(shape):
+    pixels = np.stack(sample(*shape), axis=-1)
+    entropies = channel_entropies(pixels)
+    assert entropies.tolist() == pytest.approx([reference_entropy(pixels[:, :, k]) for k in range(3)], abs=1e-12)
+    assert channel_entropies(pixels[:, :, 0]).tolist() == pytest.approx([entropies[0]])
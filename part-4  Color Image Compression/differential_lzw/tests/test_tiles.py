@@ -0,0 +1,47 @@
+"""
+Tiled containers: every pixel lands in exactly one tile, and each tile
+decodes with its own dictionary
+"""
+import io
+
+import numpy as np
+import pytest
+
+from src.compression import compress_channels
+from src.container import MODE_DIFFERENCES, MODE_MED, ContainerReader, tile_boxes
+
+from helpers import SHAPES, sample, round_trip, assert_channels_equal
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("tile_size", [0, 1, 4, 16])
+def test_tile_boxes_cover_image(shape, tile_size):
+    covered = np.zeros(shape, dtype=int)
+    for top, left, height, width in tile_boxes(shape, tile_size):
+        covered[top:top + height, left:left + width] += 1
+    assert (covered == 1).all()
+
+def test_tile_boxes_row_by_row():
+    assert tile_boxes((5, 7), 4) == [(0, 0, 4, 4), (0, 4, 4, 3), (4, 0, 1, 4), (4, 4, 1, 3)]
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("tile_size", [1, 7, 16, 64])
+def test_tiled_round_trip(shape, tile_size):
+    channels = sample(*shape)
+    assert_channels_equal(round_trip(channels, MODE_MED, tile_size=tile_size), channels)
+
+def test_tiled_grayscale():
+    channels = sample(13, 19)[:1]
+    assert_channels_equal(round_trip(channels, MODE_DIFFERENCES, tile_size=5, max_code_width=9), channels)
+
+def test_tiled_workers(tmp_path):
+    channels = sample(40, 33)
+    assert_channels_equal(round_trip(channels, MODE_MED, workers=2, path=str(tmp_path / "image.bin"), tile_size=16),
+                          channels)
+
+def test_one_record_per_tile():
+    f = io.BytesIO()
+    compress_channels(f, sample(40, 33), MODE_MED, tile_size=16)
+    f.seek(0)
+    with ContainerReader(f) as reader:
+        assert len(reader.boxes) == 9
+        assert len(reader.offsets) == 3 * 9 + 1
@@ -0,0 +1,61 @@
+"""
+The vectorized difference transforms against the loops they replaced
+"""
+import numpy as np
+import pytest
+
+from src.utils import (compute_differences, restore_from_differences, compute_gradient_differences,
+                       restore_from_gradient_differences)
+
+SHAPES = [(1, 1), (1, 9), (9, 1), (2, 2), (13, 19)]
+
+def reference_differences(channel):
+    """
+    The per-pixel loops of the original module
+    """
+    rows, cols = channel.shape
+    diff_image = np.zeros_like(channel, dtype=np.int16)
+    diff_image[0, 0] = channel[0, 0]
+    for j in range(1, cols):
+        diff_image[0, j] = int(channel[0, j]) - int(channel[0, j - 1])
+    for i in range(1, rows):
+        diff_image[i, 0] = int(channel[i, 0]) - int(channel[i - 1, 0])
+    for i in range(1, rows):
+        for j in range(1, cols):
+            diff_image[i, j] = int(channel[i, j]) - int(channel[i, j - 1])
+    return diff_image
+
+def random_channel(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_differences_match_loops(shape):
+    channel = random_channel(shape)
+    np.testing.assert_array_equal(compute_differences(channel), reference_differences(channel))
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_uint8_differences_wrap(shape):
+    channel = random_channel(shape)
+    wrapped = compute_differences(channel, np.uint8)
+    assert wrapped.dtype == np.uint8
+    np.testing.assert_array_equal(wrapped, reference_differences(channel).astype(np.uint8))
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_restore_inverts_differences(shape):
+    channel = random_channel(shape)
+    np.testing.assert_array_equal(restore_from_differences(compute_differences(channel)), channel)
+    np.testing.assert_array_equal(restore_from_differences(compute_differences(channel, np.uint8)), channel)
+    # Signed bytes, as LZW hands them back, restore the same way
+    np.testing.assert_array_equal(restore_from_differences(compute_differences(channel, np.uint8).view(np.int8)), channel)
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_gradient_differences_invert(shape):
+    channel = random_channel(shape)
+    residuals = compute_gradient_differences(channel)
+    assert residuals.dtype == np.uint8
+    np.testing.assert_array_equal(restore_from_gradient_differences(residuals), channel)
+
+def test_gradient_prediction():
+    channel = np.array([[10, 20], [30, 45]], dtype=np.uint8)
+    # The last pixel is predicted as 20 + 30 - 10 = 40
+    np.testing.assert_array_equal(compute_gradient_differences(channel), [[10, 10], [20, 5]])
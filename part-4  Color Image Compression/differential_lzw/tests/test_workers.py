@@ -0,0 +1,49 @@
+"""
+Channels compressed and decompressed in worker processes come out as they
+do in the calling process
+"""
+import io
+import operator
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.compression import compress_channels, compress_color_image, decompress_color_image, map_channels
+from src.container import MODE_DIFFERENCES, MODE_MED
+
+from helpers import IMAGE, sample, round_trip, assert_channels_equal
+
+def test_map_channels_keeps_job_order():
+    jobs = [(k, 10) for k in range(7)]
+    seen = []
+    assert map_channels(operator.mul, jobs, workers=3, on_result=seen.append) == [k * 10 for k in range(7)]
+    assert seen == [k * 10 for k in range(7)]
+
+@pytest.mark.parametrize("workers", [2, None])
+def test_workers_write_the_same_file(workers):
+    channels = sample(40, 33)
+    files = []
+    for count in (1, workers):
+        f = io.BytesIO()
+        compress_channels(f, channels, MODE_MED, max_code_width=12, workers=count, run_length=True)
+        files.append(f.getvalue())
+    assert files[0] == files[1]
+
+def test_workers_in_memory():
+    # Streams without a file descriptor send record copies to the workers
+    channels = sample(40, 33)
+    assert_channels_equal(round_trip(channels, MODE_DIFFERENCES, workers=2), channels)
+
+def test_workers_on_disk(tmp_path):
+    # Workers map the file themselves
+    channels = sample(40, 33)
+    path = str(tmp_path / "image.bin")
+    assert_channels_equal(round_trip(channels, MODE_MED, workers=2, path=path, max_code_width=12, run_length=True),
+                          channels)
+
+def test_color_image_with_workers(tmp_path):
+    path = str(tmp_path / "image.bin")
+    compress_color_image(IMAGE, path, workers=2)
+    restored = decompress_color_image(path, str(tmp_path / "restored.bmp"), workers=2)
+    np.testing.assert_array_equal(np.asarray(restored), np.asarray(Image.open(IMAGE).convert("RGB")))
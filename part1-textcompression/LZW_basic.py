@@ -1,78 +1,128 @@
 import os
-
-def compress(uncompressed):
-    """Performs LZW compression and returns the compressed integer codes."""
-    dict_size = 256
-    dictionary = {chr(i): i for i in range(dict_size)}
-
-    w = ""
-    result = []
-    for c in uncompressed:
-        wc = w + c
-        if wc in dictionary:
-            w = wc
-        else:
-            result.append(dictionary[w])
-            dictionary[wc] = dict_size
-            dict_size += 1
-            w = c
-
-    if w:
-        result.append(dictionary[w])
-    
-    return result
-
-def decompress(compressed):
-    """Decompresses the LZW compressed integer codes back to the original text."""
-    from io import StringIO
-
-    dict_size = 256
-    dictionary = {i: chr(i) for i in range(dict_size)}
-
-    result = StringIO()
-    w = chr(compressed.pop(0))
-    result.write(w)
-    
-    for k in compressed:
-        if k in dictionary:
-            entry = dictionary[k]
-        elif k == dict_size:
-            entry = w + w[0]  # Special case: The new entry is not yet in the dictionary
-        else:
-            raise ValueError(f'Invalid compressed code: {k}')
-        
-        result.write(entry)
-        dictionary[dict_size] = w + entry[0]
-        dict_size += 1
-        w = entry
-    
-    return result.getvalue()
-
-
-def save_compressed_to_file(compressed, filename="compressed.bin"):
+import sys
+import mmap
+from array import array
+import numpy as np
+
+# The shared LZW engine lives in the part-4 package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, "part-4  Color Image Compression", "differential_lzw"))
+from src.bitio import BitWriter, BitReader
+from src.lzw import LZWEncoder, LZWDecoder, lzw_encode, lzw_decode
+from src.report import start_report, stage, finish_report
+from src.stats import symbol_entropy
+
+def compress(uncompressed, report=False, hook=None):
+    """Performs LZW compression and returns the compressed integer codes, with the report if report=True."""
+    return_report = report
+    report = start_report("compress", report, hook)
+    
+    # The base dictionary covers chr(0)..chr(255), which latin-1 maps one-to-one onto bytes
+    with stage(report, "transform"):
+        data = uncompressed.encode("latin-1")
+    with stage(report, "lzw"):
+        compressed = lzw_encode(data, max_code_width=None)
+    
+    if report is not None:
+        with stage(report, "entropy"):
+            entropy = symbol_entropy(np.frombuffer(data, dtype=np.uint8))
+        add_text_stats(report, data, compressed, entropy)
+        report.bytes_in += len(data)
+        report.bytes_out += report.payload_bytes
+    return finish_report(compressed, report, return_report, hook)
+
+def decompress(compressed, report=False, hook=None):
+    """Decompresses the LZW compressed integer codes back to the original text, with the report if report=True."""
+    return_report = report
+    report = start_report("decompress", report, hook)
+    
+    # Phrases are decoded into a single byte buffer, then mapped back to chr(0)..chr(255)
+    with stage(report, "lzw"):
+        data = lzw_decode(compressed, max_code_width=None)
+    with stage(report, "transform"):
+        text = data.tobytes().decode("latin-1")
+    
+    if report is not None:
+        with stage(report, "entropy"):
+            entropy = symbol_entropy(data.view(np.uint8))
+        add_text_stats(report, data, compressed, entropy)
+        report.bytes_in += report.payload_bytes
+        report.bytes_out += len(data)
+    return finish_report(text, report, return_report, hook)
+
+def add_text_stats(report, data, compressed, entropy):
+    """Records the text as one channel of the report, counting 16 bits per code."""
+    report.add_channel({
+        'symbols': len(data),
+        'codes': len(compressed),
+        'payload_bytes': len(compressed) * 2,
+        'entropy': entropy,
+    })
+
+
+def save_compressed_to_file(compressed, filename="compressed.bin", code_width=16):
     """Writes the compressed integer sequence to a binary file."""
-    binary_string = ''.join(format(num, '016b') for num in compressed)  # Convert integers to 16-bit binary strings
-    padding = 8 - (len(binary_string) % 8)  # Calculate padding to make length a multiple of 8
-    binary_string = format(padding, '08b') + binary_string + ('0' * padding)  # Add padding information at the beginning
+    if len(compressed) and max(compressed) >= 1 << code_width:
+        raise ValueError(f"Code {max(compressed)} does not fit in {code_width} bits")
+    
+    padding = 8 - (len(compressed) * code_width % 8)  # Calculate padding to make length a multiple of 8
     
-    byte_array = bytearray(int(binary_string[i:i+8], 2) for i in range(0, len(binary_string), 8))
+    writer = BitWriter()
+    writer.write(padding, 8)  # Add padding information at the beginning
+    for num in compressed:
+        writer.write(num, code_width)
+    writer.write(0, padding)
     
     with open(filename, "wb") as f:
-        f.write(byte_array)
+        f.write(writer.flush())
 
 
-def read_compressed_from_file(filename="compressed.bin"):
+def read_compressed_from_file(filename="compressed.bin", code_width=16):
     """Reads a binary compressed file and converts it back to an integer sequence."""
-    with open(filename, "rb") as f:
-        byte_data = f.read()
+    # The file is memory-mapped, so codes are read from the page cache without copying it into a bytes object
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as byte_data:
+        padding = byte_data[0]  # The first byte holds the number of padding bits added
+        num_codes = ((len(byte_data) - 1) * 8 - padding) // code_width
+        
+        with memoryview(byte_data) as view, view[1:] as code_data:
+            reader = BitReader(code_data)
+            compressed = array("I", [0]) * num_codes
+            for i in range(num_codes):
+                compressed[i] = reader.read(code_width)
     
-    binary_string = ''.join(format(byte, '08b') for byte in byte_data)
-    padding = int(binary_string[:8], 2)  # The first 8 bits indicate the number of padding bits added
-    binary_string = binary_string[8:-padding] if padding else binary_string[8:]  # Remove padding
+    return compressed
+
+
+def compress_stream(input_stream, output_stream, chunk_size=1 << 16, code_width=16):
+    """Compresses a binary stream chunk by chunk in constant memory, writing packed codes as it goes."""
+    encoder = LZWEncoder(max_code_width=code_width)
+    writer = BitWriter()
     
-    compressed = [int(binary_string[i:i+16], 2) for i in range(0, len(binary_string), 16)]  # Convert back to 16-bit integers
+    while True:
+        chunk = input_stream.read(chunk_size)
+        if not chunk:
+            break
+        for code in encoder.encode(chunk):
+            writer.write(code, code_width)
+        output_stream.write(writer.drain())
     
-    return compressed
+    for code in encoder.finish():
+        writer.write(code, code_width)
+    output_stream.write(writer.flush())
+
+
+def decompress_stream(input_stream, output_stream, chunk_size=1 << 16, code_width=16):
+    """Decompresses a stream written by compress_stream chunk by chunk."""
+    decoder = LZWDecoder(max_code_width=code_width)
+    reader = BitReader(b"")
+    
+    while True:
+        chunk = input_stream.read(chunk_size)
+        if not chunk:
+            break
+        reader.extend(chunk)
+        # Fewer than code_width bits left is either the next chunk's start or final padding
+        codes = [reader.read(code_width) for _ in range(reader.bits_left() // code_width)]
+        output_stream.write(decoder.decode(codes))
 
 
 def calculate_compression_metrics(original_file, compressed_file):
@@ -122,5 +172,6 @@ def lzw_compression_pipeline(input_filename="input.txt", compressed_filename="co
     calculate_compression_metrics(input_filename, compressed_filename)
 
 
-# Run the pipeline:
-lzw_compression_pipeline()
+if __name__ == "__main__":
+    # Run the pipeline:
+    lzw_compression_pipeline()
@@ -1,79 +1,60 @@
 from PIL import Image
 import numpy as np
 import os
-from collections import Counter
-import math
+import sys
 
-def compress_image(image_path, compressed_file):
-    """Open an image, apply LZW compression, and save the result."""
+# The shared LZW engine lives in the part-4 package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, "part-4  Color Image Compression", "differential_lzw"))
+from src.bitio import codes_from_bytes
+from src.lzw import lzw_decode
+from src.compression import compress_channels, decompress_channels
+from src.container import MODE_RAW, ContainerReader, is_container
+from src.report import start_report, stage, finish_report
+from src.stats import symbol_entropy
+
+def compress_image(image_path, compressed_file, max_code_width=None, reset_policy=None, report=False, hook=None):
+    """Open an image, apply LZW compression, and save the result; report=True also returns a CompressionReport."""
+    return_report = report
+    report = start_report("compress", report, hook)
     
     # Reading the image  and converting it to grayscale
-    img = Image.open(image_path).convert("L")
-    pixels = np.array(img).flatten()
-    
-    #  Initializing LZW dictionary with standard grayscale values...
-    dict_size = 256
-    dictionary = {bytes([i]): i for i in range(dict_size)}
-    
-    w = bytes()
-    compressed = []
-    
-    # Processing pixels and performing LZW compression
-    for pixel in pixels:
-        wc = w + bytes([pixel])
-        if wc in dictionary:
-            w = wc
-        else:
-            compressed.append(dictionary[w])
-            dictionary[wc] = dict_size
-            dict_size += 1
-            w = bytes([pixel])
+    with stage(report, "load"):
+        img = Image.open(image_path).convert("L")
+        pixels = np.asarray(img)
     
-    if w:
-        compressed.append(dictionary[w])
-    
-    # Writing compressed data to compressed_file
+    # LZW compression over the raw pixel bytes, written as a container whose header records the shape
+    # The dictionary is capped at 16 bits so every code fits in 2 bytes; reset_policy clears it instead of freezing it
     with open(compressed_file, "wb") as f:
-        for code in compressed:
-            f.write(code.to_bytes(2, byteorder='big'))
+        compress_channels(f, [pixels], MODE_RAW, max_code_width, reset_policy, report=report)
     
     # Compression completed successfully
-    return compressed_file
+    return finish_report(compressed_file, report, return_report, hook)
 
-def decompress_image(compressed_file, output_image_path, original_shape):
-    """Load a compressed file, decompress it, and restore the image."""
+def decompress_image(compressed_file, output_image_path, original_shape=None, report=False, hook=None):
+    """Load a compressed file, decompress it, and restore the image; report=True also returns a CompressionReport."""
+    return_report = report
+    report = start_report("decompress", report, hook)
     
-    # Reading compressed data from compressed_file
+    # Reading compressed data from compressed_file; containers carry the shape and code options in their header, headerless files need original_shape
     with open(compressed_file, "rb") as f:
-        compressed = [int.from_bytes(f.read(2), byteorder='big') for _ in range(os.path.getsize(compressed_file) // 2)]
-    
-    # Initializing dictionary for decompression
-    dict_size = 256
-    dictionary = {i: bytes([i]) for i in range(dict_size)}
-    
-    w = bytes([compressed.pop(0)])
-    decompressed = [w]
-    
-    #Decoding compressed data back into pixel values
-    for k in compressed:
-        if k in dictionary:
-            entry = dictionary[k]
-        elif k == dict_size:
-            entry = w + w[:1]
+        if is_container(f):
+            with stage(report, "load"):
+                reader = ContainerReader(f)
+            with reader:
+                pixels = decompress_channels(reader, report=report)[0]
         else:
-            raise ValueError(f"Invalid compressed code: {k}")
-        
-        decompressed.append(entry)
-        dictionary[dict_size] = w + entry[:1]
-        dict_size += 1
-        w = entry
+            compressed = codes_from_bytes(f.read())
+            
+            # Decoding compressed data straight into a pixel buffer of the original size
+            with stage(report, "lzw"):
+                pixels = lzw_decode(compressed, int(np.prod(original_shape))).reshape(original_shape)
     
     # Reconstructing the image and saving to output_image_path
-    pixels = np.frombuffer(b''.join(decompressed), dtype=np.uint8)
-    restored_img = Image.fromarray(pixels.reshape(original_shape))
-    restored_img.save(output_image_path)
+    restored_img = Image.fromarray(pixels)
+    with stage(report, "write"):
+        restored_img.save(output_image_path)
     
-    return output_image_path
+    return finish_report(output_image_path, report, return_report, hook)
 
 def calculate_image_metrics(original_image_path, compressed_file):
     """Calculate entropy, compression ratio, and other metrics for analysis."""
@@ -83,10 +64,7 @@ def calculate_image_metrics(original_image_path, compressed_file):
     
     # Computing pixel distribution to estimate entropy
     img = Image.open(original_image_path).convert("L")
-    pixels = np.array(img).flatten()
-    histogram = Counter(pixels)
-    total_pixels = len(pixels)
-    entropy = -sum((count / total_pixels) * math.log2(count / total_pixels) for count in histogram.values())
+    entropy = symbol_entropy(np.asarray(img))
     
     # Calculating compression statistics
     compression_ratio = compressed_size / original_size
@@ -107,15 +85,11 @@ if __name__ == "__main__":
     compressed_file = "compressed.bin"
     restored_image_path = "restored_image.png"
     
-    print("Extracting original image dimensions...")
-    img = Image.open(image_path).convert("L")
-    original_shape = img.size[::-1]
-    
     # compression process
     compress_image(image_path, compressed_file)
     
-    # decompression process
-    decompress_image(compressed_file, restored_image_path, original_shape)
+    # decompression process (the shape comes from the container header)
+    decompress_image(compressed_file, restored_image_path)
     
     # Analyzing compression efficiency
     calculate_image_metrics(image_path, compressed_file)
\ No newline at end of file
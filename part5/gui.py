@@ -2,19 +2,50 @@ from PIL import Image, ImageTk
 import numpy as np
 import os
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 import struct
-from collections import Counter
-import math
+import sys
+import threading
+import queue
+import time
+from functools import lru_cache
 
 
 current_directory = os.path.dirname(os.path.realpath(__file__))
+
+# The shared LZW engine lives in the part-4 package
+sys.path.insert(0, os.path.join(current_directory, os.pardir, 'part-4  Color Image Compression', 'differential_lzw'))
+from src.compression import compress_channels, decompress_channels, decompress_channel, map_channels, channels_to_image
+from src.container import MODE_RAW, MODE_DIFFERENCES, MODE_MED, ContainerReader, is_container, read_code_record, decode_codes
+from src.lzw import lzw_decompress_gray, ResetWhenFull, ResetOnRatioDrop
+from src.color import COLOR_NONE, COLOR_SUBTRACT_GREEN, COLOR_YCOCG_R, COLOR_RCT, pick_color_transform
+from src.predictors import PREDICTORS
+from src.utils import restore_from_differences
+from src.report import start_report, stage, finish_report
+from src.stats import symbol_entropy
+
 image_file_path = os.path.join(current_directory, 'thumbs_up.bmp') 
 compressed_file_path = os.path.join(current_directory, 'compressed.bin')
 decompressed_image_path = os.path.join(current_directory, 'decompressed.bmp')
 original_img = None
 decompressed_img = None
 compression_level = 1  
+max_code_width = None
+reset_policy = None
+workers = 1
+tile_size = None
+background_job = None
+progress_bar = None
+cancel_button = None
+preview = None
+# Ratio and time of every level tried on the open image; emptied when the image or an option changes
+level_results = {}
+
+# How often the Tk thread checks on a background job, in milliseconds
+POLL_INTERVAL = 50
+
+# Largest size the image panels show; bigger images are downscaled for display only
+PREVIEW_SIZE = (640, 640)
 
 
 if not os.path.exists(image_file_path):
@@ -28,296 +59,255 @@ if not os.path.exists(image_file_path):
 
 
 
-def compute_differences(channel):
-    """
-    Computes row-wise and column-wise differences for a channel
-    Returns the difference image
-    """
-    rows, cols = channel.shape
-    diff_image = np.zeros_like(channel, dtype=np.int16)
-    
-  
-    diff_image[:, 1:] = channel[:, 1:].astype(np.int16) - channel[:, :-1].astype(np.int16)
-    
-  
-    diff_image[1:, 0] = channel[1:, 0].astype(np.int16) - channel[:-1, 0].astype(np.int16)
-    
-    return diff_image
+def read_codes(f):
+    """Read a code record of the layout used before the container, 2 bytes per code"""
+    return decode_codes(*read_code_record(f))
 
-def restore_from_differences(diff_image):
-    """
-    Restores original image from differences
-    """
-    rows, cols = diff_image.shape
-    restored = np.zeros_like(diff_image, dtype=np.uint8)
-   
-    restored[0, 0] = diff_image[0, 0]  
-    for i in range(1, rows):
-        restored[i, 0] = (restored[i-1, 0] + diff_image[i, 0]) % 256
-    
-    
-    for i in range(rows):
-        for j in range(1, cols):
-            restored[i, j] = (restored[i, j-1] + diff_image[i, j]) % 256
-    
-    return restored
+def skip_codes(f):
+    """Skip a code record of the pre-container layout and return its size in bytes"""
+    num_bytes = struct.unpack(">I", f.read(4))[0] * 2
+    f.seek(num_bytes, os.SEEK_CUR)
+    return num_bytes
 
-def lzw_compress_gray(data):
-    """Basic LZW compression for grayscale data"""
-    dictionary = {bytes([i]): i for i in range(256)}
-    dict_size = 256
-    max_dict_size = 65536  
-    w = bytes()
-    compressed = []
-    
-    for pixel in data:
-        if pixel < 0:
-            pixel = 256 + pixel  
-        
-        wc = w + bytes([pixel % 256])
-        if wc in dictionary:
-            w = wc
-        else:
-            compressed.append(dictionary[w])
-            if dict_size < max_dict_size:
-                dictionary[wc] = dict_size
-                dict_size += 1
-            w = bytes([pixel % 256])
-    
-    if w:
-        compressed.append(dictionary[w])
-    return compressed
-
-def lzw_decompress_gray(codes):
-    """Basic LZW decompression for grayscale data"""
-    dictionary = {i: bytes([i]) for i in range(256)}
-    dict_size = 256
-    w = bytes([codes.pop(0)])
-    result = [w]
-    
-    for code in codes:
-        if code in dictionary:
-            entry = dictionary[code]
-        elif code == dict_size:
-            entry = w + w[:1]
-        else:
-            raise ValueError(f"Invalid compressed code: {code}")
-        
-        result.append(entry)
-        dictionary[dict_size] = w + entry[:1]
-        dict_size += 1
-        w = entry
+def container_decompress(f, output_image_path, workers=1, report=None, progress=None):
+    """Decode every channel of a container; progress gets (pixels done, total pixels)"""
+    with stage(report, "load"):
+        reader = ContainerReader(f)
+    with reader:
+        restored_img = channels_to_image(decompress_channels(reader, workers=workers, report=report, progress=progress))
+    with stage(report, "write"):
+        restored_img.save(output_image_path)
     
-    decompressed = list(b''.join(result))
- 
-    return [(x - 256 if x > 127 else x) for x in decompressed]
+    return restored_img
 
 
+def record_entropy(report, img):
+    """Store the grayscale entropy the metrics panel shows in the report, while the image is loaded"""
+    if report is not None:
+        with stage(report, "entropy"):
+            report.image_entropy = symbol_entropy(np.asarray(img.convert("L")))
 
-def level1_compress(image_path, compressed_file):
-    """Basic LZW compression without preprocessing"""
-    img = Image.open(image_path).convert("L")
-    pixels = np.array(img).flatten()
-    
-    compressed = lzw_compress_gray(pixels)
+
+def level1_compress(image_path, compressed_file, max_code_width=None, reset_policy=None, workers=1, tile_size=None, report=False, hook=None, progress=None):
+    """Basic LZW compression without preprocessing, optionally tiled; report=True also returns a CompressionReport"""
+    return_report = report
+    report = start_report("compress", report, hook)
+    with stage(report, "load"):
+        img = Image.open(image_path).convert("L")
+        pixels = np.asarray(img)
+    record_entropy(report, img)
     
     with open(compressed_file, "wb") as f:
-       
-        width, height = img.size
-        f.write(struct.pack(">II", height, width))
-       
-        f.write(struct.pack(">I", len(compressed)))
-        for code in compressed:
-            f.write(struct.pack(">H", code))
+        compress_channels(f, [pixels], MODE_RAW, max_code_width, reset_policy, workers, tile_size, report, progress)
     
-    return compressed_file
+    return finish_report(compressed_file, report, return_report, hook)
 
-def level1_decompress(compressed_file, output_image_path):
-    """Basic LZW decompression without postprocessing"""
+def level1_decompress(compressed_file, output_image_path, workers=1, report=False, hook=None, progress=None):
+    """Basic LZW decompression without postprocessing; report=True also returns a CompressionReport"""
+    return_report = report
+    report = start_report("decompress", report, hook)
     with open(compressed_file, "rb") as f:
+        if is_container(f):
+            return finish_report(container_decompress(f, output_image_path, workers, report, progress), report, return_report, hook)
        
         height, width = struct.unpack(">II", f.read(8))
    
-        num_codes = struct.unpack(">I", f.read(4))[0]
-        codes = [struct.unpack(">H", f.read(2))[0] for _ in range(num_codes)]
-    
-    decompressed = lzw_decompress_gray(codes)
+        codes = read_codes(f)
     
-   
-    if len(decompressed) < width * height:
-        decompressed.extend([0] * (width * height - len(decompressed)))
-    elif len(decompressed) > width * height:
-        decompressed = decompressed[:width * height]
+    with stage(report, "lzw"):
+        decompressed = lzw_decompress_gray(codes, 16, width * height)
     
-    restored_img = Image.fromarray(np.array(decompressed, dtype=np.uint8).reshape((height, width)))
-    restored_img.save(output_image_path)
+    restored_img = Image.fromarray(decompressed.view(np.uint8).reshape((height, width)))
+    with stage(report, "write"):
+        restored_img.save(output_image_path)
     
-    return restored_img
+    return finish_report(restored_img, report, return_report, hook)
 
 
-def level2_compress(image_path, compressed_file):
-    """Difference encoding + LZW compression"""
-    img = Image.open(image_path).convert("L")
-    img_array = np.array(img, dtype=np.uint8)
-    
- 
-    diff_image = compute_differences(img_array)
-    data = diff_image.flatten().tolist()
-    
-   
-    compressed = lzw_compress_gray(data)
+def level2_compress(image_path, compressed_file, max_code_width=None, reset_policy=None, workers=1, tile_size=None, report=False, hook=None, progress=None):
+    """Difference encoding + LZW compression, optionally tiled; report=True also returns a CompressionReport"""
+    return_report = report
+    report = start_report("compress", report, hook)
+    with stage(report, "load"):
+        img = Image.open(image_path).convert("L")
+        img_array = np.asarray(img)
+    record_entropy(report, img)
     
     with open(compressed_file, "wb") as f:
-      
-        height, width = img_array.shape
-        f.write(struct.pack(">II", height, width))
-       
-        f.write(struct.pack(">I", len(compressed)))
-        for code in compressed:
-            f.write(struct.pack(">H", code))
+        compress_channels(f, [img_array], MODE_DIFFERENCES, max_code_width, reset_policy, workers, tile_size, report, progress)
     
-    return compressed_file
+    return finish_report(compressed_file, report, return_report, hook)
 
-def level2_decompress(compressed_file, output_image_path):
-    """LZW decompression + difference decoding"""
+def level2_decompress(compressed_file, output_image_path, workers=1, report=False, hook=None, progress=None):
+    """LZW decompression + difference decoding; report=True also returns a CompressionReport"""
+    return_report = report
+    report = start_report("decompress", report, hook)
     with open(compressed_file, "rb") as f:
+        if is_container(f):
+            return finish_report(container_decompress(f, output_image_path, workers, report, progress), report, return_report, hook)
       
         height, width = struct.unpack(">II", f.read(8))
      
-        num_codes = struct.unpack(">I", f.read(4))[0]
-        codes = [struct.unpack(">H", f.read(2))[0] for _ in range(num_codes)]
-    
-    decompressed = lzw_decompress_gray(codes)
+        codes = read_codes(f)
     
-
-    if len(decompressed) < width * height:
-        decompressed.extend([0] * (width * height - len(decompressed)))
-    elif len(decompressed) > width * height:
-        decompressed = decompressed[:width * height]
+    with stage(report, "lzw"):
+        decompressed = lzw_decompress_gray(codes, 16, width * height)
     
 
-    diff_image = np.array(decompressed, dtype=np.int16).reshape((height, width))
-    restored_array = restore_from_differences(diff_image)
+    with stage(report, "transform"):
+        diff_image = decompressed.astype(np.int16).reshape((height, width))
+        restored_array = restore_from_differences(diff_image)
     
     restored_img = Image.fromarray(restored_array)
-    restored_img.save(output_image_path)
+    with stage(report, "write"):
+        restored_img.save(output_image_path)
     
-    return restored_img
+    return finish_report(restored_img, report, return_report, hook)
 
 
-def level3_compress(image_path, compressed_file):
-    """RGB color image compression using differences + LZW"""
-    img = Image.open(image_path).convert("RGB")
- 
-    width, height = img.size
-    
-    
-    r, g, b = img.split()
-    channels = {
-        'R': np.array(r, dtype=np.uint8),
-        'G': np.array(g, dtype=np.uint8),
-        'B': np.array(b, dtype=np.uint8)
-    }
-    
- 
-    compressed_channels = {}
-    for key in channels:
-        diff_image = compute_differences(channels[key])
-        data = diff_image.flatten().tolist()
-        codes = lzw_compress_gray(data)
-        compressed_channels[key] = codes
+def level3_compress(image_path, compressed_file, max_code_width=None, reset_policy=None, workers=1, tile_size=None, report=False, hook=None, progress=None,
+                    color_transform=COLOR_NONE):
+    """RGB color image compression using differences + LZW, after an optional color transform"""
+    return_report = report
+    report = start_report("compress", report, hook)
+    with stage(report, "load"):
+        img = Image.open(image_path).convert("RGB")
+        
+        pixels = np.asarray(img)
+        channels = [pixels[:, :, k] for k in range(3)]
+    record_entropy(report, img)
     
-
     with open(compressed_file, "wb") as f:
-        f.write(struct.pack(">II", height, width))
-      
-        for key in ['R', 'G', 'B']:
-            codes = compressed_channels[key]
-            f.write(struct.pack(">I", len(codes)))
-            for code in codes:
-                f.write(struct.pack(">H", code))
+        compress_channels(f, channels, MODE_DIFFERENCES, max_code_width, reset_policy, workers, tile_size, report, progress, color_transform)
     
-    return compressed_file
+    return finish_report(compressed_file, report, return_report, hook)
 
-def level3_decompress(compressed_file, output_image_path):
-    """RGB color image decompression"""
+def level3_decompress(compressed_file, output_image_path, workers=1, report=False, hook=None, progress=None):
+    """RGB color image decompression, spreading channels (or tiles) over worker processes"""
+    return_report = report
+    report = start_report("decompress", report, hook)
     with open(compressed_file, "rb") as f:
+        if is_container(f):
+            return finish_report(container_decompress(f, output_image_path, workers, report, progress), report, return_report, hook)
         
         height, width = struct.unpack(">II", f.read(8))
         
-        channels_restored = {}
+        jobs = []
         for key in ['R', 'G', 'B']:
-            num_codes = struct.unpack(">I", f.read(4))[0]
-            codes = [struct.unpack(">H", f.read(2))[0] for _ in range(num_codes)]
-            
-          
-            decompressed = lzw_decompress_gray(codes)
-            
-          
-            if len(decompressed) < width * height:
-                decompressed.extend([0] * (width * height - len(decompressed)))
-            elif len(decompressed) > width * height:
-                decompressed = decompressed[:width * height]
-            
-           
-            diff_image = np.array(decompressed, dtype=np.int16).reshape((height, width))
-            channel_array = restore_from_differences(diff_image)
-            channels_restored[key] = channel_array
+            num_codes, payload = read_code_record(f)
+            jobs.append((num_codes, payload, (height, width)))
+    
+    channels_restored = []
+    for channel, stats in map_channels(decompress_channel, jobs, workers):
+        channels_restored.append(channel)
+        if report is not None:
+            report.add_channel(stats)
     
 
-    restored_img = Image.merge("RGB", (
-        Image.fromarray(channels_restored['R']),
-        Image.fromarray(channels_restored['G']),
-        Image.fromarray(channels_restored['B'])
-    ))
-    restored_img.save(output_image_path)
+    restored_img = channels_to_image(channels_restored)
+    with stage(report, "write"):
+        restored_img.save(output_image_path)
     
-    return restored_img
+    return finish_report(restored_img, report, return_report, hook)
 
 
-def level4_compress(image_path, compressed_file):
-    return level3_compress(image_path, compressed_file)
+def level4_compress(image_path, compressed_file, max_code_width=None, reset_policy=None, workers=1, tile_size=None, report=False, hook=None, progress=None):
+    """RGB compression with the JPEG-LS MED predictor, variable-width codes and zero-run coding"""
+    return_report = report
+    report = start_report("compress", report, hook)
+    with stage(report, "load"):
+        img = Image.open(image_path).convert("RGB")
+        
+        pixels = np.asarray(img)
+        channels = [pixels[:, :, k] for k in range(3)]
+    record_entropy(report, img)
+    
+    with open(compressed_file, "wb") as f:
+        compress_channels(f, channels, MODE_MED, max_code_width or 16, reset_policy, workers, tile_size, report, progress,
+                          run_length=True)
+    
+    return finish_report(compressed_file, report, return_report, hook)
 
-def level4_decompress(compressed_file, output_image_path):
-    return level3_decompress(compressed_file, output_image_path)
+def level4_decompress(compressed_file, output_image_path, workers=1, report=False, hook=None, progress=None):
+    """Level 3 decoding reads level 4 files, as the container records their options"""
+    return level3_decompress(compressed_file, output_image_path, workers, report, hook, progress)
 
-def level5_compress(image_path, compressed_file):
-    return level3_compress(image_path, compressed_file)
+def level5_compress(image_path, compressed_file, max_code_width=None, reset_policy=None, workers=1, tile_size=None, report=False, hook=None, progress=None):
+    """Level 4 plus a color transform and dictionary resets, each only where it helps"""
+    return_report = report
+    report = start_report("compress", report, hook)
+    with stage(report, "load"):
+        img = Image.open(image_path).convert("RGB")
+        
+        pixels = np.asarray(img)
+        channels = [pixels[:, :, k] for k in range(3)]
+    record_entropy(report, img)
+    
+    # Subtract-green, YCoCg-R or RCT is only applied when it lowers the entropy of the residuals, so level 5 never codes worse residuals than level 4
+    with stage(report, "color"):
+        color_transform = pick_color_transform(channels, PREDICTORS[MODE_MED][0], (COLOR_SUBTRACT_GREEN, COLOR_YCOCG_R, COLOR_RCT))
+    
+    # A dictionary only fills, and so can only be reset, in a tile with more symbols than it has codes
+    rows, cols = pixels.shape[:2]
+    if reset_policy is None and min(rows, tile_size or rows) * min(cols, tile_size or cols) > 1 << (max_code_width or 16):
+        reset_policy = ResetOnRatioDrop()
+    
+    with open(compressed_file, "wb") as f:
+        compress_channels(f, channels, MODE_MED, max_code_width or 16, reset_policy, workers, tile_size, report, progress,
+                          color_transform, run_length=True)
+    
+    return finish_report(compressed_file, report, return_report, hook)
 
-def level5_decompress(compressed_file, output_image_path):
-    return level3_decompress(compressed_file, output_image_path)
+def level5_decompress(compressed_file, output_image_path, workers=1, report=False, hook=None, progress=None):
+    """Level 3 decoding reads level 5 files, as the container records their options"""
+    return level3_decompress(compressed_file, output_image_path, workers, report, hook, progress)
 
 
+def region_decompress(compressed_file, box, workers=1, report=False, hook=None):
+    """Decode only the (left, top, right, bottom) box of a container, reading just the tiles it overlaps"""
+    return_report = report
+    report = start_report("decompress", report, hook)
+    with open(compressed_file, "rb") as f:
+        with stage(report, "load"):
+            reader = ContainerReader(f)
+        with reader:
+            region = channels_to_image(decompress_channels(reader, box, workers, report))
+    return finish_report(region, report, return_report, hook)
 
-def calculate_metrics(image_path, compressed_file):
-    """Calculate compression metrics"""
+
+def calculate_metrics(image_path, compressed_file, report=None):
+    """Calculate compression metrics, taking them from the report of the compression run if given"""
   
     original_size = os.path.getsize(image_path)
-    compressed_size = os.path.getsize(compressed_file)
+    
+    if report is not None and report.image_entropy is not None:
+        compression_ratio = report.bytes_out / original_size
+        return report.image_entropy, report.avg_code_length, original_size, report.bytes_out, compression_ratio
     
    
     img = Image.open(image_path).convert("L")
-    pixels = np.array(img).flatten()
-    hist = Counter(pixels)
-    total = len(pixels)
-    entropy = -sum((count / total) * math.log2(count / total) for count in hist.values())
+    entropy = symbol_entropy(np.asarray(img))
+    
+    compressed_size = os.path.getsize(compressed_file)
     
  
     with open(compressed_file, "rb") as f:
-       
-        f.read(8)
-        if compression_level == 3 or compression_level == 4 or compression_level == 5:
-          
-            total_codes = 0
-            for _ in range(3):
-                num_codes = struct.unpack(">I", f.read(4))[0]
-                total_codes += num_codes
-                f.read(num_codes * 2)  
-            avg_code_length = (total_codes * 16) / (img.size[0] * img.size[1] * 3)
+        if is_container(f):
+            # The header gives the channel count and the offset table every record size
+            with ContainerReader(f) as reader:
+                avg_code_length = reader.payload_bytes() * 8 / (img.size[0] * img.size[1] * reader.header.channels)
         else:
-          
-            num_codes = struct.unpack(">I", f.read(4))[0]
-            avg_code_length = (num_codes * 16) / (img.size[0] * img.size[1])
+       
+            f.read(8)
+            if compression_level == 3 or compression_level == 4 or compression_level == 5:
+              
+                total_bits = 0
+                for _ in range(3):
+                    total_bits += skip_codes(f) * 8
+                avg_code_length = total_bits / (img.size[0] * img.size[1] * 3)
+            else:
+              
+                avg_code_length = skip_codes(f) * 8 / (img.size[0] * img.size[1])
     
     compression_ratio = compressed_size / original_size
     
@@ -325,9 +315,118 @@ def calculate_metrics(image_path, compressed_file):
 
 
 
+class OperationCancelled(Exception):
+    """Raised from the progress callback to stop an operation the user cancelled"""
+
+class BackgroundJob:
+    """A compression or decompression on a worker thread, reporting to the Tk thread through a queue"""
+    
+    def __init__(self, task):
+        self.task = task
+        self.cancelled = threading.Event()
+        self.messages = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    def run(self):
+        try:
+            self.messages.put(("done", self.task(self.progress)))
+        except Exception as e:
+            self.messages.put(("error", e))
+    
+    def progress(self, done, total):
+        """Progress callback for the engine; raises to unwind the worker thread once cancelled"""
+        if self.cancelled.is_set():
+            raise OperationCancelled()
+        self.messages.put(("progress", 100 * done / total if total else 100))
+
+def run_in_background(task, on_done, on_error):
+    """Run task(progress) on a worker thread, calling on_done or on_error back on the Tk thread"""
+    global background_job
+    
+    if background_job is not None:
+        messagebox.showinfo("Busy", "Wait for the current operation to finish or cancel it.")
+        return
+    
+    background_job = BackgroundJob(task)
+    progress_bar['value'] = 0
+    cancel_button.config(state=tk.NORMAL)
+    background_job.thread.start()
+    progress_bar.after(POLL_INTERVAL, poll_background_job, on_done, on_error)
+
+def poll_background_job(on_done, on_error):
+    """Move the progress bar and hand the result over once the worker thread is done"""
+    global background_job
+    
+    while True:
+        try:
+            kind, value = background_job.messages.get_nowait()
+        except queue.Empty:
+            progress_bar.after(POLL_INTERVAL, poll_background_job, on_done, on_error)
+            return
+        
+        if kind == "progress":
+            progress_bar['value'] = value
+            continue
+        
+        background_job = None
+        cancel_button.config(state=tk.DISABLED)
+        if kind == "done":
+            progress_bar['value'] = 100
+            on_done(value)
+        else:
+            progress_bar['value'] = 0
+            on_error(value)
+        return
+
+def cancel_background_job():
+    """Ask the running operation to stop at its next progress callback"""
+    if background_job is not None:
+        background_job.cancelled.set()
+
+
+def fit_preview(img):
+    """Return an RGB copy of img downscaled to fit PREVIEW_SIZE"""
+    img = img.convert('RGB')
+    img.thumbnail(PREVIEW_SIZE)
+    return img
+
+class PreviewCache:
+    """One image decoded once at display size, with its color mode renderings cached per mode"""
+    
+    def __init__(self, path):
+        self.path = path
+        img = Image.open(path)
+        # JPEG can decode straight at a reduced scale
+        img.draft('RGB', PREVIEW_SIZE)
+        self.pixels = np.asarray(fit_preview(img))
+        self.photo = lru_cache(maxsize=8)(self.render)
+    
+    def render(self, mode):
+        """Build the PhotoImage of one mode: color, gray, or a single red, green or blue channel"""
+        if mode == 'gray':
+            img_display = Image.fromarray(self.pixels).convert('L')
+        elif mode in ('red', 'green', 'blue'):
+            # Keep one channel and zero the others
+            masked = np.zeros_like(self.pixels)
+            k = ('red', 'green', 'blue').index(mode)
+            masked[:, :, k] = self.pixels[:, :, k]
+            img_display = Image.fromarray(masked)
+        else:
+            img_display = Image.fromarray(self.pixels)
+        return ImageTk.PhotoImage(image=img_display)
+
+def get_preview():
+    """Return the preview of the current image, decoding it only when the image changed"""
+    global preview
+    
+    if preview is None or preview.path != image_file_path:
+        preview = PreviewCache(image_file_path)
+    return preview
+
+
 def start():
     """Main function to create and start the GUI"""
-    global original_img, decompressed_img
+    global original_img, decompressed_img, progress_bar, cancel_button
     
  
     gui = tk.Tk()
@@ -363,6 +462,15 @@ def start():
     methods_menu.add_command(label="Level 4: Decompression", command=lambda: decompress_image())
     methods_menu.add_command(label="Level 5: Compression", command=lambda: set_compression_level(5))
     methods_menu.add_command(label="Level 5: Decompression", command=lambda: decompress_image())
+    methods_menu.add_separator()
+    packed_codes = tk.BooleanVar(value=False)
+    methods_menu.add_checkbutton(label="Variable-width codes", variable=packed_codes, command=lambda: set_max_code_width(16 if packed_codes.get() else None))
+    reset_dictionary = tk.BooleanVar(value=False)
+    methods_menu.add_checkbutton(label="Reset dictionary when full", variable=reset_dictionary, command=lambda: set_reset_policy(ResetWhenFull() if reset_dictionary.get() else None))
+    parallel_channels = tk.BooleanVar(value=False)
+    methods_menu.add_checkbutton(label="Parallel channels", variable=parallel_channels, command=lambda: set_workers(None if parallel_channels.get() else 1))
+    tiled_mode = tk.BooleanVar(value=False)
+    methods_menu.add_checkbutton(label="Tiled (256x256)", variable=tiled_mode, command=lambda: set_tile_size(256 if tiled_mode.get() else None))
     
    
     img_frame = tk.Frame(frame, bg='royal blue')
@@ -375,7 +483,7 @@ def start():
  
     if os.path.exists(image_file_path):
         try:
-            original_img = ImageTk.PhotoImage(file=image_file_path)
+            original_img = get_preview().photo('color')
         except Exception as e:
             print(f"Resim yüklenirken hata: {e}")
          
@@ -397,7 +505,7 @@ def start():
     if 'dummy_img' in locals():
         decompressed_img = ImageTk.PhotoImage(image=dummy_img)  
     else:
-        decompressed_img = ImageTk.PhotoImage(file=image_file_path)  
+        decompressed_img = original_img
         
     decompressed_img_panel = tk.Label(img_frame, image=decompressed_img)
     decompressed_img_panel.grid(row=1, column=1, padx=10, pady=10)
@@ -425,6 +533,12 @@ def start():
     diff_label = tk.Label(metrics_frame, text="Difference: ", bg='royal blue', fg='white')
     diff_label.grid(row=5, column=0, sticky='w', padx=5, pady=2)
     
+    time_label = tk.Label(metrics_frame, text="Compression Time: ", bg='royal blue', fg='white')
+    time_label.grid(row=6, column=0, sticky='w', padx=5, pady=2)
+    
+    levels_label = tk.Label(metrics_frame, text="Levels: ", bg='royal blue', fg='white', justify='left')
+    levels_label.grid(row=7, column=0, sticky='w', padx=5, pady=2)
+    
    
     button_frame = tk.Frame(frame, bg='royal blue')
     button_frame.grid(row=2, column=0, padx=10, pady=10)
@@ -446,15 +560,25 @@ def start():
     blue_btn.grid(row=0, column=4, padx=5)
     
     
-    compress_btn = tk.Button(frame, text=f"Compress (Level {compression_level})", width=20, command=lambda: compress_image(original_img_panel, decompressed_img_panel, entropy_label, avg_code_length_label, comp_ratio_label, input_size_label, comp_size_label, diff_label))
+    compress_btn = tk.Button(frame, text=f"Compress (Level {compression_level})", width=20, command=lambda: compress_image(original_img_panel, decompressed_img_panel, entropy_label, avg_code_length_label, comp_ratio_label, input_size_label, comp_size_label, diff_label, time_label, levels_label))
     compress_btn.grid(row=3, column=0, pady=10)
     
+    
+    progress_frame = tk.Frame(frame, bg='royal blue')
+    progress_frame.grid(row=4, column=0, padx=10, pady=5)
+    
+    progress_bar = ttk.Progressbar(progress_frame, orient='horizontal', length=400, mode='determinate', maximum=100)
+    progress_bar.grid(row=0, column=0, padx=5)
+    
+    cancel_button = tk.Button(progress_frame, text="Cancel", width=10, state=tk.DISABLED, command=cancel_background_job)
+    cancel_button.grid(row=0, column=1, padx=5)
+    
    
     gui.mainloop()
 
 def open_image(original_panel, decompressed_panel):
     """Open an image file and display it"""
-    global image_file_path, original_img, decompressed_img
+    global image_file_path, original_img, decompressed_img, preview
     
     file_path = filedialog.askopenfilename(
         initialdir=current_directory,
@@ -466,12 +590,15 @@ def open_image(original_panel, decompressed_panel):
         messagebox.showinfo('Warning', 'No image file is selected/opened.')
     else:
         image_file_path = file_path
-        original_img = ImageTk.PhotoImage(file=image_file_path)
+        # The file is decoded once for both panels and every color mode
+        preview = None
+        level_results.clear()
+        original_img = get_preview().photo('color')
         original_panel.config(image=original_img)
         original_panel.photo_ref = original_img
         
        
-        decompressed_img = ImageTk.PhotoImage(file=image_file_path)
+        decompressed_img = original_img
         decompressed_panel.config(image=decompressed_img)
         decompressed_panel.photo_ref = decompressed_img
 
@@ -482,8 +609,40 @@ def set_compression_level(level):
    
     print(f"Compression level set to {level}")
 
+def set_max_code_width(width):
+    """Switch between fixed 16-bit codes (None) and bit-packed codes up to width bits"""
+    global max_code_width
+    max_code_width = width
+    level_results.clear()
+    
+    print(f"Maximum code width set to {width}")
+
+def set_reset_policy(policy):
+    """Set the dictionary reset policy (None keeps a full dictionary frozen)"""
+    global reset_policy
+    reset_policy = policy
+    level_results.clear()
+    
+    print(f"Dictionary reset policy set to {type(policy).__name__ if policy else None}")
+
+def set_workers(count):
+    """Set the number of processes for channels and tiles (1 runs them in turn, None uses every core)"""
+    global workers
+    workers = count
+    level_results.clear()
+    
+    print(f"Channel workers set to {count}")
+
+def set_tile_size(size):
+    """Set the tile size (None compresses every channel as a single stream)"""
+    global tile_size
+    tile_size = size
+    level_results.clear()
+    
+    print(f"Tile size set to {size}")
+
 def display_color_mode(image_panel, mode):
-    """Display the image in different color modes"""
+    """Display the image in different color modes, from the cached preview"""
     global image_file_path
     
     try:
@@ -492,50 +651,27 @@ def display_color_mode(image_panel, mode):
             messagebox.showerror("Hata", "Görüntülenecek resim dosyası bulunamadı.")
             return
             
-        img_rgb = Image.open(image_file_path)
-        
-        if mode == 'gray':
-            img_display = img_rgb.convert('L')
-        elif mode == 'red':
-            r, g, b = img_rgb.split()
-            zeros = Image.new('L', img_rgb.size, 0)
-            img_display = Image.merge('RGB', (r, zeros, zeros))
-        elif mode == 'green':
-            r, g, b = img_rgb.split()
-            zeros = Image.new('L', img_rgb.size, 0)
-            img_display = Image.merge('RGB', (zeros, g, zeros))
-        elif mode == 'blue':
-            r, g, b = img_rgb.split()
-            zeros = Image.new('L', img_rgb.size, 0)
-            img_display = Image.merge('RGB', (zeros, zeros, b))
-        else:  
-            img_display = img_rgb
-        
-        img = ImageTk.PhotoImage(image=img_display)
+        img = get_preview().photo(mode)
         image_panel.config(image=img)
         image_panel.photo_ref = img
     except Exception as e:
         messagebox.showerror("Hata", f"Resim görüntülenirken bir hata oluştu: {str(e)}")
 
-def compress_image(original_panel, decompressed_panel, entropy_label, avg_code_label, ratio_label, input_size_label, comp_size_label, diff_label):
-    """Compress the image using selected compression level"""
-    global compression_level, compressed_file_path
-    
-    try:
-       
-        if compression_level == 1:
-            level1_compress(image_file_path, compressed_file_path)
-        elif compression_level == 2:
-            level2_compress(image_file_path, compressed_file_path)
-        elif compression_level == 3:
-            level3_compress(image_file_path, compressed_file_path)
-        elif compression_level == 4:
-            level4_compress(image_file_path, compressed_file_path)
-        elif compression_level == 5:
-            level5_compress(image_file_path, compressed_file_path)
-        
-       
-        entropy, avg_code_length, original_size, compressed_size, compression_ratio = calculate_metrics(image_file_path, compressed_file_path)
+def compress_image(original_panel, decompressed_panel, entropy_label, avg_code_label, ratio_label, input_size_label, comp_size_label, diff_label, time_label, levels_label):
+    """Compress the image using selected compression level, on a worker thread"""
+    level = compression_level
+    compress = [level1_compress, level2_compress, level3_compress, level4_compress, level5_compress][level - 1]
+    image_path, compressed_path = image_file_path, compressed_file_path
+    options = (max_code_width, reset_policy, workers, tile_size)
+    
+    def task(progress):
+        start = time.perf_counter()
+        _, report = compress(image_path, compressed_path, *options, report=True, progress=progress)
+        seconds = time.perf_counter() - start
+        return calculate_metrics(image_path, compressed_path, report) + (seconds,)
+    
+    def done(metrics):
+        entropy, avg_code_length, original_size, compressed_size, compression_ratio, seconds = metrics
         
        
         entropy_label.config(text=f"Entropy: {entropy:.4f} bits/pixel")
@@ -544,40 +680,54 @@ def compress_image(original_panel, decompressed_panel, entropy_label, avg_code_l
         input_size_label.config(text=f"Input Image size: {original_size} bytes")
         comp_size_label.config(text=f"Compressed Image size: {compressed_size} bytes")
         diff_label.config(text=f"Difference: {original_size - compressed_size} bytes")
+        time_label.config(text=f"Compression Time: {seconds:.2f} s")
         
-        messagebox.showinfo("Success", f"Image compressed successfully using level {compression_level}!")
+        # What each level tried on this image costs and buys
+        level_results[level] = (compression_ratio, seconds)
+        levels_label.config(text="Levels: " + "\n".join(f"Level {n}: ratio {ratio:.4f} in {secs:.2f} s" for n, (ratio, secs) in sorted(level_results.items())))
         
-    except Exception as e:
-        messagebox.showerror("Error", f"Compression failed: {str(e)}")
+        messagebox.showinfo("Success", f"Image compressed successfully using level {level}!")
+    
+    def failed(e):
+        if isinstance(e, OperationCancelled):
+            # The container is written last, so a cancelled run leaves only an empty file behind
+            if os.path.exists(compressed_path):
+                os.remove(compressed_path)
+            messagebox.showinfo("Cancelled", "Compression cancelled.")
+        else:
+            messagebox.showerror("Error", f"Compression failed: {str(e)}")
+    
+    run_in_background(task, done, failed)
 
 def decompress_image():
-    """Decompress the image using selected compression level"""
-    global compression_level, compressed_file_path, decompressed_image_path, decompressed_img
+    """Decompress the image using selected compression level, on a worker thread"""
+    level = compression_level
+    decompress = [level1_decompress, level2_decompress, level3_decompress, level4_decompress, level5_decompress][level - 1]
+    compressed_path, output_path = compressed_file_path, decompressed_image_path
+    options = (workers,)
     
-    try:
-       
-        if compression_level == 1:
-            restored_img = level1_decompress(compressed_file_path, decompressed_image_path)
-        elif compression_level == 2:
-            restored_img = level2_decompress(compressed_file_path, decompressed_image_path)
-        elif compression_level == 3:
-            restored_img = level3_decompress(compressed_file_path, decompressed_image_path)
-        elif compression_level == 4:
-            restored_img = level4_decompress(compressed_file_path, decompressed_image_path)
-        elif compression_level == 5:
-            restored_img = level5_decompress(compressed_file_path, decompressed_image_path)
+    def task(progress):
+        return decompress(compressed_path, output_path, *options, progress=progress)
+    
+    def done(restored_img):
+        global decompressed_img
         
       
-        decompressed_img = ImageTk.PhotoImage(image=restored_img)
+        decompressed_img = ImageTk.PhotoImage(image=fit_preview(restored_img))
         image_panel = tk._default_root.children['!frame'].children['!frame']
         decompressed_panel = image_panel.children['!label2']
         decompressed_panel.config(image=decompressed_img)
         decompressed_panel.photo_ref = decompressed_img
         
-        messagebox.showinfo("Success", f"Image decompressed successfully using level {compression_level}!")
-        
-    except Exception as e:
-        messagebox.showerror("Error", f"Decompression failed: {str(e)}")
+        messagebox.showinfo("Success", f"Image decompressed successfully using level {level}!")
+    
+    def failed(e):
+        if isinstance(e, OperationCancelled):
+            messagebox.showinfo("Cancelled", "Decompression cancelled.")
+        else:
+            messagebox.showerror("Error", f"Decompression failed: {str(e)}")
+    
+    run_in_background(task, done, failed)
 
 if __name__ == '__main__':
     start()
\ No newline at end of file